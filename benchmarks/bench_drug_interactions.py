@@ -0,0 +1,110 @@
+"""
+Benchmark: drug-drug interaction checks
+
+Builds synthetic formularies of realistic size (10k and 25k drugs, interactions skewed
+towards a few hub drugs such as anticoagulants, averaging about 40 per drug) and checks
+patient drug sets of growing size (drawn with a skewed prescription frequency) with
+utils.drug_interactions.InteractionGraph. The first and repeated checks of the same sets
+show the cost of building row sets; both are compared with a pairwise lookup in a list
+of neighbor sets, which keeps every row in memory (its size is printed next to the
+graph's). The time to find the drugs in a free-text medication list is reported
+separately.
+
+Run from the repository root:
+    python -m benchmarks.bench_drug_interactions [drugs]
+"""
+
+import sys
+import time
+import random
+import itertools
+import tracemalloc
+
+from utils.drug_interactions import InteractionGraph, SEVERITIES
+
+_PATIENTS = 2000
+
+
+def _formulary(drugs: int, rng: random.Random):
+    names = [f"drug{number:05d}" for number in range(drugs)]
+    # Hub drugs (1%) interact with many others
+    weights = list(itertools.accumulate(50 if number < drugs // 100 else 1 for number in range(drugs)))
+    interactions = []
+    for _ in range(drugs * 20):
+        first, second = rng.choices(names, cum_weights=weights, k=2)
+        interactions.append((first, second, rng.choice(SEVERITIES), f"interaction {len(interactions) % 500}"))
+    return names, interactions
+
+
+def _pairwise(neighbors, drug_ids):
+    found = []
+    for position, first in enumerate(drug_ids):
+        for second in drug_ids[position + 1:]:
+            if second in neighbors[first]:
+                found.append((first, second))
+    return found
+
+
+def _traced(build):
+    tracemalloc.start()
+    built = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, retained / 1e6, peak / 1e6
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 25_000
+    rng = random.Random(3)
+    for drugs in (10_000, largest):
+        names, interactions = _formulary(drugs, rng)
+        brands = [(f"brand{name}", name) for name in names]
+        # Tracing slows Python code down, so the build is timed on a second, untraced run
+        _, graph_mb, build_peak_mb = _traced(lambda: InteractionGraph(interactions, brands))
+        started = time.perf_counter()
+        graph = InteractionGraph(interactions, brands)
+        build = time.perf_counter() - started
+
+        def neighbor_sets():
+            neighbors = [set() for _ in graph.drugs]
+            for first, second, _, _ in interactions:
+                a, b = graph.drug_id(first), graph.drug_id(second)
+                neighbors[a].add(b)
+                neighbors[b].add(a)
+            return neighbors
+        neighbors, sets_mb, _ = _traced(neighbor_sets)
+        print(f"{drugs} drugs, {graph.size} interactions: built in {build:.2f}s, "
+              f"{graph_mb:.1f} MB retained, {build_peak_mb:.1f} MB peak while building "
+              f"(neighbor sets: {sets_mb:.1f} MB)")
+
+        # Prescriptions are skewed: a few hundred drugs make up most medication lists
+        ranking = list(range(len(graph.drugs)))
+        rng.shuffle(ranking)
+        popularity = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(ranking))))
+        print(f"{'set':>5} {'first us':>9} {'repeat us':>10} {'pairwise us':>12} {'found':>6}")
+        for size in (5, 15, 40, 100):
+            patients = [list({drug_id for drug_id in rng.choices(ranking, cum_weights=popularity, k=size)})
+                        for _ in range(_PATIENTS)]
+            timings = []
+            for _ in range(2):
+                started = time.perf_counter()
+                found = sum(len(graph.check_ids(drug_ids)) for drug_ids in patients)
+                timings.append((time.perf_counter() - started) / _PATIENTS * 1e6)
+            started = time.perf_counter()
+            expected = sum(len(_pairwise(neighbors, drug_ids)) for drug_ids in patients)
+            pairwise = (time.perf_counter() - started) / _PATIENTS * 1e6
+            assert found == expected
+            print(f"{size:>5} {timings[0]:>9.1f} {timings[1]:>10.1f} {pairwise:>12.1f} {found / _PATIENTS:>6.2f}")
+
+        text = ", ".join(f"brand{name} 10 mg" if number % 2 else name
+                         for number, name in enumerate(rng.sample(names, 15)))
+        started = time.perf_counter()
+        for _ in range(_PATIENTS):
+            graph.find_drugs(text)
+        print(f"finding 15 drugs in a medication list: {(time.perf_counter() - started) / _PATIENTS * 1e6:.1f} us")
+        print(graph.info())
+        print()
+
+
+if __name__ == "__main__":
+    main()
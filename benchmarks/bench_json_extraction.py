@@ -0,0 +1,76 @@
+"""
+Benchmark: JSON extraction from large and malformed LLM replies
+
+Compares the legacy greedy r'(\{.*\})' DOTALL fallback with utils.json_extraction.
+
+Run from the repository root:
+    python -m benchmarks.bench_json_extraction
+"""
+
+import re
+import json
+import time
+import logging
+
+from utils.json_extraction import parse_therapies
+
+
+def _legacy_parse(text):
+    """The fallback previously used by the agent and Gemini integrations"""
+    try:
+        return json.loads(text).get("therapies", [])
+    except (json.JSONDecodeError, AttributeError):
+        match = re.search(r'(\{.*\})', text, re.DOTALL)
+        if not match:
+            return []
+        try:
+            return json.loads(match.group(1)).get("therapies", [])
+        except (json.JSONDecodeError, AttributeError):
+            return []
+
+
+def _therapy(i):
+    return {
+        "therapy_type": "allopathy",
+        "therapy_name": f"Therapy {i}",
+        "description": "Detailed description with {braces} and \"quotes\" " * 5,
+        "efficacy_score": 80,
+        "compatibility_score": 75,
+        "safety_score": 90,
+        "cost_score": 60,
+        "side_effects": ["nausea", "headache"],
+        "contraindications": ["pregnancy"],
+        "supporting_evidence": "Randomized controlled trials",
+    }
+
+
+def _cases():
+    reply = json.dumps({"therapies": [_therapy(i) for i in range(400)]}, indent=2)
+    return {
+        "valid JSON (400 therapies)": reply,
+        "fenced + trailing prose": f"Here you go:\n```json\n{reply}\n```\nLet me know if {{anything}} else is needed.",
+        "truncated mid-object": reply[: int(len(reply) * 0.7)],
+        "unbalanced braces (20k)": "Note: " + "{" * 20000 + " no closing brace",
+    }
+
+
+def _time(fn, text, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(text)
+    return (time.perf_counter() - started) / repeat * 1000, len(result)
+
+
+def main():
+    # Recovery warnings would otherwise be printed on every iteration
+    logging.disable(logging.WARNING)
+    print(f"{'case':32} {'size':>9} {'legacy ms':>10} {'found':>6} {'new ms':>9} {'found':>6}")
+    for name, text in _cases().items():
+        repeat = 3 if "unbalanced" in name else 20
+        legacy_ms, legacy_found = _time(_legacy_parse, text, repeat)
+        new_ms, new_found = _time(parse_therapies, text, repeat)
+        print(f"{name:32} {len(text):>9} {legacy_ms:>10.2f} {legacy_found:>6} {new_ms:>9.2f} {new_found:>6}")
+
+
+if __name__ == "__main__":
+    main()
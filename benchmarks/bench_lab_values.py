@@ -0,0 +1,49 @@
+"""
+Benchmark: numeric lab value extraction on long lab panels
+
+Times the single-regex extraction pass and batch flagging (utils.lab_values) on
+synthetic panels of increasing length.
+
+Run from the repository root:
+    python -m benchmarks.bench_lab_values
+"""
+
+import random
+import time
+
+from utils.lab_values import extract_lab_values, flag_lab_values
+
+_ROWS = [
+    "Glucose (fasting): {v:.1f} mmol/L (3.9-5.5)",
+    "Hemoglobin {v:.1f} g/dL [ref 12.0 - 15.5]",
+    "Total Cholesterol: {v:.0f} mg/dL",
+    "TSH {v:.2f} mIU/L",
+    "WBC {v:.1f} x10^3/uL",
+    "Creatinine {v:.0f} umol/L",
+    "Comment: specimen received in good condition, no haemolysis noted.",
+]
+
+
+def _panel(rows: int) -> str:
+    random.seed(5)
+    return "\n".join(random.choice(_ROWS).format(v=random.uniform(1, 150)) for _ in range(rows))
+
+
+def main():
+    print(f"{'rows':>7} {'chars':>10} {'labs':>7} {'extract ms':>11} {'flag ms':>8} {'labs/s':>10}")
+    for rows in (100, 1_000, 10_000, 100_000):
+        text = _panel(rows)
+        started = time.perf_counter()
+        labs = extract_lab_values(text)
+        extract_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        flag_lab_values(labs)
+        flag_ms = (time.perf_counter() - started) * 1000
+
+        rate = len(labs) / (extract_ms / 1000) if extract_ms else 0
+        print(f"{rows:>7} {len(text):>10} {len(labs):>7} {extract_ms:>11.1f} {flag_ms:>8.1f} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: worker startup with a large NER lexicon
+
+Generates a synthetic lexicon (100,000 canonical terms plus synonyms), compiles it
+with utils.lexicon_store, then measures in fresh interpreter processes how long a
+worker takes to get a ready matcher, and how much private (per-worker) and file-backed
+(shared page cache) memory it holds after scanning a report:
+    - compiling the TSV lexicon into an in-memory EntityMatcher (no artifact)
+    - memory-mapping the prebuilt artifact (MappedEntityMatcher)
+Scan time on a ~1 MB report is reported for both.
+
+Run from the repository root:
+    python -m benchmarks.bench_lexicon_startup [terms]
+"""
+
+import os
+import sys
+import json
+import random
+import tempfile
+import subprocess
+import time
+
+from utils.lexicon_store import build_lexicon, read_lexicon_dir
+from utils.ner_extraction import CASE_RULES
+
+_WORKER = """
+import json, sys, time
+
+def memory():
+    # Private (anonymous) and file-backed resident memory in MB; mmap pages are file-backed
+    fields = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            key, _, value = line.partition(":")
+            fields[key] = value.split()[0] if value.split() else "0"
+    return int(fields.get("RssAnon", 0)) / 1024, int(fields.get("RssFile", 0)) / 1024
+
+started = time.perf_counter()
+anon_before, file_before = memory()
+mode, path, report_path = sys.argv[1:4]
+if mode == "compile":
+    from utils.entity_matcher import EntityMatcher
+    from utils.lexicon_store import read_lexicon_dir
+    from utils.ner_extraction import CASE_RULES
+    matcher = EntityMatcher(read_lexicon_dir(path), CASE_RULES)
+else:
+    from utils.lexicon_store import MappedEntityMatcher
+    matcher = MappedEntityMatcher(path)
+ready = time.perf_counter() - started
+text = open(report_path, encoding="utf-8").read()
+started = time.perf_counter()
+mentions = matcher.find_all(text)
+scan = time.perf_counter() - started
+anon_after, file_after = memory()
+print(json.dumps({"ready_ms": ready * 1000, "private_mb": anon_after - anon_before,
+                  "shared_mb": file_after - file_before, "scan_ms": scan * 1000, "mentions": len(mentions)}))
+"""
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 12)))
+
+
+def _write_lexicon(path: str, terms: int) -> list:
+    rng = random.Random(3)
+    categories = {"diseases": 0.4, "medications": 0.4, "genes": 0.2}
+    samples = []
+    for category, share in categories.items():
+        with open(os.path.join(path, f"{category}.tsv"), "w", encoding="utf-8") as handle:
+            for _ in range(int(terms * share)):
+                if category == "genes":
+                    canonical = _word(rng).upper()[:6] + str(rng.randint(1, 99))
+                    synonyms = []
+                else:
+                    canonical = " ".join(_word(rng) for _ in range(rng.randint(1, 3)))
+                    synonyms = [_word(rng) for _ in range(rng.randint(0, 2))]
+                handle.write(canonical + ("\t" + "|".join(synonyms) if synonyms else "") + "\n")
+                if rng.random() < 0.01:
+                    samples.append(canonical)
+    return samples
+
+
+def _write_report(path: str, samples: list, size: int = 1_000_000):
+    rng = random.Random(4)
+    filler = "The specimen was reviewed and findings are described below with clinical correlation advised".split()
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(samples) if rng.random() < 0.02 else rng.choice(filler)
+        words.append(word)
+        length += len(word) + 1
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(" ".join(words))
+
+
+def _run(mode: str, path: str, report: str) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", _WORKER, mode, path, report], cwd=root,
+                            capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    terms = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as workdir:
+        lexicon_dir = os.path.join(workdir, "lexicons")
+        os.makedirs(lexicon_dir)
+        samples = _write_lexicon(lexicon_dir, terms)
+        report = os.path.join(workdir, "report.txt")
+        _write_report(report, samples)
+        artifact = os.path.join(workdir, "lexicon.bin")
+
+        started = time.perf_counter()
+        summary = build_lexicon(read_lexicon_dir(lexicon_dir), artifact, CASE_RULES)
+        build_s = time.perf_counter() - started
+        print(f"lexicon: {summary['terms']:,} patterns, {summary['states']:,} states, "
+              f"artifact {summary['bytes'] / 1e6:.1f} MB, build {build_s:.1f}s")
+
+        print(f"{'worker startup':22} {'ready ms':>9} {'private MB':>11} {'file-backed MB':>15} {'scan 1MB ms':>12} {'mentions':>9}")
+        for label, mode, path in (("compile from TSV", "compile", lexicon_dir),
+                                  ("mmap artifact", "mmap", artifact)):
+            result = _run(mode, path, report)
+            print(f"{label:22} {result['ready_ms']:>9.1f} {result['private_mb']:>11.1f} {result['shared_mb']:>15.1f} "
+                  f"{result['scan_ms']:>12.1f} {result['mentions']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: entity extraction on large pathology reports
+
+Compares the previous per-keyword substring scan with the compiled token-level
+Aho-Corasick matcher (utils.entity_matcher) on a ~1 MB report, with the built-in
+lexicon and with a synthetic 5,000-term lexicon. The legacy scan only reports which
+terms occur; the matcher also returns every mention with its offsets.
+
+Run from the repository root:
+    python -m benchmarks.bench_ner
+"""
+
+import random
+import time
+
+from utils.entity_matcher import EntityMatcher
+from utils.ner_extraction import (
+    DISEASE_KEYWORDS, SYMPTOM_KEYWORDS, LAB_UNITS, GENE_PATTERNS, MEDICATION_PATTERNS, CASE_RULES,
+    extract_entities_from_text
+)
+
+REPORT_SIZE = 1_000_000
+
+_SENTENCES = [
+    "The patient is a 54 year old resident of Spain presenting for follow-up.",
+    "Hemoglobin 11.2 g/dL, glucose 182 mg/dL, TSH 4.1 mIU/L, creatinine 1.1 mg/dL.",
+    "History of type 2 diabetes and hypertension, currently on metformin and lisinopril.",
+    "Sample ID-T3X99 was received in good condition; painting of slides completed.",
+    "Genetic testing revealed a pathogenic BRCA1 variant; TP53 and KRAS were wild type.",
+    "Reports intermittent headache, fatigue and shortness of breath on exertion.",
+    "No evidence of pneumonia or tuberculosis on the chest radiograph.",
+    "Microscopic examination shows unremarkable tissue architecture without atypia.",
+]
+
+
+def _report(size: int) -> str:
+    random.seed(7)
+    parts = []
+    length = 0
+    while length < size:
+        sentence = random.choice(_SENTENCES)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:size]
+
+
+def _legacy_extract(text, lexicon):
+    """The per-keyword substring scan previously used by extract_entities_from_text"""
+    text_lower = text.lower()
+    found = {}
+    for category, terms in lexicon.items():
+        if category == "genes":
+            found[category] = [term for term in terms if term in text]
+        else:
+            found[category] = [term for term in terms if term.lower() in text_lower]
+    return found
+
+
+def _time(fn, repeat=3):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main():
+    text = _report(REPORT_SIZE)
+    builtin = {
+        "diseases": DISEASE_KEYWORDS,
+        "symptoms": SYMPTOM_KEYWORDS,
+        "lab_values": list(LAB_UNITS),
+        "genes": GENE_PATTERNS,
+        "medications": MEDICATION_PATTERNS,
+    }
+    random.seed(11)
+    large = dict(builtin)
+    large["diseases"] = DISEASE_KEYWORDS + [
+        "".join(random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(random.randint(6, 14)))
+        for _ in range(5000)
+    ]
+
+    print(f"report: {len(text):,} chars")
+    print(f"{'lexicon':12} {'terms':>6} {'compile ms':>11} {'legacy ms':>10} {'matcher ms':>11} {'legacy found':>13} {'matcher found':>14} {'mentions':>9}")
+    for name, lexicon in (("built-in", builtin), ("synthetic", large)):
+        terms = sum(len(items) for items in lexicon.values())
+        compile_ms, matcher = _time(lambda: EntityMatcher(lexicon, CASE_RULES), repeat=1)
+        legacy_ms, legacy = _time(lambda: _legacy_extract(text, lexicon))
+        matcher_ms, mentions = _time(lambda: matcher.find_all(text))
+        legacy_found = sum(len(items) for items in legacy.values())
+        matcher_found = len({(m["category"], m["term"]) for m in mentions})
+        print(f"{name:12} {terms:>6} {compile_ms:>11.1f} {legacy_ms:>10.1f} {matcher_ms:>11.1f} {legacy_found:>13} {matcher_found:>14} {len(mentions):>9}")
+
+    # Terms the substring scan reports that are not whole words (e.g. "pain" in "Spain")
+    legacy = _legacy_extract(text, builtin)
+    current = extract_entities_from_text(text)
+    for category, terms in legacy.items():
+        names = [item["name"] if isinstance(item, dict) else item for item in current[category]]
+        extra = sorted(set(terms) - set(names))
+        if extra:
+            print(f"substring-only matches in {category}: {', '.join(extra)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: PDF text extraction
+
+Writes synthetic lab reports of 10, 100 and 1000 pages with fpdf and extracts their
+text with utils.pdf_processor.extract_pdf_pages, serially and across the process pool
+(PDF_POOL_SIZE processes). The pool is started before timing, as it is in a running
+web worker. Pages per second are reported per mode, with the mode the automatic choice
+picks. The largest report is then run through entity extraction twice: joined text
+first, and pages streamed from iter_pdf_pages into the chunked extractor. Last, an
+image-only scan of the same length shows how soon iter_pdf_pages gives up on it.
+
+Run from the repository root:
+    python -m benchmarks.bench_pdf_extraction [pages ...]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+
+from fpdf import FPDF
+
+from utils.ner_extraction import extract_entities_from_chunks, extract_entities_from_text, iter_entities_from_chunks
+from utils.pdf_processor import (PDF_POOL_SIZE, PDF_PARALLEL_MIN_PAGES, NoExtractableTextError, extract_pdf_pages,
+                                 get_pdf_pool, iter_pdf_pages)
+
+_TESTS = [("Hemoglobin", "g/dL", 11, 17), ("Glucose", "mg/dL", 70, 180), ("Creatinine", "mg/dL", 0.5, 1.8),
+          ("Cholesterol", "mg/dL", 140, 280), ("TSH", "mIU/L", 0.3, 6), ("Sodium", "mmol/L", 130, 148),
+          ("Potassium", "mmol/L", 3.2, 5.6), ("ALT", "U/L", 10, 80), ("WBC", "10^3/uL", 3, 13)]
+
+
+def _write_report(path: str, pages: int):
+    rng = random.Random(pages)
+    pdf = FPDF()
+    pdf.set_font("Arial", size=10)
+    for page in range(pages):
+        pdf.add_page()
+        pdf.cell(0, 8, f"Laboratory report - page {page + 1} of {pages}", ln=1)
+        pdf.cell(0, 8, "Patient: Jane Doe  DOB: 1970-01-01  Specimen: serum", ln=1)
+        for _ in range(30):
+            name, unit, low, high = rng.choice(_TESTS)
+            pdf.cell(0, 7, f"{name}: {rng.uniform(low, high):.1f} {unit} (reference {low}-{high})", ln=1)
+        pdf.multi_cell(0, 6, "Impression: findings consistent with type 2 diabetes; history of hypertension. "
+                             "Genetic testing showed BRCA1 c.68_69delAG (heterozygous).")
+    pdf.output(path, "F")
+
+
+def _write_scan(path: str, pages: int):
+    pdf = FPDF()
+    for _ in range(pages):
+        pdf.add_page()
+        pdf.rect(10, 10, 190, 270, "F")
+    pdf.output(path, "F")
+
+
+def _timed(run):
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    # Tracing slows Python code down, so memory is measured on a second run
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def _first_entities(path: str) -> float:
+    started = time.perf_counter()
+    chunks = (text + "\n\n" for _, text in iter_pdf_pages(path))
+    for _ in iter_entities_from_chunks(chunks):
+        break
+    return time.perf_counter() - started
+
+
+def main():
+    sizes = [int(value) for value in sys.argv[1:]] or [10, 100, 1000]
+    get_pdf_pool().submit(int).result()
+    print(f"pool: {PDF_POOL_SIZE} processes, parallel from {PDF_PARALLEL_MIN_PAGES} pages")
+    print(f"{'pages':>6} {'MB':>6} {'mode':>9} {'seconds':>8} {'pages/s':>8} {'chars':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for pages in sizes:
+            path = os.path.join(workdir, f"report{pages}.pdf")
+            _write_report(path, pages)
+            for parallel in (False, True, None):
+                texts, stats = extract_pdf_pages(path, parallel=parallel)
+                mode = stats["mode"] if parallel is not None else f"auto:{stats['mode'][:3]}"
+                print(f"{pages:>6} {os.path.getsize(path) / 1e6:>6.2f} {mode:>9} {stats['elapsed_s']:>8.2f} "
+                      f"{stats['pages_per_s']:>8} {sum(len(text) for text in texts):>9}")
+
+        pages = max(sizes)
+        path = os.path.join(workdir, f"report{pages}.pdf")
+        joined = _timed(lambda: extract_entities_from_text("".join(text + "\n\n"
+                                                                   for text in extract_pdf_pages(path)[0])))
+        streamed = _timed(lambda: extract_entities_from_chunks(text + "\n\n" for _, text in iter_pdf_pages(path)))
+        print(f"\nentities from {pages} pages: joined text {joined[0]:.2f}s / {joined[1]:.1f} MB peak, "
+              f"streamed pages {streamed[0]:.2f}s / {streamed[1]:.1f} MB peak, "
+              f"first streamed entities after {_first_entities(path) * 1000:.0f} ms")
+
+        path = os.path.join(workdir, f"scan{pages}.pdf")
+        _write_scan(path, pages)
+        started = time.perf_counter()
+        extract_pdf_pages(path)
+        full = time.perf_counter() - started
+        stats = {}
+        started = time.perf_counter()
+        try:
+            for _ in iter_pdf_pages(path, stats=stats):
+                pass
+        except NoExtractableTextError:
+            pass
+        print(f"image-only scan of {pages} pages: all pages read in {full:.2f}s, "
+              f"given up after {stats['extracted'] + 1} pages in {time.perf_counter() - started:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
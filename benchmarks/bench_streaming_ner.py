@@ -0,0 +1,77 @@
+"""
+Benchmark: whole-text vs streaming (page by page) entity extraction
+
+Generates a synthetic multi-page report and compares, for extracting its entities:
+    - joining every page and calling extract_entities_from_text
+    - feeding the pages to iter_entities_from_chunks
+Peak traced memory, total time and the time until the first entities are available
+are reported for both.
+
+Run from the repository root:
+    python -m benchmarks.bench_streaming_ner [pages]
+"""
+
+import sys
+import time
+import random
+import tracemalloc
+
+from utils.ner_extraction import extract_entities_from_text, iter_entities_from_chunks
+
+_LINES = [
+    "Glucose (fasting): {v:.1f} mmol/L (3.9-5.5)",
+    "Hemoglobin {v:.1f} g/dL [ref 12.0 - 15.5]",
+    "The patient reports shortness of breath, fatigue and intermittent headache.",
+    "History of hypertension and type 2 diabetes, currently on metformin and lisinopril.",
+    "Molecular testing: BRCA1 variant of uncertain significance; EGFR wild type.",
+    "Specimen received in good condition, findings described below with clinical correlation advised.",
+]
+
+
+def _pages(count: int, size: int = 3000):
+    # Pages are generated lazily, as a PDF reader would produce them
+    rng = random.Random(6)
+    for _ in range(count):
+        lines = []
+        length = 0
+        while length < size:
+            line = rng.choice(_LINES).format(v=rng.uniform(1, 20))
+            lines.append(line)
+            length += len(line) + 1
+        yield "\n".join(lines) + "\n\n"
+
+
+def _whole(pages: int):
+    text = "".join(_pages(pages))
+    return extract_entities_from_text(text), None
+
+
+def _streaming(pages: int):
+    first = None
+    started = time.perf_counter()
+    for entities in iter_entities_from_chunks(_pages(pages)):
+        if first is None and any(entities.values()):
+            first = time.perf_counter() - started
+    return entities, first
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"{pages} pages of ~3 KB")
+    print(f"{'mode':12} {'total ms':>9} {'first entities ms':>18} {'peak MB':>8}")
+    results = []
+    for label, run in (("whole text", _whole), ("streaming", _streaming)):
+        tracemalloc.start()
+        started = time.perf_counter()
+        entities, first = run(pages)
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append(entities)
+        first_ms = (first if first is not None else total) * 1000
+        print(f"{label:12} {total * 1000:>9.0f} {first_ms:>18.1f} {peak / 1e6:>8.1f}")
+    print(f"same entities: {results[0] == results[1]}")
+
+
+if __name__ == "__main__":
+    main()
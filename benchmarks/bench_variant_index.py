@@ -0,0 +1,86 @@
+"""
+Benchmark: clinical significance lookups in the memory-mapped variant index
+
+Writes a synthetic ClinVar-style dump (variant_summary.txt columns, GRCh38 and GRCh37
+rows), compiles it with utils.variant_index, then times single lookups by position,
+rsID and HGVS name, and batch lookups of a sorted panel of variants.
+
+Run from the repository root:
+    python -m benchmarks.bench_variant_index [records]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+from utils.variant_index import VariantIndex, build_variant_index
+
+_HEADER = ["#AlleleID", "Type", "Name", "GeneSymbol", "ClinicalSignificance", "RS# (dbSNP)", "PhenotypeList",
+           "Assembly", "Chromosome", "ReviewStatus", "PositionVCF", "ReferenceAlleleVCF", "AlternateAlleleVCF"]
+_SIGNIFICANCE = ["Pathogenic", "Likely pathogenic", "Uncertain significance", "Likely benign", "Benign"]
+
+
+def _write_dump(path: str, records: int) -> list:
+    rng = random.Random(9)
+    variants = []
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write("\t".join(_HEADER) + "\n")
+        for number in range(records):
+            chrom = str(rng.randint(1, 22))
+            pos = rng.randint(1, 200_000_000)
+            ref, alt = rng.sample("ACGT", 2)
+            gene = f"GENE{number % 20000}"
+            cdna = f"c.{rng.randint(1, 9000)}{ref}>{alt}"
+            variants.append((chrom, pos, ref, alt, f"rs{number + 1}", gene, cdna))
+            for assembly in ("GRCh37", "GRCh38"):
+                handle.write("\t".join([
+                    str(number), "single nucleotide variant", f"NM_{number:06d}.1({gene}):{cdna} (p.?)", gene,
+                    rng.choice(_SIGNIFICANCE), str(number + 1), "Hereditary cancer-predisposing syndrome|not provided",
+                    assembly, chrom, "criteria provided, single submitter", str(pos), ref, alt
+                ]) + "\n")
+    return variants
+
+
+def _rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:>12,.0f}/s"
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    with tempfile.TemporaryDirectory() as workdir:
+        dump = os.path.join(workdir, "variant_summary.txt")
+        variants = _write_dump(dump, records)
+        index_path = os.path.join(workdir, "variant_index.bin")
+
+        started = time.perf_counter()
+        summary = build_variant_index(dump, index_path)
+        print(f"index: {summary['records']:,} records, {summary['rsids']:,} rsIDs, "
+              f"{summary['bytes'] / 1e6:.1f} MB, build {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        index = VariantIndex(index_path)
+        print(f"open: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        rng = random.Random(10)
+        sample = rng.sample(variants, 20_000)
+        checks = [
+            ("by position", lambda v: index.lookup(v[0], v[1], v[2], v[3])),
+            ("by rsID", lambda v: index.lookup_rsid(v[4])),
+            ("by HGVS name", lambda v: index.lookup_hgvs(v[5], v[6])),
+        ]
+        for label, lookup in checks:
+            started = time.perf_counter()
+            found = sum(1 for variant in sample if lookup(variant) is not None)
+            print(f"{label:24} {_rate(len(sample), time.perf_counter() - started)}  found {found:,}/{len(sample):,}")
+
+        panel = sorted(sample[:5_000], key=lambda v: (int(v[0]), v[1]))
+        queries = [variant[:4] for variant in panel]
+        started = time.perf_counter()
+        found = sum(1 for annotation in index.lookup_many(queries) if annotation is not None)
+        print(f"{'batch (5,000 variants)':24} {_rate(len(queries), time.perf_counter() - started)}  found {found:,}/{len(queries):,}")
+
+
+if __name__ == "__main__":
+    main()
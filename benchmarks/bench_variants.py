@@ -0,0 +1,62 @@
+"""
+Benchmark: variant extraction from genomic report sections
+
+Times utils.variants.extract_variants on synthetic genomics sections with hundreds to
+tens of thousands of variant lines (gene, HGVS c./p. notation, rsID and zygosity mixed
+with narrative text), and reports the hit rate of the memoized notation normalizers.
+
+Run from the repository root:
+    python -m benchmarks.bench_variants
+"""
+
+import random
+import time
+
+from utils.variants import extract_variants, normalize_cdna, normalize_protein
+
+_GENES = ["BRCA1", "BRCA2", "TP53", "EGFR", "KRAS", "BRAF", "PTEN", "MLH1", "MSH2", "APC", "CYP2C19", "TPMT"]
+_TEMPLATES = [
+    "{zyg} {gene} c.{pos}{ref}>{alt} (p.{aa1}{codon}{aa2}), {rsid}",
+    "{gene} c.{pos}_{end}del{ref}{alt} p.({aa1}{codon}fs), {zyg}",
+    "NM_000{num}.3({gene}):c.{pos}dup{alt} {zyg}",
+    "{gene} {aa1}{codon}{aa2} detected in {vaf}% of reads",
+    "{rsid} {zyg}",
+    "Coverage was adequate across the panel; no copy number changes were identified.",
+]
+
+
+def _section(lines: int) -> str:
+    rng = random.Random(7)
+    rows = []
+    for _ in range(lines):
+        pos = rng.randint(1, 300)
+        rows.append(rng.choice(_TEMPLATES).format(
+            zyg=rng.choice(["Heterozygous", "homozygous", "het"]), gene=rng.choice(_GENES),
+            pos=pos, end=pos + 1, ref=rng.choice("ACGT"), alt=rng.choice("ACGT"),
+            aa1=rng.choice("ACDEFGHIKLMNPQRSTVWY"), aa2=rng.choice("ACDEFGHIKLMNPQRSTVWY"),
+            codon=rng.randint(1, 300), rsid=f"rs{rng.randint(1, 5000)}", num=rng.randint(100, 999),
+            vaf=rng.randint(5, 60)
+        ))
+    return "\n".join(rows)
+
+
+def _hit_rate(info) -> float:
+    return info.hits / max(info.hits + info.misses, 1)
+
+
+def main():
+    print(f"{'lines':>7} {'chars':>10} {'variants':>9} {'ms':>8} {'variants/s':>11} {'c. cache hits':>14} {'p. cache hits':>14}")
+    for lines in (100, 500, 5_000, 50_000):
+        text = _section(lines)
+        normalize_cdna.cache_clear()
+        normalize_protein.cache_clear()
+        started = time.perf_counter()
+        variants = extract_variants(text)
+        elapsed = time.perf_counter() - started
+        cdna, protein = normalize_cdna.cache_info(), normalize_protein.cache_info()
+        print(f"{lines:>7} {len(text):>10} {len(variants):>9} {elapsed * 1000:>8.1f} "
+              f"{len(variants) / elapsed:>11.0f} {_hit_rate(cdna):>14.0%} {_hit_rate(protein):>14.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: streaming VCF ingestion
+
+Writes a synthetic whole-genome-style VCF (records spread over all chromosomes, a small
+share inside the gene panel, some of them VEP-annotated), plain and gzip compressed,
+and runs utils.vcf_ingest.extract_entities_from_vcf on both. Throughput in records per
+second and peak traced memory are reported for growing file sizes; peak memory should
+stay flat.
+
+Run from the repository root:
+    python -m benchmarks.bench_vcf [records]
+"""
+
+import os
+import sys
+import gzip
+import random
+import tempfile
+import tracemalloc
+
+from utils.vcf_ingest import extract_entities_from_vcf, get_gene_panel
+
+_HEADER = (
+    "##fileformat=VCFv4.2\n"
+    '##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence annotations from Ensembl VEP. '
+    'Format: Allele|Consequence|IMPACT|SYMBOL|Gene|HGVSc|HGVSp">\n'
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n"
+)
+# Panel gene spans (chromosome, start, end, gene) used to place in-panel records
+_PANEL_SPANS = [("17", 43044295, 43125483, "BRCA1"), ("7", 140719327, 140924929, "BRAF"),
+                ("13", 32315474, 32400266, "BRCA2"), ("10", 94762681, 94855547, "CYP2C19")]
+
+
+def _write_vcf(path: str, records: int, compress: bool):
+    rng = random.Random(8)
+    opener = gzip.open if compress else open
+    with opener(path, "wt", encoding="utf-8") as handle:
+        handle.write(_HEADER)
+        for number in range(records):
+            ref, alt = rng.sample("ACGT", 2)
+            genotype = rng.choice(["0/1", "1/1", "0/0"])
+            if rng.random() < 0.01:
+                chrom, start, end, gene = rng.choice(_PANEL_SPANS)
+                pos = rng.randint(start, end)
+                impact = rng.choice(["HIGH", "MODERATE", "LOW", "MODIFIER"])
+                info = f"CSQ={alt}|missense_variant|{impact}|{gene}|ENSG|ENST:c.{pos % 3000}{ref}>{alt}|ENSP:p.Val{pos % 900}Glu"
+            else:
+                chrom, pos, info = str(rng.randint(1, 22)), rng.randint(1, 200_000_000), "DP=30"
+            handle.write(f"chr{chrom}\t{pos}\trs{number}\t{ref}\t{alt}\t{rng.randint(10, 99)}\tPASS\t{info}\tGT:DP\t{genotype}:30\n")
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    get_gene_panel()
+    print(f"{'records':>9} {'format':>7} {'MB':>7} {'in panel':>9} {'kept':>6} {'seconds':>8} {'records/s':>10} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for records in (largest // 10, largest):
+            for compress in (False, True):
+                path = os.path.join(workdir, f"sample{records}.vcf" + (".gz" if compress else ""))
+                _write_vcf(path, records, compress)
+                tracemalloc.start()
+                _, stats = extract_entities_from_vcf(path)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                # Tracing slows Python code down, so throughput is measured on a second, untraced run
+                _, stats = extract_entities_from_vcf(path)
+                print(f"{records:>9} {'gzip' if compress else 'plain':>7} {os.path.getsize(path) / 1e6:>7.1f} "
+                      f"{stats['in_panel']:>9} {stats['kept']:>6} {stats['elapsed_s']:>8.2f} "
+                      f"{stats['records_per_s']:>10} {peak / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
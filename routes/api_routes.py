@@ -1,13 +1,28 @@
+import itertools
+import json
 import logging
 import os
-from flask import Blueprint, request, jsonify, send_file, session, current_app
+import time
+from flask import Blueprint, request, jsonify, send_file, session, current_app, Response, url_for, stream_with_context
+from flask_login import current_user
 from extensions import db  # Import db from extensions, not models
 from models import User, Profile, Report, Therapy  # Import only the models from models
-from utils.ner_extraction import extract_entities_from_text
-from utils.gemini_integration import get_therapy_recommendations, select_medical_approach
+from utils.ner_extraction import extract_entities_from_text, find_entity_mentions
+from utils.batch_extraction import iter_batch_results
+from utils.gemini_integration import get_cached_therapy_recommendations, get_therapy_recommendations, select_medical_approach, stream_therapy_recommendations
 from utils.therapy_ranking import rank_therapies
-from utils.agent_integration import get_agent_recommendations, select_approach_with_agent
+from utils.pharmacogenomics import check_medications, flag_therapies
+from utils.drug_interactions import check_interactions, flag_interactions
+from utils.agent_integration import run_agents_concurrently, stream_agent_recommendations, select_approach_with_agent
 from utils.pdf_generator import generate_therapy_report
+from utils.hedging import get_hedging_stats
+from utils.llm_providers import get_provider_stats
+from utils.llm_transport import get_transport_stats
+from utils.prompt_builder import get_prompt_stats
+from utils.recommendation_cache import get_recommendation_cache
+from utils.document_cache import get_document_cache
+from utils.job_queue import get_job_queue
+from utils.single_flight import get_single_flight
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,6 +30,18 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 api_bp = Blueprint('api', __name__)
 
+def _sse(event, data):
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _sse_response(events):
+    """Wrap an event generator in an unbuffered text/event-stream response"""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @api_bp.route('/extract-entities', methods=['POST'])
 def extract_entities():
     """API endpoint to extract entities from text"""
@@ -24,11 +51,85 @@ def extract_entities():
     
     try:
         entities = extract_entities_from_text(data['text'])
-        return jsonify({'entities': entities})
+        result = {'entities': entities}
+        if data.get('include_offsets'):
+            result['mentions'] = find_entity_mentions(data['text'])
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error extracting entities: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def _iter_batch_documents():
+    """Yield (id, text) pairs from a JSON array or NDJSON request body"""
+    content_type = (request.mimetype or '').lower()
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/ndjson'):
+        # Read line by line so large uploads are never held in memory
+        items = (_parse_ndjson_line(line) for line in request.stream if line.strip())
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('documents')
+        if not isinstance(data, list):
+            raise ValueError('Expected a JSON array of documents or an NDJSON body')
+        items = iter(data)
+
+    for position, item in enumerate(items):
+        if isinstance(item, dict):
+            yield item.get('id', position), item.get('text')
+        else:
+            yield position, item
+
+def _parse_ndjson_line(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+@api_bp.route('/extract-entities/batch', methods=['POST'])
+def extract_entities_batch():
+    """API endpoint to extract entities from many documents, streamed back as NDJSON"""
+    documents = _iter_batch_documents()
+    try:
+        # Validate the body before the streaming response starts
+        first = next(documents, None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if first is None:
+        return jsonify({'error': 'No documents provided'}), 400
+
+    def generate():
+        batch_started = time.perf_counter()
+        count = 0
+        for result in iter_batch_results(itertools.chain([first], documents)):
+            count += 1
+            yield json.dumps(result) + "\n"
+        logger.info(f"Extracted entities from {count} documents in {time.perf_counter() - batch_started:.2f}s")
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@api_bp.route('/drug-interactions', methods=['POST'])
+def drug_interactions():
+    """API endpoint to check medications and therapies for drug-drug interactions"""
+    data = request.json
+    if not data or not (data.get('medications') or data.get('therapies')):
+        return jsonify({'error': 'No medications or therapies provided'}), 400
+    
+    medications = data.get('medications') or ''
+    if isinstance(medications, list):
+        medications = '; '.join(str(item) for item in medications)
+    # Therapies may be names or therapy objects as returned by the recommendation endpoints
+    therapies = [therapy if isinstance(therapy, dict) else {'therapy_name': str(therapy)}
+                 for therapy in data.get('therapies') or []]
+    
+    try:
+        return jsonify({
+            'interactions': check_interactions({'current_medications': medications}, {}, therapies)
+        })
+    except Exception as e:
+        logger.error(f"Error checking drug interactions: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/get-recommendations', methods=['POST'])
 def get_recommendations():
     """API endpoint to get therapy recommendations"""
@@ -50,9 +151,13 @@ def get_recommendations():
             data['query']
         )
         
-        ranked_therapies = rank_therapies(recommendations)
+        ranked_therapies = flag_therapies(rank_therapies(recommendations), data['entities'])
+        flag_interactions(ranked_therapies, data['profile'], data['entities'])
         
-        return jsonify({'therapies': ranked_therapies})
+        return jsonify({
+            'therapies': ranked_therapies,
+            'drug_interactions': check_interactions(data['profile'], data['entities'], ranked_therapies)
+        })
     except Exception as e:
         logger.error(f"Error getting recommendations: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -71,21 +176,113 @@ def agent_recommendations():
         return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
     
     try:
-        # Use SmolAgents for recommendations
-        recommendations = get_agent_recommendations(
+        # Fan out to the agents in parallel; slow agents are reported, not awaited
+        result = run_agents_concurrently(
             data['agent_type'],
             data['profile'],
             data['entities'],
             data['query']
         )
         
-        ranked_therapies = rank_therapies(recommendations)
+        ranked_therapies = flag_therapies(rank_therapies(result['therapies']), data['entities'])
+        flag_interactions(ranked_therapies, data['profile'], data['entities'])
         
-        return jsonify({'therapies': ranked_therapies})
+        return jsonify({
+            'therapies': ranked_therapies,
+            'drug_interactions': check_interactions(data['profile'], data['entities'], ranked_therapies),
+            'timed_out_agents': result['timed_out'],
+            'failed_agents': result['failed'],
+            'agent_latency_ms': result['latency']
+        })
     except Exception as e:
         logger.error(f"Error getting agent recommendations: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/agent-recommendations/stream', methods=['POST'])
+def agent_recommendations_stream():
+    """API endpoint that streams agent therapies over Server-Sent Events as they are generated"""
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    required_fields = ['agent_type', 'profile', 'entities', 'query']
+    missing_fields = [field for field in required_fields if field not in data]
+    
+    if missing_fields:
+        return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+    
+    def generate():
+        latency = {}
+        timed_out = []
+        failed = []
+        therapies = []
+        try:
+            for event, agent, payload in stream_agent_recommendations(
+                data['agent_type'],
+                data['profile'],
+                data['entities'],
+                data['query']
+            ):
+                if event == 'therapy':
+                    # Fill in overall_score, pharmacogenomic and drug interaction contraindications
+                    # the same way the batch endpoint does
+                    therapy = flag_therapies(rank_therapies([payload]), data['entities'])
+                    therapy = flag_interactions(therapy, data['profile'], data['entities'])[0]
+                    therapies.append(therapy)
+                    yield _sse('therapy', {'agent': agent, 'therapy': therapy})
+                elif event == 'done':
+                    latency[agent] = payload
+                elif event == 'timeout':
+                    latency[agent] = payload
+                    timed_out.append(agent)
+                else:
+                    failed.append(agent)
+        except Exception as e:
+            logger.error(f"Error streaming agent recommendations: {str(e)}")
+            yield _sse('error', {'error': str(e)})
+        # Each therapy was only checked against the current medications as it arrived;
+        # this also covers pairs across the streamed therapies
+        yield _sse('interactions', {
+            'drug_interactions': check_interactions(data['profile'], data['entities'], therapies)
+        })
+        yield _sse('done', {
+            'timed_out_agents': timed_out,
+            'failed_agents': failed,
+            'agent_latency_ms': latency
+        })
+    
+    return _sse_response(generate())
+
+@api_bp.route('/recommendations/stream', methods=['GET'])
+def recommendations_stream():
+    """API endpoint that streams the pending recommendation request in the session over Server-Sent Events"""
+    pending = session.get('pending_recommendation')
+    if not pending:
+        return jsonify({'error': 'No pending recommendation request in session'}), 400
+    
+    profile = session.get('profile', {})
+    entities = session.get('report', {}).get('extracted_entities', {})
+    
+    def generate():
+        therapies = []
+        try:
+            for therapy in stream_therapy_recommendations(
+                pending['agent_type'],
+                profile,
+                entities,
+                pending['query']
+            ):
+                ranked = flag_therapies(rank_therapies([therapy]), entities)
+                therapies.append(flag_interactions(ranked, profile, entities)[0])
+                yield _sse('therapy', therapies[-1])
+        except Exception as e:
+            logger.error(f"Error streaming recommendations: {str(e)}")
+            yield _sse('error', {'error': str(e)})
+        yield _sse('interactions', {'drug_interactions': check_interactions(profile, entities, therapies)})
+        yield _sse('done', {'count': len(therapies)})
+    
+    return _sse_response(generate())
+
 @api_bp.route('/select-approach-agent', methods=['POST'])
 def select_approach_agent():
     """API endpoint to select medical approach using SmolAgents"""
@@ -115,8 +312,43 @@ def export_report():
         extracted_entities = report.get('extracted_entities', {})
         query = request.args.get('query', 'What are my therapy options?')
         
+        # Generated therapies are not written back to the session; they are the result
+        # of the recommendation job (or, for streamed results, in the recommendation
+        # cache). The report waits for them rather than calling the LLM in this request.
+        pending = session.get('pending_recommendation')
+        if not therapies and pending:
+            if pending.get('job_id'):
+                job = get_job_queue().get(pending['job_id'])
+                if job is None:
+                    return jsonify({'error': 'The recommendations have expired; please generate them again'}), 409
+                if job['status'] == 'failed':
+                    return jsonify({'error': f"Error generating recommendations: {job['error']}",
+                                    'status': job['status']}), 409
+                if job['status'] != 'succeeded':
+                    return jsonify({
+                        'error': 'Recommendations are still being generated',
+                        'status': job['status'],
+                        'stage': job['stage'],
+                        'progress': job['progress'],
+                        'status_url': url_for('api.job_status', job_id=job['id'])
+                    }), 202
+                therapies = job['result']['therapies']
+            else:
+                cached = get_cached_therapy_recommendations(
+                    pending['agent_type'],
+                    profile,
+                    extracted_entities,
+                    pending['query']
+                )
+                if cached is None:
+                    return jsonify({'error': 'Recommendations are still being generated'}), 409
+                therapies = rank_therapies(cached)
+            query = pending['query']
+        
         if not therapies:
             return jsonify({'error': 'No therapy recommendations found in session'}), 400
+        flag_therapies(therapies, extracted_entities)
+        flag_interactions(therapies, profile, extracted_entities)
         
         # Create output directory if it doesn't exist
         output_dir = os.path.join(os.getcwd(), 'uploads')
@@ -129,7 +361,9 @@ def export_report():
             therapies=therapies,
             agent_type=agent_type,
             query=query,
-            output_path=output_dir
+            output_path=output_dir,
+            pgx_alerts=check_medications(profile, extracted_entities),
+            drug_interactions=check_interactions(profile, extracted_entities, therapies)
         )
         
         # Return the file
@@ -145,3 +379,25 @@ def export_report():
         logger.error(f"Error generating PDF report: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """API endpoint to poll a background job (report analysis or recommendation) for its stage, progress and result"""
+    job = get_job_queue().get(job_id)
+    owner = str(current_user.id) if current_user.is_authenticated else None
+    if job is None or job['owner'] not in (None, owner):
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@api_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """API endpoint to report per-process LLM performance metrics"""
+    return jsonify({
+        'providers': get_provider_stats(),
+        'prompts': get_prompt_stats(),
+        'hedging': get_hedging_stats(),
+        'transport': get_transport_stats(),
+        'recommendation_cache': get_recommendation_cache().stats(),
+        'document_cache': get_document_cache().stats(),
+        'jobs': get_job_queue().stats(),
+        'single_flight': get_single_flight().stats()
+    })
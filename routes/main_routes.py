@@ -5,10 +5,11 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from werkzeug.utils import secure_filename
 from extensions import db  # Import db from extensions, not models
 from models import User, Profile, Report, Therapy  # Import only the models from models
-from utils.ner_extraction import extract_entities_from_text
-from utils.gemini_integration import get_therapy_recommendations, select_medical_approach
-from utils.therapy_ranking import rank_therapies
-from utils.pdf_processor import extract_text_from_pdf, save_uploaded_pdf
+from utils.gemini_integration import select_medical_approach
+from utils.upload_store import store_upload
+from utils.job_queue import get_job_queue, submit_job
+from utils.pharmacogenomics import check_medications, flag_therapies
+from utils.drug_interactions import check_interactions, flag_interactions
 from flask_login import login_required, current_user
 
 # Configure logging
@@ -17,6 +18,19 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 main_bp = Blueprint('main', __name__)
 
+# Accepted genomic variant uploads (plain, gzip or BGZF compressed)
+VCF_EXTENSIONS = ('.vcf', '.vcf.gz', '.vcf.bgz')
+
+def _current_owner():
+    """Owner recorded on the jobs of the current user (None when signed out)"""
+    return str(current_user.id) if current_user.is_authenticated else None
+
+def _job_accepted(job_id, page_url):
+    """Answer a queued job: 202 with its id for API clients, a redirect to the page that follows it for browsers"""
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({'job_id': job_id, 'status_url': url_for('api.job_status', job_id=job_id)}), 202
+    return redirect(page_url)
+
 @main_bp.route('/')
 def index():
     """Render the home page"""
@@ -51,52 +65,52 @@ def analysis():
         report_text = request.form.get('report_text')
         report_file = request.files.get('report_file')
         
-        # Check if we have a file upload
-        if report_file and report_file.filename and report_file.filename.endswith('.pdf'):
-            try:
-                logger.info(f"Processing uploaded PDF file: {report_file.filename}")
-                # Extract text from PDF
-                pdf_text = extract_text_from_pdf(report_file)
-                
-                # Save PDF file for reference
-                uploads_dir = os.path.join(os.getcwd(), 'uploads')
-                safe_filename = secure_filename(report_file.filename)
-                save_path = save_uploaded_pdf(report_file, uploads_dir)
-                
-                if not pdf_text or not pdf_text.strip():
-                    flash('The uploaded PDF did not contain any extractable text. Please try a different file or enter text manually.', 'warning')
-                    return redirect(url_for('main.analysis'))
-                
-                # Use the PDF text for analysis
-                report_text = pdf_text
-                
+        # Parsing and entity extraction run in a job worker (utils/analysis_jobs.py);
+        # uploads are only saved here, once, under their content hash
+        try:
+            if report_file and report_file.filename and report_file.filename.lower().endswith(VCF_EXTENSIONS):
+                logger.info(f"Queueing uploaded VCF file: {report_file.filename}")
+                extension = next(ext for ext in VCF_EXTENSIONS if report_file.filename.lower().endswith(ext))
+                upload = store_upload(report_file.stream, extension)
+                payload = {
+                    'source': 'vcf',
+                    'path': upload['path'],
+                    'document_hash': upload['sha256'],
+                    'filename': report_file.filename
+                }
+            elif report_file and report_file.filename and report_file.filename.endswith('.pdf'):
+                logger.info(f"Queueing uploaded PDF file: {report_file.filename}")
+                upload = store_upload(report_file.stream, '.pdf')
+                payload = {
+                    'source': 'pdf',
+                    'path': upload['path'],
+                    'document_hash': upload['sha256'],
+                    'filename': report_file.filename
+                }
                 # Store original filename in session
-                session['pdf_filename'] = safe_filename
-            except Exception as e:
-                logger.error(f"Error processing PDF: {str(e)}")
-                flash(f'Error processing PDF: {str(e)}', 'error')
+                session['pdf_filename'] = secure_filename(report_file.filename)
+            elif report_text and report_text.strip():
+                payload = {'source': 'text', 'text': report_text}
+            else:
+                flash('Please either upload a PDF or enter report text', 'error')
                 return redirect(url_for('main.analysis'))
-        
-        # Check if we have any text to process
-        if not report_text or not report_text.strip():
-            flash('Please either upload a PDF or enter report text', 'error')
-            return redirect(url_for('main.analysis'))
-        
-        try:
-            # Extract entities from the report text
-            extracted_entities = extract_entities_from_text(report_text)
             
-            # Store in session for this demo
-            session['report'] = {
-                'text': report_text,
-                'extracted_entities': extracted_entities
-            }
-            
-            # Redirect to agent selection
-            return redirect(url_for('main.select_agent'))
-        except Exception as e:
-            logger.error(f"Error processing report: {str(e)}")
+            job_id = submit_job('analysis', payload, owner=_current_owner())
+        except (ValueError, OSError) as e:
+            logger.error(f"Error saving report: {str(e)}")
             flash(f'Error processing report: {str(e)}', 'error')
+            return redirect(url_for('main.analysis'))
+        
+        return _job_accepted(job_id, url_for('main.analysis', job=job_id))
+    
+    # The page polls a queued analysis and moves on to agent selection once it is done
+    job_id = request.args.get('job')
+    if job_id:
+        return render_template(
+            'analysis.html',
+            job_url=url_for('api.job_status', job_id=job_id),
+            next_url=url_for('main.select_agent', job=job_id)
+        )
     
     return render_template('analysis.html')
 
@@ -111,34 +125,49 @@ def select_agent():
             flash('Please select an agent type', 'error')
             return redirect(url_for('main.select_agent'))
         
-        try:
-            # Get profile and report data from session
-            profile = session.get('profile', {})
-            report = session.get('report', {})
-            
-            # Get therapy recommendations
-            therapy_recommendations = get_therapy_recommendations(
-                agent_type,
-                profile,
-                report.get('extracted_entities', {}),
-                query
-            )
-            
-            # Rank therapies
-            ranked_therapies = rank_therapies(therapy_recommendations)
-            
-            # Store in session
-            session['therapies'] = ranked_therapies
-            session['agent_type'] = agent_type
-            
-            return redirect(url_for('main.results'))
-        except Exception as e:
-            logger.error(f"Error getting recommendations: {str(e)}")
-            flash(f'Error getting recommendations: {str(e)}', 'error')
+        # Therapies are generated by a job worker (utils/analysis_jobs.py), which the
+        # results page polls, so nothing is generated here
+        job_id = submit_job('recommendation', {
+            'agent_type': agent_type,
+            'profile': session.get('profile', {}),
+            'entities': session.get('report', {}).get('extracted_entities', {}),
+            'query': query
+        }, owner=_current_owner())
+        session['pending_recommendation'] = {
+            'agent_type': agent_type,
+            'query': query,
+            'job_id': job_id
+        }
+        session['therapies'] = []
+        session['agent_type'] = agent_type
+        
+        return _job_accepted(job_id, url_for('main.results'))
     
+    # Coming from a finished analysis job: its report becomes the session's report
+    job_id = request.args.get('job')
+    if job_id:
+        job = get_job_queue().get(job_id)
+        if job is None or job['kind'] != 'analysis' or job['owner'] != _current_owner():
+            flash('That report analysis could not be found. Please upload the report again.', 'error')
+            return redirect(url_for('main.analysis'))
+        if job['status'] == 'failed':
+            flash(job['error'], 'error')
+            return redirect(url_for('main.analysis'))
+        if job['status'] != 'succeeded':
+            return redirect(url_for('main.analysis', job=job_id))
+        session['report'] = {
+            'text': job['result']['text'],
+            'extracted_entities': job['result']['extracted_entities'],
+            'document_hash': job['result']['document_hash']
+        }
+        return redirect(url_for('main.select_agent'))
+    
+    report_entities = session.get('report', {}).get('extracted_entities', {})
     return render_template(
         'select_agent.html',
-        report_entities=session.get('report', {}).get('extracted_entities', {})
+        report_entities=report_entities,
+        pgx_alerts=check_medications(session.get('profile', {}), report_entities),
+        drug_interactions=check_interactions(session.get('profile', {}), report_entities)
     )
 
 @main_bp.route('/approach-selector', methods=['GET', 'POST'])
@@ -193,6 +222,23 @@ def results():
     profile = session.get('profile', {})
     report_entities = session.get('report', {}).get('extracted_entities', {})
     
+    # Therapies that have not been generated yet come from the recommendation job: its
+    # result once it is done, the therapies it has published so far until then
+    pending = session.get('pending_recommendation')
+    stream_url = None
+    job_url = None
+    if not therapies and pending:
+        job = get_job_queue().get(pending['job_id']) if pending.get('job_id') else None
+        if job is None:
+            stream_url = url_for('api.recommendations_stream')
+        elif job['status'] == 'succeeded':
+            therapies = job['result']['therapies']
+        elif job['status'] == 'failed':
+            flash(f"Error generating recommendations: {job['error']}", 'error')
+        else:
+            therapies = job['partial'] or []
+            job_url = url_for('api.job_status', job_id=job['id'])
+    
     # Debug the therapies data
     logger.debug(f"Therapies data for results page: {therapies}")
     
@@ -220,12 +266,21 @@ def results():
         therapy.setdefault('contraindications', [])
         therapy.setdefault('supporting_evidence', '')
     
+    # Pharmacogenomic pairs between the report's genes and the therapies are contraindications,
+    # and so are major interactions between the therapies and the current medications
+    flag_therapies(therapies, report_entities)
+    flag_interactions(therapies, profile, report_entities)
+    
     return render_template(
         'results.html',
         agent_type=agent_type,
         therapies=therapies,
         profile=profile,
-        entities=report_entities
+        entities=report_entities,
+        pgx_alerts=check_medications(profile, report_entities),
+        drug_interactions=check_interactions(profile, report_entities, therapies),
+        stream_url=stream_url,
+        job_url=job_url
     )
 
 @main_bp.route('/reports')
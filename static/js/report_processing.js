@@ -98,3 +98,51 @@ function previewExtraction() {
         showNotification('Analysis complete! Submit the form to continue.', 'success');
     }, 1500);
 }
+
+/**
+ * Poll an analysis job until it finishes, showing its stage and progress
+ * @param {string} url - Status URL of the job (/api/jobs/<id>)
+ * @param {string} nextUrl - Page to go to once the report has been analyzed
+ */
+function pollAnalysisJob(url, nextUrl) {
+    const status = document.getElementById('analysis-status');
+    if (!status) return;
+    const stage = status.querySelector('.analysis-stage');
+    const progressBar = status.querySelector('.progress-bar');
+    
+    function showError(message) {
+        status.className = 'alert alert-danger mb-4';
+        status.querySelector('.alert-heading').textContent = 'The report could not be analyzed';
+        stage.textContent = message;
+        progressBar.parentElement.remove();
+    }
+    
+    function poll() {
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Job status request failed (${response.status})`);
+                }
+                return response.json();
+            })
+            .then(job => {
+                if (job.status === 'succeeded') {
+                    window.location.href = nextUrl;
+                    return;
+                }
+                if (job.status === 'failed') {
+                    showError(job.error || 'Analysis failed.');
+                    return;
+                }
+                stage.textContent = `${job.stage}...`;
+                progressBar.style.width = `${Math.round((job.progress || 0) * 100)}%`;
+                setTimeout(poll, 500);
+            })
+            .catch(error => {
+                console.error("Analysis job error:", error);
+                showError(error.message);
+            });
+    }
+    
+    poll();
+}
@@ -192,61 +192,67 @@ function initScoreCircles() {
     
     console.log(`Found ${scoreCircles.length} score circles`);
     
-    scoreCircles.forEach(circle => {
-        try {
-            const score = parseInt(circle.getAttribute('data-score') || '0');
-            const circumference = 2 * Math.PI * 38; // 38 is the radius of the circle
-            const dashoffset = circumference - (score / 100) * circumference;
-            
-            // Create SVG for circle
-            const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
-            svg.setAttribute('width', '90');
-            svg.setAttribute('height', '90');
-            svg.setAttribute('viewBox', '0 0 90 90');
-            svg.classList.add('score-svg');
-            
-            // Background circle
-            const bgCircle = document.createElementNS('http://www.w3.org/2000/svg', 'circle');
-            bgCircle.setAttribute('cx', '45');
-            bgCircle.setAttribute('cy', '45');
-            bgCircle.setAttribute('r', '38');
-            bgCircle.setAttribute('fill', 'none');
-            bgCircle.setAttribute('stroke', '#e9ecef');
-            bgCircle.setAttribute('stroke-width', '6');
-            
-            // Progress circle
-            const progressCircle = document.createElementNS('http://www.w3.org/2000/svg', 'circle');
-            progressCircle.setAttribute('cx', '45');
-            progressCircle.setAttribute('cy', '45');
-            progressCircle.setAttribute('r', '38');
-            progressCircle.setAttribute('fill', 'none');
-            progressCircle.setAttribute('stroke', getScoreColor(score));
-            progressCircle.setAttribute('stroke-width', '6');
-            progressCircle.setAttribute('stroke-dasharray', circumference);
-            progressCircle.setAttribute('stroke-dashoffset', dashoffset);
-            progressCircle.setAttribute('transform', 'rotate(-90 45 45)');
-            
-            svg.appendChild(bgCircle);
-            svg.appendChild(progressCircle);
-            
-            // Get the score value element
-            const scoreValue = circle.querySelector('.score-value');
-            
-            // Clear the circle and append the SVG and score value
-            circle.innerHTML = '';
-            circle.appendChild(svg);
-            if (scoreValue) {
-                circle.appendChild(scoreValue.cloneNode(true));
-            } else {
-                const newScoreValue = document.createElement('span');
-                newScoreValue.classList.add('score-value');
-                newScoreValue.textContent = score;
-                circle.appendChild(newScoreValue);
-            }
-        } catch (error) {
-            console.error("Error initializing score circle:", error);
+    scoreCircles.forEach(circle => initScoreCircle(circle));
+}
+
+/**
+ * Render the SVG progress ring for a single score circle
+ * @param {Element} circle - Element with a data-score attribute
+ */
+function initScoreCircle(circle) {
+    try {
+        const score = parseInt(circle.getAttribute('data-score') || '0');
+        const circumference = 2 * Math.PI * 38; // 38 is the radius of the circle
+        const dashoffset = circumference - (score / 100) * circumference;
+        
+        // Create SVG for circle
+        const svg = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+        svg.setAttribute('width', '90');
+        svg.setAttribute('height', '90');
+        svg.setAttribute('viewBox', '0 0 90 90');
+        svg.classList.add('score-svg');
+        
+        // Background circle
+        const bgCircle = document.createElementNS('http://www.w3.org/2000/svg', 'circle');
+        bgCircle.setAttribute('cx', '45');
+        bgCircle.setAttribute('cy', '45');
+        bgCircle.setAttribute('r', '38');
+        bgCircle.setAttribute('fill', 'none');
+        bgCircle.setAttribute('stroke', '#e9ecef');
+        bgCircle.setAttribute('stroke-width', '6');
+        
+        // Progress circle
+        const progressCircle = document.createElementNS('http://www.w3.org/2000/svg', 'circle');
+        progressCircle.setAttribute('cx', '45');
+        progressCircle.setAttribute('cy', '45');
+        progressCircle.setAttribute('r', '38');
+        progressCircle.setAttribute('fill', 'none');
+        progressCircle.setAttribute('stroke', getScoreColor(score));
+        progressCircle.setAttribute('stroke-width', '6');
+        progressCircle.setAttribute('stroke-dasharray', circumference);
+        progressCircle.setAttribute('stroke-dashoffset', dashoffset);
+        progressCircle.setAttribute('transform', 'rotate(-90 45 45)');
+        
+        svg.appendChild(bgCircle);
+        svg.appendChild(progressCircle);
+        
+        // Get the score value element
+        const scoreValue = circle.querySelector('.score-value');
+        
+        // Clear the circle and append the SVG and score value
+        circle.innerHTML = '';
+        circle.appendChild(svg);
+        if (scoreValue) {
+            circle.appendChild(scoreValue.cloneNode(true));
+        } else {
+            const newScoreValue = document.createElement('span');
+            newScoreValue.classList.add('score-value');
+            newScoreValue.textContent = score;
+            circle.appendChild(newScoreValue);
         }
-    });
+    } catch (error) {
+        console.error("Error initializing score circle:", error);
+    }
 }
 
 /**
@@ -261,6 +267,327 @@ function getScoreColor(score) {
     return '#f25f5c'; // Low score - red
 }
 
+/**
+ * Create an element with optional class names and text content
+ * @param {string} tag - Tag name
+ * @param {string} className - Space separated class names
+ * @param {string} text - Text content (inserted as text, never as HTML)
+ * @returns {Element}
+ */
+function createElement(tag, className, text) {
+    const element = document.createElement(tag);
+    if (className) {
+        element.className = className;
+    }
+    if (text !== undefined && text !== null) {
+        element.textContent = text;
+    }
+    return element;
+}
+
+/**
+ * Build a therapy card with the same markup as the server-rendered cards in results.html
+ * @param {Object} therapy - Therapy recommendation
+ * @param {string} detailsId - Unique id for the collapsible details section
+ * @returns {Element}
+ */
+function createTherapyCard(therapy, detailsId) {
+    const therapyType = therapy.therapy_type || 'unknown';
+    const card = createElement('div', `therapy-card ${therapyType}`);
+    
+    // Header with type badge, name and overall score
+    const header = createElement('div', 'therapy-header');
+    header.appendChild(createElement('div', `therapy-type-badge ${therapyType}`,
+        therapyType.charAt(0).toUpperCase() + therapyType.slice(1)));
+    header.appendChild(createElement('h4', '', therapy.therapy_name || 'Unknown Therapy'));
+    
+    const overall = createElement('div', 'overall-score');
+    const circle = createElement('div', 'score-circle');
+    circle.setAttribute('data-score', Number(therapy.overall_score || 0));
+    circle.appendChild(createElement('span', 'score-value', therapy.overall_score || 0));
+    overall.appendChild(circle);
+    overall.appendChild(createElement('span', 'score-label', 'Overall Score'));
+    header.appendChild(overall);
+    card.appendChild(header);
+    
+    const description = createElement('div', 'therapy-description');
+    description.appendChild(createElement('p', '', therapy.description || 'No description available'));
+    card.appendChild(description);
+    
+    // Score bars
+    const scores = createElement('div', 'therapy-scores');
+    [
+        ['Efficacy', 'efficacy_score', 'bg-success'],
+        ['Compatibility', 'compatibility_score', 'bg-info'],
+        ['Safety', 'safety_score', 'bg-warning'],
+        ['Cost', 'cost_score', 'bg-primary']
+    ].forEach(([label, field, barClass]) => {
+        const value = Number(therapy[field] || 0);
+        const bar = createElement('div', 'score-bar');
+        bar.appendChild(createElement('label', '', label));
+        const progress = createElement('div', 'progress');
+        const progressBar = createElement('div', `progress-bar ${barClass}`);
+        progressBar.setAttribute('role', 'progressbar');
+        progressBar.style.width = `${value}%`;
+        progress.appendChild(progressBar);
+        bar.appendChild(progress);
+        bar.appendChild(createElement('span', 'score-value', value));
+        scores.appendChild(bar);
+    });
+    card.appendChild(scores);
+    
+    // Collapsible details
+    const details = createElement('div', 'therapy-details');
+    const toggle = createElement('div', 'details-toggle');
+    toggle.setAttribute('data-bs-toggle', 'collapse');
+    toggle.setAttribute('data-bs-target', `#${detailsId}`);
+    toggle.appendChild(createElement('span', '', 'View Details'));
+    toggle.appendChild(createElement('i', 'fas fa-chevron-down'));
+    details.appendChild(toggle);
+    
+    const collapse = createElement('div', 'collapse');
+    collapse.id = detailsId;
+    const content = createElement('div', 'details-content');
+    [
+        ['Side Effects', therapy.side_effects],
+        ['Contraindications', therapy.contraindications]
+    ].forEach(([title, items]) => {
+        if (!items || items.length === 0) return;
+        const section = createElement('div', 'detail-section');
+        section.appendChild(createElement('h6', '', title));
+        const list = createElement('ul');
+        (Array.isArray(items) ? items : [items]).forEach(item => list.appendChild(createElement('li', '', item)));
+        section.appendChild(list);
+        content.appendChild(section);
+    });
+    if (therapy.supporting_evidence) {
+        const section = createElement('div', 'detail-section');
+        section.appendChild(createElement('h6', '', 'Supporting Evidence'));
+        section.appendChild(createElement('p', '', therapy.supporting_evidence));
+        content.appendChild(section);
+    }
+    collapse.appendChild(content);
+    details.appendChild(collapse);
+    card.appendChild(details);
+    
+    toggle.addEventListener('click', function() {
+        this.querySelector('i').classList.toggle('rotate-180');
+        if (!window.bootstrap) {
+            collapse.classList.toggle('show');
+        }
+    });
+    card.addEventListener('mouseenter', function() {
+        this.classList.add('active-card');
+    });
+    card.addEventListener('mouseleave', function() {
+        this.classList.remove('active-card');
+    });
+    
+    return card;
+}
+
+/**
+ * Add a therapy that arrived after the page was rendered, with its card and chart entry
+ * @param {Object} therapy - Therapy recommendation
+ * @param {Array} therapyData - Array that collects the therapies, kept sorted by overall score
+ * @param {string} detailsId - Id for the card's details section
+ */
+function addTherapyCard(therapy, therapyData, detailsId) {
+    const container = document.querySelector('.therapy-cards');
+    const loadingIndicator = document.getElementById('chart-loading');
+    
+    // Insert in descending overall score order, matching rank_therapies
+    const score = Number(therapy.overall_score || 0);
+    let index = therapyData.findIndex(existing => Number(existing.overall_score || 0) < score);
+    if (index === -1) {
+        index = therapyData.length;
+    }
+    therapyData.splice(index, 0, therapy);
+    
+    const card = createTherapyCard(therapy, detailsId);
+    container.insertBefore(card, container.children[index] || null);
+    initScoreCircle(card.querySelector('.score-circle'));
+    
+    try {
+        initTherapyComparisonChart(therapyData);
+        if (loadingIndicator) {
+            loadingIndicator.style.display = 'none';
+        }
+    } catch (error) {
+        console.error("Error updating chart:", error);
+    }
+}
+
+/**
+ * Poll a recommendation job, rendering each therapy as soon as the job has published it
+ * @param {string} url - Status URL of the job (/api/jobs/<id>)
+ * @param {Array} therapyData - Array that collects the therapies, kept sorted by overall score;
+ *     therapies already in it are the job's first partial results
+ * @param {Function} onDone - Optional callback invoked when the job has finished
+ */
+function pollTherapyRecommendations(url, therapyData, onDone) {
+    const loadingIndicator = document.getElementById('chart-loading');
+    let received = therapyData.length;
+    
+    function showStage(stage) {
+        const message = loadingIndicator && loadingIndicator.querySelector('p');
+        if (message) {
+            message.textContent = `${stage}...`;
+        }
+    }
+    
+    function addNew(therapies) {
+        for (; received < therapies.length; received++) {
+            addTherapyCard(therapies[received], therapyData, `details-job-${received}`);
+        }
+    }
+    
+    function poll() {
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Job status request failed (${response.status})`);
+                }
+                return response.json();
+            })
+            .then(job => {
+                if (job.status === 'succeeded') {
+                    // The ranked result holds every therapy; only the unseen ones are added
+                    addNew(job.partial || []);
+                    if (job.result && job.result.drug_interactions) {
+                        showDrugInteractions(job.result.drug_interactions);
+                    }
+                    if (therapyData.length === 0 && loadingIndicator) {
+                        loadingIndicator.innerHTML = '<div class="alert alert-warning">No therapy data available to display.</div>';
+                    }
+                    if (typeof onDone === 'function') {
+                        onDone(therapyData);
+                    }
+                    return;
+                }
+                if (job.status === 'failed') {
+                    throw new Error(job.error || 'Generating recommendations failed.');
+                }
+                addNew(job.partial || []);
+                showStage(job.stage);
+                setTimeout(poll, 1000);
+            })
+            .catch(error => {
+                console.error("Recommendation job error:", error);
+                if (therapyData.length === 0 && loadingIndicator) {
+                    loadingIndicator.innerHTML = '';
+                    loadingIndicator.appendChild(createElement('div', 'alert alert-danger', error.message));
+                } else {
+                    showNotification(error.message, 'warning');
+                }
+            });
+    }
+    
+    showStage('Waiting for a worker');
+    poll();
+}
+
+/**
+ * Show the drug interactions found across the current medications and all therapies,
+ * replacing the list rendered with the page
+ * @param {Array} interactions - Interactions with drug_a, drug_b, severity and description
+ */
+function showDrugInteractions(interactions) {
+    const existing = document.getElementById('drug-interactions');
+    if (existing) {
+        existing.remove();
+    }
+    const anchor = document.querySelector('.score-explanation');
+    if (!interactions || interactions.length === 0 || !anchor) {
+        return;
+    }
+    
+    const alert = createElement('div', 'alert alert-warning mb-4');
+    alert.id = 'drug-interactions';
+    alert.setAttribute('role', 'alert');
+    const heading = createElement('h5', 'alert-heading');
+    heading.appendChild(createElement('i', 'fas fa-pills me-2'));
+    heading.appendChild(document.createTextNode('Drug Interactions'));
+    alert.appendChild(heading);
+    
+    const list = createElement('ul', 'mb-0');
+    interactions.forEach(interaction => {
+        const item = createElement('li');
+        item.appendChild(createElement('strong', null, interaction.drug_a));
+        item.appendChild(document.createTextNode(' / '));
+        item.appendChild(createElement('strong', null, interaction.drug_b));
+        item.appendChild(document.createTextNode(' '));
+        item.appendChild(createElement('span', `badge bg-${interaction.severity === 'major' ? 'danger' : 'secondary'}`,
+            interaction.severity));
+        item.appendChild(document.createTextNode(`: ${interaction.description}`));
+        list.appendChild(item);
+    });
+    alert.appendChild(list);
+    anchor.parentNode.insertBefore(alert, anchor);
+}
+
+/**
+ * Stream therapy recommendations from a Server-Sent Events endpoint, rendering each
+ * therapy as soon as the server has parsed it
+ * @param {string} url - URL of the streaming endpoint
+ * @param {Array} therapyData - Array that collects the therapies, kept sorted by overall score
+ * @param {Function} onDone - Optional callback invoked when the stream ends
+ */
+function streamTherapyRecommendations(url, therapyData, onDone) {
+    const loadingIndicator = document.getElementById('chart-loading');
+    const source = new EventSource(url);
+    let received = 0;
+    
+    if (loadingIndicator) {
+        const message = loadingIndicator.querySelector('p');
+        if (message) {
+            message.textContent = 'Generating recommendations...';
+        }
+    }
+    
+    source.addEventListener('therapy', function(event) {
+        received += 1;
+        addTherapyCard(JSON.parse(event.data), therapyData, `details-stream-${received}`);
+    });
+    
+    // Sent once all therapies are in, so pairs across therapies are included
+    source.addEventListener('interactions', function(event) {
+        showDrugInteractions(JSON.parse(event.data).drug_interactions);
+    });
+    
+    source.addEventListener('done', function() {
+        source.close();
+        if (therapyData.length === 0 && loadingIndicator) {
+            loadingIndicator.innerHTML = '<div class="alert alert-warning">No therapy data available to display.</div>';
+        }
+        if (typeof onDone === 'function') {
+            onDone(therapyData);
+        }
+    });
+    
+    // Fired both for server-sent "error" events and for dropped connections
+    source.addEventListener('error', function(event) {
+        source.close();
+        let message = 'The recommendation stream was interrupted.';
+        if (event.data) {
+            try {
+                message = JSON.parse(event.data).error || message;
+            } catch (parseError) {
+                console.error("Error parsing stream error:", parseError);
+            }
+        }
+        console.error("Recommendation stream error:", message);
+        if (therapyData.length === 0 && loadingIndicator) {
+            loadingIndicator.innerHTML = '';
+            loadingIndicator.appendChild(createElement('div', 'alert alert-danger', message));
+        } else {
+            showNotification(message, 'warning');
+        }
+    });
+    
+    return source;
+}
+
 /**
  * Initialize therapy card interactions
  */
@@ -0,0 +1,100 @@
+"""Tests for streamed agent recommendations (utils/agent_integration.py)"""
+
+import json
+import threading
+
+import pytest
+
+from utils import agent_integration
+from utils.agent_integration import AllopathyAgent
+from utils.single_flight import SingleFlight
+
+THERAPIES = [{"therapy_name": "Metformin", "therapy_type": "allopathy"},
+             {"therapy_name": "Lifestyle changes", "therapy_type": "allopathy"}]
+
+
+class _FakeProvider:
+    def __init__(self, name, reply=None, error=None, delay=None):
+        self.name = name
+        self.reply = reply
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    def stream(self, system_prompt, user_content, max_tokens=2000, temperature=0.2):
+        self.calls += 1
+        if self.delay is not None:
+            self.delay.wait(5)
+        if self.error is not None:
+            raise self.error
+        # One chunk per character, as a slow stream would deliver it
+        yield from self.reply
+
+
+class _DictCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, therapies):
+        self.entries[key] = therapies
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = _DictCache()
+    monkeypatch.setattr(agent_integration, "get_recommendation_cache", lambda: cache)
+    group = SingleFlight(lock_dir="")
+    monkeypatch.setattr(agent_integration, "get_single_flight", lambda: group)
+    return cache
+
+
+def _use(monkeypatch, *providers):
+    monkeypatch.setattr(agent_integration, "get_configured_providers", lambda: list(providers))
+
+
+def _stream():
+    return list(AllopathyAgent().stream_therapy_recommendations({"age": 50}, {}, "type 2 diabetes"))
+
+
+def test_stream_fails_over_before_the_first_therapy(cache, monkeypatch):
+    failing = _FakeProvider("primary", error=ConnectionError("reset"))
+    garbled = _FakeProvider("secondary", reply="I cannot help with that")
+    working = _FakeProvider("tertiary", reply=json.dumps({"therapies": THERAPIES}))
+    _use(monkeypatch, failing, garbled, working)
+
+    assert _stream() == THERAPIES
+    assert (failing.calls, garbled.calls, working.calls) == (1, 1, 1)
+    assert list(cache.entries.values()) == [THERAPIES]
+
+    # Served from the cache afterwards
+    assert _stream() == THERAPIES
+    assert working.calls == 1
+
+
+def test_concurrent_streams_share_one_upstream_call(cache, monkeypatch):
+    release = threading.Event()
+    provider = _FakeProvider("primary", reply=json.dumps({"therapies": THERAPIES}), delay=release)
+    _use(monkeypatch, provider)
+
+    results = [None] * 4
+
+    def run(index):
+        results[index] = _stream()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    # Let the provider answer once the other three streams wait on the first
+    for _ in range(500):
+        if agent_integration.get_single_flight().stats()["coalesced"] == 3:
+            break
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert provider.calls == 1
+    assert results == [THERAPIES] * 4
@@ -0,0 +1,97 @@
+"""Tests for drug-drug interaction checks (utils/drug_interactions.py)"""
+
+import pytest
+
+from utils import drug_interactions
+from utils.drug_interactions import InteractionGraph, check_interactions, flag_interactions
+
+INTERACTIONS = [
+    ("warfarin", "aspirin", "major", "Additive bleeding risk"),
+    ("Aspirin", "ibuprofen", "moderate", "Ibuprofen blocks aspirin's antiplatelet effect"),
+    # The same pair twice, in both orders: the most severe row is kept
+    ("ibuprofen", "warfarin", "minor", "Listed twice"),
+    ("Warfarin", "Ibuprofen", "major", "NSAIDs add to bleeding risk"),
+    ("omeprazole", "clopidogrel", "moderate", "Less clopidogrel activation"),
+]
+NAMES = [("Coumadin", "warfarin"), ("Advil", "ibuprofen"), ("Prilosec", "omeprazole"),
+         # Names of drugs without interactions are not matched
+         ("Tylenol", "acetaminophen")]
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    graph = InteractionGraph(INTERACTIONS, NAMES)
+    monkeypatch.setattr(drug_interactions, "get_interaction_graph", lambda: graph)
+    return graph
+
+
+def _pairs(interactions):
+    return [(interaction["drug_a"], interaction["drug_b"], interaction["severity"]) for interaction in interactions]
+
+
+def test_names_and_aliases_are_normalised(graph):
+    assert graph.drug_id(" WARFARIN ") == graph.drug_id("warfarin") is not None
+    assert graph.drug_id("acetaminophen") is None
+    found = graph.find_drugs("Coumadin 5 mg daily, ADVIL as needed, Tylenol")
+    assert found == {graph.drug_id("warfarin"): "Coumadin", graph.drug_id("ibuprofen"): "ADVIL"}
+    # Whole words only
+    assert graph.find_drugs("aspirinate") == {}
+
+
+def test_pairs_are_symmetric(graph):
+    warfarin, ibuprofen = graph.drug_id("warfarin"), graph.drug_id("ibuprofen")
+    assert graph.interaction(warfarin, ibuprofen) == graph.interaction(ibuprofen, warfarin) == (
+        "major", "NSAIDs add to bleeding risk")
+    assert graph.check_ids([ibuprofen, warfarin, ibuprofen]) == [
+        (min(warfarin, ibuprofen), max(warfarin, ibuprofen), "major", "NSAIDs add to bleeding risk")]
+    assert graph.size == 4
+
+
+def test_current_medications_against_therapies(graph):
+    interactions = check_interactions({"current_medications": "Coumadin 5 mg"}, {"medications": ["Prilosec"]},
+                                      [{"therapy_name": "Low-dose aspirin"}, {"therapy_name": "Clopidogrel 75 mg"}])
+    assert _pairs(interactions) == [("Coumadin", "aspirin", "major"), ("Prilosec", "Clopidogrel", "moderate")]
+    assert [(interaction["source_a"], interaction["source_b"]) for interaction in interactions] == [
+        ("current medications", "Low-dose aspirin"), ("report", "Clopidogrel 75 mg")]
+
+
+def test_therapies_against_each_other_most_severe_first(graph):
+    therapies = [{"therapy_name": "Aspirin"}, {"therapy_name": "Ibuprofen"}, {"therapy_name": "Warfarin"}]
+    interactions = check_interactions({}, {}, therapies)
+    assert [interaction["severity"] for interaction in interactions] == ["major", "major", "moderate"]
+    assert {(frozenset(pair[:2]), pair[2]) for pair in _pairs(interactions)} == {
+        (frozenset({"Warfarin", "Aspirin"}), "major"), (frozenset({"Warfarin", "Ibuprofen"}), "major"),
+        (frozenset({"Aspirin", "Ibuprofen"}), "moderate")}
+
+
+def test_flag_interactions_adds_major_contraindications_once(graph):
+    therapies = [{"therapy_name": "Ibuprofen 400 mg", "contraindications": ["Peptic ulcer"]},
+                 {"therapy_name": "Aspirin"}, {"therapy_name": "Physiotherapy"}]
+    profile = {"current_medications": "warfarin"}
+    flag_interactions(therapies, profile, {})
+    flag_interactions(therapies, profile, {})
+
+    assert _pairs(therapies[0]["drug_interactions"]) == [("warfarin", "Ibuprofen", "major")]
+    assert therapies[0]["contraindications"] == [
+        "Drug interaction (warfarin with Ibuprofen, major): NSAIDs add to bleeding risk", "Peptic ulcer"]
+    # Each therapy is checked against the current medications only, not against the
+    # other therapies (check_interactions covers those)
+    assert _pairs(therapies[1]["drug_interactions"]) == [("warfarin", "Aspirin", "major")]
+    assert "drug_interactions" not in therapies[2]
+
+
+def test_unknown_severity_is_rejected():
+    with pytest.raises(ValueError):
+        InteractionGraph([("warfarin", "aspirin", "severe", "Bleeding")])
+
+
+def test_without_a_table(monkeypatch):
+    monkeypatch.setattr(drug_interactions, "get_interaction_graph", lambda: None)
+    therapies = [{"therapy_name": "Aspirin"}]
+    assert check_interactions({"current_medications": "warfarin"}, {}, therapies) == []
+    assert flag_interactions(therapies, {"current_medications": "warfarin"}, {}) == [{"therapy_name": "Aspirin"}]
+
+
+def test_shipped_table_loads():
+    graph = InteractionGraph.from_files(drug_interactions.DDI_TABLE_PATH, drug_interactions.DDI_NAMES_PATH)
+    assert graph.interaction(graph.drug_id("warfarin"), graph.drug_id("aspirin"))[0] == "major"
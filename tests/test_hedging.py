@@ -0,0 +1,124 @@
+"""Tests for hedged LLM requests (utils/hedging.py)"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import hedging
+from utils.hedging import hedged_complete
+from utils.llm_providers import AnthropicProvider, StreamCancelled
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Streams the reply named by the path ("/stall" sends headers and then nothing)"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.flush()
+        if self.path == "/stall":
+            self.server.release.wait(30)
+            return
+        event = {"type": "content_block_delta", "delta": {"text": self.path.strip("/")}}
+        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class _Primary(AnthropicProvider):
+    name = "primary"
+
+
+class _Secondary(AnthropicProvider):
+    name = "secondary"
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def outcomes(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGING_ENABLED", True)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY", 0.0)
+    monkeypatch.setattr(hedging, "HEDGE_DEFAULT_DELAY", 0.2)
+    monkeypatch.setattr(hedging, "_stats", dict.fromkeys(hedging._stats, 0))
+
+    # How each request ended, recorded from its pool thread
+    outcomes = {}
+    finished = {"primary": threading.Event(), "secondary": threading.Event()}
+    collect = hedging._collect
+
+    def recording_collect(provider, *args):
+        try:
+            outcomes[provider.name] = collect(provider, *args)
+        except Exception as e:
+            outcomes[provider.name] = e
+            raise
+        finally:
+            finished[provider.name].set()
+        return outcomes[provider.name]
+
+    monkeypatch.setattr(hedging, "_collect", recording_collect)
+    outcomes["finished"] = finished
+    return outcomes
+
+
+def _providers(server, primary_path, secondary_path):
+    providers = [_Primary(), _Secondary()]
+    for provider, path in zip(providers, [primary_path, secondary_path]):
+        provider.api_key = "test"
+        provider.url = f"{server}{path}"
+    return providers
+
+
+def _parse(text):
+    return text if text == "ok" else None
+
+
+def test_fast_primary_wins_without_a_hedge(server, outcomes):
+    providers = _providers(server, "/ok", "/ok")
+    assert hedged_complete(providers, "system", "user", _parse) == "ok"
+    stats = hedging.get_hedging_stats()
+    assert (stats["primary_wins"], stats["hedges_fired"], stats["hedges_won"]) == (1, 0, 0)
+    assert "secondary" not in outcomes
+
+
+def test_stalled_primary_is_cancelled_when_the_hedge_wins(server, outcomes):
+    primary, secondary = _providers(server, "/stall", "/ok")
+    assert hedged_complete([primary, secondary], "system", "user", _parse) == "ok"
+
+    # The primary never sent a byte; cancelling it frees its thread long before the
+    # read timeout instead of waiting for one
+    assert outcomes["finished"]["primary"].wait(5)
+    assert isinstance(outcomes["primary"], StreamCancelled)
+    assert primary.stats()["errors"] == 0
+
+    stats = hedging.get_hedging_stats()
+    assert (stats["requests"], stats["hedges_fired"], stats["hedges_won"], stats["primary_wins"]) == (1, 1, 1, 0)
+
+
+def test_invalid_primary_answer_fails_over(server, outcomes):
+    providers = _providers(server, "/garbled", "/ok")
+    assert hedged_complete(providers, "system", "user", _parse) == "ok"
+    stats = hedging.get_hedging_stats()
+    assert (stats["failovers"], stats["hedges_fired"], stats["hedges_won"]) == (1, 0, 1)
+
+
+def test_no_valid_answer_returns_the_primary_result(server, outcomes):
+    providers = _providers(server, "/garbled", "/mangled")
+    assert hedged_complete(providers, "system", "user", _parse) is None
+    assert (outcomes["primary"], outcomes["secondary"]) == ("garbled", "mangled")
@@ -0,0 +1,83 @@
+"""Tests for job leasing and retries (utils/job_queue.py)"""
+
+import pytest
+
+from utils import job_queue
+from utils.job_queue import JobQueue, run_job
+
+
+def _double(payload, job):
+    job.update("Doubling", 0.5)
+    return payload["value"] * 2
+
+
+def _reject(payload, job):
+    raise ValueError("The report has no text")
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, "double", "tests.test_job_queue:_double")
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, "reject", "tests.test_job_queue:_reject")
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_job_runs_once_and_records_its_result(queue):
+    job_id = queue.enqueue("double", {"value": 21}, owner="7")
+    job = queue.claim("worker-a")
+    assert job["id"] == job_id and job["payload"] == {"value": 21}
+    assert queue.claim("worker-b") is None
+
+    run_job(queue, job, "worker-a")
+    job = queue.get(job_id)
+    assert (job["status"], job["result"], job["progress"], job["attempts"]) == ("succeeded", 42, 1.0, 1)
+
+
+def test_value_errors_are_shown_to_the_user(queue):
+    job_id = queue.enqueue("reject", {})
+    run_job(queue, queue.claim("worker-a"), "worker-a")
+    job = queue.get(job_id)
+    assert (job["status"], job["error"]) == ("failed", "The report has no text")
+
+
+def test_expired_lease_is_claimed_again(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1.0)
+    job_id = queue.enqueue("double", {"value": 1})
+    assert queue.claim("worker-a")["id"] == job_id
+
+    # The first worker died; another one takes the job over
+    job = queue.claim("worker-b")
+    assert (job["id"], job["attempts"], job["worker"]) == (job_id, 2, "worker-b")
+
+    # The first worker can no longer touch it
+    assert not queue.update(job_id, "worker-a", stage="Late")
+    queue.finish(job_id, "worker-a", result=0)
+    assert queue.get(job_id)["status"] == "running"
+
+    queue.finish(job_id, "worker-b", result=2)
+    assert queue.get(job_id)["result"] == 2
+
+
+def test_live_lease_is_not_claimed_again(queue):
+    queue.enqueue("double", {"value": 1})
+    job = queue.claim("worker-a")
+    assert queue.update(job["id"], "worker-a", stage="Reading", progress=0.3)
+    assert queue.claim("worker-b") is None
+
+
+def test_job_fails_after_max_attempts(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", -1.0)
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+    job_id = queue.enqueue("double", {"value": 1})
+    assert queue.claim("worker-a")["id"] == job_id
+    assert queue.claim("worker-b")["id"] == job_id
+    assert queue.claim("worker-c") is None
+
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == ("failed", 2)
+    assert job["error"] == "The job was interrupted too many times"
+
+
+def test_unknown_kind_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue("nonexistent", {})
@@ -0,0 +1,56 @@
+"""Tests for pulling JSON out of model replies (utils/json_extraction.py)"""
+
+import time
+
+from utils.json_extraction import iter_json_values, extract_json_object, parse_therapies
+
+
+def test_values_around_prose():
+    text = 'Here it is: {"a": 1} and also [1, 2]. That\'s all "folks"'
+    assert list(iter_json_values(text)) == [{"a": 1}, [1, 2]]
+
+
+def test_prose_brackets_do_not_hide_an_object():
+    text = '[see above] {"recommended_approach": "Allopathy", "reason": "acute"} [1]'
+    assert extract_json_object(text, ("recommended_approach", "reason")) == {
+        "recommended_approach": "Allopathy", "reason": "acute"
+    }
+
+
+def test_objects_nested_in_prose_brackets_are_found():
+    text = '[note: {"a": [1]} and {"b": 2} [x {"c": 3}] [4]]'
+    assert list(iter_json_values(text)) == [{"a": [1]}, {"b": 2}, {"c": 3}, [4]]
+
+
+def test_escaped_quotes_inside_strings():
+    text = 'a "quote [1, 2] {"s": "x\\"}"} [3]'
+    assert list(iter_json_values(text)) == [[1, 2], {"s": 'x"}'}, [3]]
+
+
+def test_truncated_reply_yields_the_complete_values():
+    text = '{"therapies": [{"therapy_name": "A"}, {"therapy_name": "B", "desc'
+    assert [therapy["therapy_name"] for therapy in parse_therapies(text)] == ["A"]
+
+
+def test_fenced_reply():
+    text = '```json\n{"therapies": [{"therapy_name": "A"}]}\n```'
+    assert parse_therapies(text) == [{"therapy_name": "A"}]
+
+
+def test_deeply_nested_brackets_do_not_raise():
+    # Deeper than the recursion limit, valid and not
+    assert list(iter_json_values("[" * 3000 + "]" * 3000)) == []
+    text = "[" * 3000 + ' see {"a": 1} ' + "]" * 3000
+    assert list(iter_json_values(text)) == [{"a": 1}]
+
+
+def test_nested_prose_brackets_are_scanned_once():
+    def elapsed(depth):
+        text = "[" * depth + ' see {"a": 1} ' + "]" * depth
+        started = time.perf_counter()
+        assert list(iter_json_values(text)) == [{"a": 1}]
+        return time.perf_counter() - started
+
+    # Rescanning each failed bracket made this quadratic: 8x the depth took ~60x the time
+    elapsed(500)
+    assert elapsed(8000) < 30 * max(elapsed(1000), 0.005)
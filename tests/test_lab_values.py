@@ -0,0 +1,68 @@
+"""Tests for numeric lab value extraction and flagging (utils/lab_values.py)"""
+
+import pytest
+
+from utils.lab_values import extract_lab_values
+from utils.ner_extraction import extract_entities_from_text
+
+
+def _lab(text):
+    labs = extract_lab_values(text)
+    assert len(labs) == 1, labs
+    return labs[0]
+
+
+@pytest.mark.parametrize("text, value, flag", [
+    ("WBC: 7,500 cells/uL", 7500, "normal"),
+    ("WBC 11,200 /uL", 11200, "high"),
+    ("WBC 3,900 cells/µL", 3900, "low"),
+    ("Hemoglobin 13,5 g/dL", 13.5, "normal"),
+    ("Hemoglobin 13.5 g/dL", 13.5, "normal"),
+])
+def test_thousands_separator_and_decimal_comma(text, value, flag):
+    lab = _lab(text)
+    assert lab["value"] == value
+    assert lab["flag"] == flag
+
+
+def test_converted_value_on_range_bound_is_normal():
+    lab = _lab("Glucose 5.5 mmol/L (3.9-5.5)")
+    assert lab["unit"] == "mg/dL"
+    assert lab["flag"] == "normal"
+    assert lab["value"] == lab["reference_range"][1]
+
+
+@pytest.mark.parametrize("text, flag", [
+    ("Glucose: <70", "low"),
+    ("Glucose: <=70", "indeterminate"),
+    ("Glucose: <90", "indeterminate"),
+    ("Cholesterol <150", "normal"),
+    ("TSH >10", "high"),
+    ("TSH >2", "indeterminate"),
+])
+def test_comparator(text, flag):
+    lab = _lab(text)
+    assert lab["comparator"] == text.split()[-1].rstrip("0123456789.")
+    assert lab["flag"] == flag
+
+
+def test_unknown_unit_is_kept_unflagged():
+    lab = _lab("T4 1.2 ng/dL")
+    assert (lab["value"], lab["unit"], lab["flag"], lab["reference_range"]) == (1.2, "ng/dL", None, None)
+
+
+def test_unknown_unit_is_flagged_against_printed_range():
+    lab = _lab("T4 1.2 ng/dL (0.8-1.8)")
+    assert lab["flag"] == "normal"
+    assert lab["reference_range"] == [0.8, 1.8]
+
+
+def test_unit_conversion():
+    lab = _lab("Creatinine 88.4 umol/L")
+    assert (lab["value"], lab["unit"], lab["flag"]) == (1, "mg/dL", "normal")
+
+
+def test_entities_keep_the_comparator():
+    labs = extract_entities_from_text("Creatinine <0.5 mg/dL. Creatinine 0.5 mg/dL")["lab_values"]
+    assert [(lab["comparator"], lab["value"], lab["flag"]) for lab in labs] == [("<", 0.5, "low"), ("", 0.5, "low")]
+    assert (labs[0]["reported_value"], labs[0]["reported_unit"]) == ("0.5", "mg/dL")
@@ -0,0 +1,49 @@
+"""Tests for building the NER lexicon artifact from the TSV lexicons (utils/ner_extraction.py)"""
+
+import os
+import shutil
+
+import utils.ner_extraction as ner
+from utils.lexicon_store import MappedEntityMatcher
+
+LEXICONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lexicons")
+
+
+def _use_lexicon(monkeypatch, tmp_path):
+    lexicon_dir = tmp_path / "lexicons"
+    shutil.copytree(LEXICONS, lexicon_dir)
+    monkeypatch.setattr(ner, "LEXICON_DIR", str(lexicon_dir))
+    monkeypatch.setattr(ner, "LEXICON_PATH", str(tmp_path / "lexicon.bin"))
+    return lexicon_dir
+
+
+def test_missing_artifact_is_built_from_tsv(monkeypatch, tmp_path):
+    _use_lexicon(monkeypatch, tmp_path)
+    matcher = ner._load_matcher()
+    assert isinstance(matcher, MappedEntityMatcher)
+
+    mentions = matcher.find_all("CYP2C19 poor metabolizer, started on Plavix")
+    found = {(mention["category"], mention["term"]) for mention in mentions}
+    assert ("genes", "CYP2C19") in found
+    assert ("medications", "clopidogrel") in found
+
+
+def test_stale_artifact_is_rebuilt(monkeypatch, tmp_path):
+    lexicon_dir = _use_lexicon(monkeypatch, tmp_path)
+    ner._load_matcher()
+    built = os.path.getmtime(ner.LEXICON_PATH)
+
+    with open(lexicon_dir / "medications.tsv", "a", encoding="utf-8") as handle:
+        handle.write("zzexampledrug\tzzbrand\n")
+    os.utime(lexicon_dir / "medications.tsv", (built + 10, built + 10))
+
+    matcher = ner._load_matcher()
+    assert [mention["term"] for mention in matcher.find_all("on zzbrand daily")] == ["zzexampledrug"]
+
+
+def test_falls_back_to_builtin_lists_without_lexicons(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(ner, "LEXICON_DIR", str(tmp_path / "missing"))
+    monkeypatch.setattr(ner, "LEXICON_PATH", str(tmp_path / "lexicon.bin"))
+    matcher = ner._load_matcher()
+    assert not isinstance(matcher, MappedEntityMatcher)
+    assert "built-in keyword lists" in caplog.text
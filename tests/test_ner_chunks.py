@@ -0,0 +1,64 @@
+"""Tests for chunked entity extraction (utils/ner_extraction.iter_entities_from_chunks)"""
+
+import random
+
+import pytest
+
+import utils.ner_extraction as ner
+from utils.ner_extraction import extract_entities_from_chunks, extract_entities_from_text
+
+REPORT = (
+    "LABORATORY REPORT\n"
+    "Glucose (fasting): 150 mg/dL (70-99)\n"
+    "Total Cholesterol: 210 mg/dL\n"
+    "WBC 7,500 cells/uL\n"
+    "Diagnosis: type 2 diabetes mellitus, history of hypertension.\n"
+    "Currently taking warfarin and metformin; patient reports fatigue.\n"
+    "GENETIC ANALYSIS\n"
+    "BRCA1 NM_007294.4:c.68_69delAG (p.Glu23fs) heterozygous\n"
+    "EGFR p.T790M detected; CYP2C19 rs4244285\n"
+)
+
+
+def _split(text, sizes):
+    chunks, position = [], 0
+    for size in sizes:
+        chunks.append(text[position:position + size])
+        position += size
+    chunks.append(text[position:])
+    return chunks
+
+
+def test_pages_match_whole_text():
+    pages = [REPORT + "\n\n"] * 5
+    assert extract_entities_from_chunks(pages) == extract_entities_from_text("".join(pages))
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_arbitrary_chunk_boundaries_match_whole_text(seed):
+    text = REPORT * 3
+    rng = random.Random(seed)
+    chunks = _split(text, [rng.randint(1, 60) for _ in range(len(text) // 30)])
+    assert extract_entities_from_chunks(chunks) == extract_entities_from_text(text)
+
+
+def test_newline_free_chunks_match_whole_text():
+    page = REPORT.replace("\n", " ")
+    pages = [page] * 10
+    assert extract_entities_from_chunks(pages) == extract_entities_from_text("".join(pages))
+
+
+def test_newline_free_chunks_are_scanned_in_bounded_windows(monkeypatch):
+    scanned = []
+    original = ner.extract_lab_values
+
+    def counting(text):
+        scanned.append(len(text))
+        return original(text)
+
+    monkeypatch.setattr(ner, "extract_lab_values", counting)
+    page = REPORT.replace("\n", " ") * 4
+    extract_entities_from_chunks([page] * 50)
+    # Each chunk is scanned with at most a fixed overlap in front of it
+    assert max(scanned) < len(page) + 4 * (ner.NER_LAB_OVERLAP + ner.NER_VARIANT_OVERLAP)
+    assert sum(scanned) < 2 * 50 * len(page)
@@ -0,0 +1,75 @@
+"""Tests for pharmacogenomic alerts (utils/pharmacogenomics.py)"""
+
+from utils import pharmacogenomics
+from utils.pharmacogenomics import check_medications, extract_phenotypes, flag_therapies
+from utils.ner_extraction import extract_entities_from_text
+
+POOR_CYP2D6 = {"genes": ["CYP2D6"], "phenotypes": [{"gene": "CYP2D6", "phenotype": "poor metabolizer"}]}
+TPMT_VARIANT = {"genes": ["TPMT"], "variants": [{"gene": "TPMT", "hgvs_c": "c.460G>A",
+                                                 "clinical_significance": "Pathogenic"}]}
+
+
+def test_actionable_phenotype_is_a_contraindication():
+    therapies = flag_therapies([{"therapy_name": "Tamoxifen 20 mg", "contraindications": ["Pregnancy"]}],
+                               POOR_CYP2D6)
+    assert therapies[0]["pgx_alerts"][0]["severity"] == "avoid"
+    assert therapies[0]["contraindications"][0].startswith("Pharmacogenomic (Tamoxifen with CYP2D6")
+    assert therapies[0]["contraindications"][1] == "Pregnancy"
+
+
+def test_named_gene_only_gets_a_review_alert():
+    therapies = flag_therapies([{"therapy_name": "Tamoxifen", "contraindications": []}], {"genes": ["CYP2D6"]})
+    assert [alert["severity"] for alert in therapies[0]["pgx_alerts"]] == ["review"]
+    assert therapies[0]["contraindications"] == []
+
+
+def test_benign_variant_is_not_actionable():
+    entities = {"genes": [], "variants": [{"gene": "TPMT", "clinical_significance": "Likely benign"}]}
+    assert check_medications({"current_medications": "azathioprine"}, entities) == []
+    therapies = flag_therapies([{"therapy_name": "Azathioprine"}], entities)
+    assert "pgx_alerts" not in therapies[0]
+
+
+def test_medications_with_a_pathogenic_variant():
+    alerts = check_medications({"current_medications": "Imuran 50 mg daily"}, TPMT_VARIANT)
+    assert [(alert["gene"], alert["drug"], alert["severity"]) for alert in alerts] == [("TPMT", "Imuran", "avoid")]
+
+
+def test_aliases_match_but_ambiguous_words_do_not():
+    assert check_medications({"current_medications": "Purinethol"}, TPMT_VARIANT)[0]["drug"] == "Purinethol"
+    assert check_medications({"current_medications": "reads a tabloid daily"}, TPMT_VARIANT) == []
+
+
+def test_no_duplicate_contraindication():
+    therapies = [{"therapy_name": "Codeine with acetaminophen", "contraindications": []}]
+    flag_therapies(therapies, POOR_CYP2D6)
+    flag_therapies(therapies, POOR_CYP2D6)
+    assert len(therapies[0]["contraindications"]) == 1
+
+
+def test_without_a_table(monkeypatch):
+    monkeypatch.setattr(pharmacogenomics, "get_pgx_table", lambda: None)
+    therapies = [{"therapy_name": "Tamoxifen"}]
+    assert flag_therapies(therapies, POOR_CYP2D6) == [{"therapy_name": "Tamoxifen"}]
+    assert check_medications({"current_medications": "tamoxifen"}, POOR_CYP2D6) == []
+    assert extract_phenotypes("CYP2D6 poor metabolizer") == []
+
+
+def test_phenotypes_in_report_text():
+    def phenotypes(text):
+        return [(found["gene"], found["phenotype"]) for found in extract_phenotypes(text)]
+
+    assert phenotypes("CYP2C19 *1/*1 normal metabolizer; CYP2D6 *1/*41 intermediate metabolizer") == [
+        ("CYP2D6", "intermediate metabolizer")]
+    assert phenotypes("Ultra-rapid metabolizer (CYP2D6)") == [("CYP2D6", "ultrarapid metabolizer")]
+    assert phenotypes("HLA-B*57:01 positive") == [("HLA-B", "positive")]
+    assert phenotypes("HLA-B*57:01 negative") == []
+    assert phenotypes("G6PD deficiency: not detected") == []
+    assert phenotypes("CYP2D6 tested. ER positive, HER2 negative") == []
+
+
+def test_tested_panel_in_a_report_does_not_contraindicate():
+    entities = extract_entities_from_text("Pharmacogenomic panel tested: CYP2D6, CYP2C19.\nER positive.")
+    assert entities["phenotypes"] == []
+    therapies = flag_therapies([{"therapy_name": "Tamoxifen", "contraindications": []}], entities)
+    assert therapies[0]["contraindications"] == []
@@ -0,0 +1,15 @@
+"""Tests for the recommendation prompt format instructions (utils/prompt_builder.py)"""
+
+import json
+
+from utils.prompt_builder import response_format
+
+
+def _example(instructions):
+    return json.loads(instructions.split("formatted like ", 1)[1])
+
+
+def test_one_example_entry_per_therapy_type():
+    assert [entry["therapy_type"] for entry in _example(response_format("allopathy"))["therapies"]] == ["allopathy"]
+    combined = _example(response_format("allopathy", "homeopathy"))["therapies"]
+    assert [entry["therapy_type"] for entry in combined] == ["allopathy", "homeopathy"]
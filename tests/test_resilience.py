@@ -0,0 +1,101 @@
+"""Tests for the circuit breaker (utils/resilience.py)"""
+
+import threading
+import types
+
+import pytest
+
+from utils import resilience
+from utils.resilience import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _tripped(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 30
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def test_open_breaker_rejects_calls(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert not breaker.allows_calls()
+    assert breaker.stats()["rejected_calls"] == 1
+
+
+def test_half_open_admits_a_single_probe(clock):
+    breaker = _tripped(clock)
+    assert breaker.allows_calls()
+    breaker.before_call()
+
+    # Everyone else fails fast while the probe is out
+    assert not breaker.allows_calls()
+    for _ in range(3):
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _tripped(clock)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock[0] += 30
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_abandoned_probe_is_replaced(clock):
+    breaker = _tripped(clock)
+    breaker.before_call()
+    clock[0] += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock[0] += 1
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_concurrent_callers_get_one_probe(clock):
+    breaker = _tripped(clock)
+    admitted = []
+    barrier = threading.Barrier(16)
+
+    def call():
+        barrier.wait()
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            return
+        admitted.append(threading.get_ident())
+
+    threads = [threading.Thread(target=call) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(admitted) == 1
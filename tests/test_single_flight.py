@@ -0,0 +1,151 @@
+"""Tests for request coalescing (utils/single_flight.py)"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight, fcntl
+
+
+def _run_concurrently(callers):
+    barrier = threading.Barrier(len(callers))
+    results = [None] * len(callers)
+
+    def run(index):
+        barrier.wait()
+        results[index] = callers[index]()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(callers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_result():
+    group = SingleFlight(lock_dir="")
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"therapies": []}
+
+    results = _run_concurrently([lambda: group.do("key", fetch)] * 8)
+    assert len(calls) == 1
+    assert results == [{"therapies": []}] * 8
+    assert group.stats()["coalesced"] == 7
+
+
+def test_errors_reach_every_caller():
+    group = SingleFlight(lock_dir="")
+
+    def fail():
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    def call():
+        try:
+            group.do("key", fail)
+        except ValueError as e:
+            return str(e)
+
+    assert _run_concurrently([call] * 4) == ["upstream down"] * 4
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs flock")
+def test_workers_coalesce_through_the_lock_dir(tmp_path):
+    # One group per simulated worker, sharing a cache and the lock directory
+    workers = [SingleFlight(lock_dir=str(tmp_path)) for _ in range(4)]
+    cache = {}
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        cache["key"] = "result"
+        return "result"
+
+    results = _run_concurrently([lambda group=group: group.do("key", fetch, recheck=lambda: cache.get("key"))
+                                 for group in workers for _ in range(3)])
+    assert results == ["result"] * 12
+    assert len(calls) == 1
+    assert sum(group.stats()["coalesced_across_workers"] for group in workers) == 3
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs flock")
+def test_lock_files_are_removed(tmp_path):
+    group = SingleFlight(lock_dir=str(tmp_path))
+
+    def fail():
+        raise RuntimeError("boom")
+
+    for number in range(50):
+        assert group.do(f"key-{number}", lambda: number) == number
+    with pytest.raises(RuntimeError):
+        group.do("failing", fail)
+    assert os.listdir(tmp_path) == []
+
+
+def test_streamed_call_is_shared_with_blocking_callers():
+    group = SingleFlight(lock_dir="")
+    started = threading.Event()
+    calls = []
+
+    def stream():
+        calls.append(1)
+        yield {"name": "first"}
+        started.set()
+        time.sleep(0.1)
+        yield {"name": "second"}
+
+    def lead():
+        items = []
+        for item in group.do_stream("key", stream):
+            # The leader's consumer may change its items
+            item["seen"] = True
+            items.append(item)
+        return items
+
+    def follow_stream():
+        started.wait()
+        return list(group.do_stream("key", stream))
+
+    def follow_blocking():
+        started.wait()
+        return group.do("key", lambda: calls.append(1))
+
+    leader, streamed, blocking = _run_concurrently([lead, follow_stream, follow_blocking])
+    assert len(calls) == 1
+    assert leader == [{"name": "first", "seen": True}, {"name": "second", "seen": True}]
+    assert streamed == blocking == [{"name": "first"}, {"name": "second"}]
+    assert group.stats()["coalesced"] == 2
+
+
+def test_abandoned_stream_is_taken_over():
+    group = SingleFlight(lock_dir="")
+    started = threading.Event()
+    calls = []
+
+    def stream():
+        calls.append(1)
+        yield "first"
+        yield "second"
+
+    def abandon():
+        items = group.do_stream("key", stream)
+        assert next(items) == "first"
+        started.set()
+        time.sleep(0.1)
+        items.close()
+
+    def follow():
+        started.wait()
+        return list(group.do_stream("key", stream))
+
+    assert _run_concurrently([abandon, follow])[1] == ["first", "second"]
+    assert len(calls) == 2
+    assert group.stats()["in_flight"] == 0
@@ -0,0 +1,86 @@
+"""Tests for the ClinVar variant index (utils/variant_index.py)"""
+
+import pytest
+
+from utils.variant_index import VariantIndex, annotate_variants, build_variant_index
+
+HEADER = ["#AlleleID", "Name", "GeneSymbol", "ClinicalSignificance", "RS# (dbSNP)", "PhenotypeList",
+          "Assembly", "Chromosome", "ReviewStatus", "PositionVCF", "ReferenceAlleleVCF", "AlternateAlleleVCF"]
+ROWS = [
+    ["1", "NM_007294.4(BRCA1):c.5266dup (p.Gln1756fs)", "BRCA1", "Pathogenic", "80357906",
+     "Hereditary breast ovarian cancer syndrome|not provided", "GRCh38", "17", "reviewed by expert panel",
+     "43057062", "T", "TG"],
+    ["1", "NM_007294.4(BRCA1):c.5266dup (p.Gln1756fs)", "BRCA1", "Pathogenic", "80357906",
+     "Hereditary breast ovarian cancer syndrome", "GRCh37", "17", "reviewed by expert panel", "41209079", "T", "TG"],
+    # A multi-allelic site whose alleles differ in significance
+    ["2", "NM_000001.1(GENEA):c.10A>G (p.Lys4Arg)", "GENEA", "Pathogenic", "100", "Disorder A", "GRCh38",
+     "1", "criteria provided, single submitter", "1000", "A", "G"],
+    ["3", "NM_000001.1(GENEA):c.10A>T (p.Lys4Ter)", "GENEA", "Benign", "100", "not provided", "GRCh38",
+     "1", "criteria provided, single submitter", "1000", "A", "T"],
+    # A multi-allelic site whose alleles agree
+    ["4", "NM_000002.1(GENEB):c.20C>T (p.Ala7Val)", "GENEB", "Benign", "200", "not provided", "GRCh38",
+     "2", "criteria provided, single submitter", "2000", "C", "T"],
+    ["5", "NM_000002.1(GENEB):c.20C>G (p.Ala7Gly)", "GENEB", "Benign", "200", "not provided", "GRCh38",
+     "2", "criteria provided, single submitter", "2000", "C", "G"],
+    # No VCF position: only found by rsID or name
+    ["6", "NM_000003.1(GENEC):c.30del (p.Gly10fs)", "GENEC", "Likely pathogenic", "300", "Disorder C",
+     "GRCh38", "3", "criteria provided, single submitter", "-1", "na", "na"],
+]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("variant_index")
+    dump = directory / "variant_summary.txt"
+    dump.write_text("\n".join("\t".join(row) for row in [HEADER] + ROWS) + "\n", encoding="utf-8")
+    summary = build_variant_index(str(dump), str(directory / "variant_index.bin"), "GRCh38")
+    assert (summary["records"], summary["ambiguous_rsids"]) == (6, 1)
+    return VariantIndex(str(directory / "variant_index.bin"))
+
+
+def test_lookup_by_position_and_alleles(index):
+    annotation = index.lookup("chr17", 43057062, "T", "TG")
+    assert (annotation["gene"], annotation["clinical_significance"]) == ("BRCA1", "Pathogenic")
+    assert annotation["condition"] == "Hereditary breast ovarian cancer syndrome"
+    assert index.lookup("1", 1000, "A", "T")["clinical_significance"] == "Benign"
+    assert index.lookup("1", 1000, "A", "C") is None
+    # GRCh37 coordinates are not indexed
+    assert index.lookup("17", 41209079, "T", "TG") is None
+
+
+def test_lookup_many_keeps_input_order(index):
+    results = index.lookup_many([("2", 2000, "C", "G"), ("17", 43057062, "T", "TG"), ("1", 1000, "A", "C"),
+                                 ("chrUn", 5, "A", "G")])
+    assert [result and result["gene"] for result in results] == ["GENEB", "BRCA1", None, None]
+
+
+def test_lookup_rsid(index):
+    assert index.lookup_rsid("rs80357906")["gene"] == "BRCA1"
+    assert index.lookup_rsid("rs300")["clinical_significance"] == "Likely pathogenic"
+    assert index.lookup_rsid("rs200")["clinical_significance"] == "Benign"
+    # Its alleles disagree, so the rsID alone says nothing
+    assert index.lookup_rsid("rs100") is None
+    assert index.lookup_rsid("rs999") is None
+
+
+def test_lookup_hgvs(index):
+    assert index.lookup_hgvs("BRCA1", "c.5266dup")["clinical_significance"] == "Pathogenic"
+    assert index.lookup_hgvs("GENEC", "c.30del")["gene"] == "GENEC"
+    assert index.lookup_hgvs("GENEA", "c.10A>T")["clinical_significance"] == "Benign"
+    assert index.lookup_hgvs("BRCA2", "c.5266dup") is None
+
+
+def test_placed_variants_do_not_fall_back_to_rsid(index):
+    variants = [
+        # A novel alt at a site whose other alleles are indexed under the same rsID
+        {"gene": "GENEB", "chrom": "2", "pos": 2000, "ref": "C", "alt": "A", "rsid": "rs200",
+         "hgvs_c": "c.20C>G"},
+        {"gene": "GENEA", "chrom": "1", "pos": 1000, "ref": "A", "alt": "G", "rsid": "rs100", "hgvs_c": None},
+        # From report text: no position
+        {"gene": "GENEA", "hgvs_c": "c.10A>T", "rsid": "rs100"},
+        {"gene": "GENEC", "hgvs_c": None, "rsid": "rs300"},
+    ]
+    assert annotate_variants(variants, index) == 3
+    assert "clinical_significance" not in variants[0]
+    assert [variant.get("clinical_significance") for variant in variants[1:]] == [
+        "Pathogenic", "Benign", "Likely pathogenic"]
@@ -0,0 +1,49 @@
+"""Tests for VCF ingestion edge cases (utils/vcf_ingest.py)"""
+
+import gzip
+import io
+
+from utils.vcf_ingest import extract_entities_from_vcf
+
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE\n"
+)
+# BRCA1 and CYP2C19 lie in the shipped gene panel, chromosome 1 position 1000 does not
+BRCA1 = "17\t43045712\trs80357906\tG\tA\t60\tPASS\tCLNSIG=Pathogenic\tGT\t0/1\n"
+CYP2C19 = "chr10\t94781859\trs4244285\tG\tA\t50\tPASS\t.\tGT\t1/1\n"
+OUTSIDE = "1\t1000\t.\tA\tT\t50\tPASS\t.\tGT\t0/1\n"
+
+
+def _ingest(text, compress=False):
+    data = text.encode("utf-8")
+    return extract_entities_from_vcf(io.BytesIO(gzip.compress(data) if compress else data))
+
+
+def test_panel_variants_are_kept():
+    entities, stats = _ingest(HEADER + BRCA1 + CYP2C19 + OUTSIDE)
+    assert entities["genes"] == ["BRCA1", "CYP2C19"]
+    assert [variant["zygosity"] for variant in entities["variants"]] == ["heterozygous", "homozygous"]
+    assert (stats["records"], stats["in_panel"], stats["kept"], stats["malformed"]) == (3, 2, 2, 0)
+
+
+def test_trailing_blank_lines_are_ignored():
+    entities, stats = _ingest(HEADER + BRCA1 + "\n\n")
+    assert entities["genes"] == ["BRCA1"]
+    assert (stats["records"], stats["malformed"]) == (1, 0)
+
+
+def test_malformed_records_are_skipped_and_counted():
+    truncated = "17\t43045712\trs1\tG\n"
+    no_position = "17\tabc\t.\tG\tA\t50\tPASS\t.\n"
+    bad_quality = "17\t43045712\t.\tG\tA\thigh\tPASS\t.\n"
+    no_tabs = "garbage line\n"
+    entities, stats = _ingest(HEADER + truncated + no_position + bad_quality + no_tabs + BRCA1, compress=True)
+    assert entities["genes"] == ["BRCA1"]
+    assert (stats["records"], stats["malformed"], stats["kept"]) == (5, 4, 1)
+
+
+def test_reference_genotype_is_not_kept():
+    entities, stats = _ingest(HEADER + BRCA1.replace("0/1", "0/0"))
+    assert entities["variants"] == []
+    assert stats["in_panel"] == 1
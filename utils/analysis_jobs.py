@@ -0,0 +1,162 @@
+"""
+Analysis Jobs Module
+
+Handlers for the background jobs of utils.job_queue: analysing an uploaded report
+(PDF parsing, entity extraction, variant annotation) and generating therapy
+recommendations. They run in job worker processes and report their stage as they go.
+"""
+
+import logging
+from typing import Dict, Any
+
+from werkzeug.utils import secure_filename
+
+from utils.ner_extraction import extract_entities_from_text, extract_entities_from_chunks, extractor_version
+from utils.gemini_integration import stream_therapy_recommendations
+from utils.pdf_processor import iter_pdf_pages, NoExtractableTextError, PDF_EXTRACTOR_VERSION
+from utils.document_cache import get_document_cache, text_hash
+from utils.vcf_ingest import extract_entities_from_vcf
+from utils.variants import format_variant
+from utils.variant_index import annotate_variants
+from utils.therapy_ranking import rank_therapies
+from utils.pharmacogenomics import flag_therapies
+from utils.drug_interactions import check_interactions, flag_interactions
+from utils.job_queue import JobContext
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Document cache entry for the text of an uploaded PDF
+PDF_TEXT_KIND = f"text:{PDF_EXTRACTOR_VERSION}"
+
+
+def _analyse_vcf(payload: Dict[str, Any], job: JobContext) -> Dict[str, Any]:
+    job.update("Reading variants", 0.1)
+    try:
+        entities, stats = extract_entities_from_vcf(payload["path"])
+    except (ValueError, OSError, EOFError) as e:
+        raise ValueError(f"Error processing VCF: {str(e)}")
+    job.update("Annotating variants", 0.9)
+    annotate_variants(entities["variants"])
+
+    summary = [f"VCF {secure_filename(payload['filename'])}: {stats['records']} records, "
+               f"{stats['kept']} clinically relevant in the gene panel"]
+    summary.extend(format_variant(variant) for variant in entities["variants"])
+    return {
+        "text": "\n".join(summary),
+        "extracted_entities": entities,
+        "document_hash": payload["document_hash"],
+        "filename": payload["filename"]
+    }
+
+
+def run_analysis(payload: Dict[str, Any], job: JobContext) -> Dict[str, Any]:
+    """
+    Analyse a report (job kind "analysis")
+
+    Args:
+        payload: source ("pdf", "vcf" or "text"); for uploads, path (in the upload
+            store), document_hash and filename; for text, text
+        job: Context to report progress through
+
+    Returns:
+        Report with text, extracted_entities (annotated), document_hash and filename
+
+    Raises:
+        ValueError: The report could not be read or has no text
+    """
+    if payload["source"] == "vcf":
+        return _analyse_vcf(payload, job)
+
+    document_cache = get_document_cache()
+    entities_kind = f"entities:{extractor_version()}"
+    extracted_entities = None
+
+    if payload["source"] == "pdf":
+        document_hash = payload["document_hash"]
+        # A report analysed before is not parsed again
+        report_text = document_cache.get(document_hash, PDF_TEXT_KIND)
+        if report_text is not None:
+            extracted_entities = document_cache.get(document_hash, entities_kind)
+        else:
+            # Entities are extracted page by page while the PDF is read, and an
+            # image-only scan is given up on after its first pages
+            pages = []
+            stats: Dict[str, Any] = {}
+
+            def page_chunks():
+                for page_no, page_text in iter_pdf_pages(payload["path"], stats=stats):
+                    job.update("Reading PDF", 0.9 * page_no / stats["pages"])
+                    pages.append(page_text + "\n\n")
+                    yield pages[-1]
+
+            job.update("Reading PDF", 0.0)
+            try:
+                extracted_entities = extract_entities_from_chunks(page_chunks())
+            except NoExtractableTextError:
+                pages = []
+            except Exception as e:
+                logger.error(f"Error processing PDF: {str(e)}")
+                raise ValueError(f"Error processing PDF: {str(e)}")
+
+            report_text = "".join(pages)
+            document_cache.set(document_hash, PDF_TEXT_KIND, report_text)
+            if extracted_entities is not None:
+                document_cache.set(document_hash, entities_kind, extracted_entities)
+
+        if not report_text.strip():
+            raise ValueError("The uploaded PDF did not contain any extractable text. "
+                             "Please try a different file or enter text manually.")
+    else:
+        report_text = payload["text"]
+        # Pasted text is cached by its hash like an uploaded PDF
+        document_hash = text_hash(report_text)
+        extracted_entities = document_cache.get(document_hash, entities_kind)
+
+    if extracted_entities is None:
+        job.update("Extracting entities", 0.5)
+        extracted_entities = extract_entities_from_text(report_text)
+        document_cache.set(document_hash, entities_kind, extracted_entities)
+
+    # Clinical significance from the local variant index, so the LLM does not have to work it out
+    job.update("Annotating variants", 0.95)
+    annotate_variants(extracted_entities["variants"])
+    return {
+        "text": report_text,
+        "extracted_entities": extracted_entities,
+        "document_hash": document_hash,
+        "filename": payload.get("filename")
+    }
+
+
+def run_recommendation(payload: Dict[str, Any], job: JobContext) -> Dict[str, Any]:
+    """
+    Generate therapy recommendations (job kind "recommendation")
+
+    Each therapy is published as a partial result as soon as it has been generated, so
+    the results page can show it while the rest are still coming.
+
+    Args:
+        payload: agent_type, profile, entities and query
+        job: Context to report progress through
+
+    Returns:
+        Ranked therapies with their pharmacogenomic and drug interaction
+        contraindications, and the drug interactions found
+    """
+    profile = payload["profile"]
+    entities = payload["entities"]
+    job.update("Generating recommendations", 0.1)
+
+    therapies = []
+    for therapy in stream_therapy_recommendations(payload["agent_type"], profile, entities, payload["query"]):
+        ranked = flag_therapies(rank_therapies([therapy]), entities)
+        therapies.append(flag_interactions(ranked, profile, entities)[0])
+        job.add_partial(therapies[-1])
+
+    job.update("Ranking therapies", 0.95)
+    therapies = rank_therapies(therapies)
+    return {
+        "therapies": therapies,
+        "drug_interactions": check_interactions(profile, entities, therapies)
+    }
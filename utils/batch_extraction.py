@@ -0,0 +1,169 @@
+"""
+Batch Entity Extraction Module
+
+Fans entity extraction for many documents out across a process pool sized to the
+machine's cores, and yields the results in input order as they complete. Only a bounded
+window of documents is in flight at a time, so arbitrarily long NDJSON uploads are
+processed as a stream. Documents already in the document cache (by text hash and
+extractor version) are answered from it without reaching the pool.
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from utils.ner_extraction import extract_entities_from_text, extractor_version
+from utils.drug_interactions import check_interactions
+from utils.document_cache import get_document_cache, text_hash
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+NER_POOL_SIZE = int(os.environ.get("NER_POOL_SIZE", str(os.cpu_count() or 1)))
+# Documents submitted ahead of the one being returned (per pool worker)
+NER_BATCH_WINDOW = int(os.environ.get("NER_BATCH_WINDOW", "4"))
+NER_BATCH_MAX_DOCUMENTS = int(os.environ.get("NER_BATCH_MAX_DOCUMENTS", "10000"))
+# forkserver avoids forking a threaded web worker; workers import the NER module once
+NER_POOL_START_METHOD = os.environ.get("NER_POOL_START_METHOD", "forkserver")
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """
+    Get the extraction process pool for the current process
+
+    Created lazily on first use and re-created after a fork, so each gunicorn worker
+    owns its own pool.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            logger.info(f"Starting entity extraction pool with {NER_POOL_SIZE} processes")
+            _pool = ProcessPoolExecutor(
+                max_workers=NER_POOL_SIZE,
+                mp_context=multiprocessing.get_context(NER_POOL_START_METHOD)
+            )
+            _pool_pid = pid
+    return _pool
+
+
+def _submit(*args) -> Future:
+    global _pool
+    try:
+        return get_extraction_pool().submit(extract_document, *args)
+    except BrokenProcessPool:
+        # A crashed child (e.g. killed by the OOM killer) breaks the pool for good
+        logger.warning("Entity extraction pool is broken, restarting it")
+        with _pool_lock:
+            _pool = None
+        return get_extraction_pool().submit(extract_document, *args)
+
+
+def extract_document(index: int, doc_id: Any, text: str) -> Dict[str, Any]:
+    """
+    Extract entities from one document (runs inside a pool process)
+
+    Args:
+        index: Position of the document in the batch
+        doc_id: Caller-supplied document id
+        text: Document text
+
+    Returns:
+        Result with index, id, entities, interactions between the medications found
+        and extraction time in milliseconds
+    """
+    started = time.perf_counter()
+    entities = extract_entities_from_text(text)
+    return {
+        "index": index,
+        "id": doc_id,
+        "entities": entities,
+        "drug_interactions": check_interactions({}, entities),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def iter_batch_results(documents: Iterable[Tuple[Any, str]],
+                       max_documents: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Extract entities from many documents in parallel
+
+    Args:
+        documents: (document id, text) pairs; consumed lazily
+        max_documents: Stop with an error result after this many documents
+            (defaults to NER_BATCH_MAX_DOCUMENTS)
+
+    Yields:
+        One result per document, in input order. A document that fails yields
+        {"index", "id", "error"} instead of entities.
+    """
+    limit = max_documents or NER_BATCH_MAX_DOCUMENTS
+    window = max(NER_POOL_SIZE * NER_BATCH_WINDOW, 1)
+    document_cache = get_document_cache()
+    entities_kind = f"entities:{extractor_version()}"
+    # (index, id, document hash, future or ready result) in input order
+    pending = deque()
+
+    def ready() -> bool:
+        outcome = pending[0][3]
+        return isinstance(outcome, dict) or outcome.done()
+
+    def next_result() -> Dict[str, Any]:
+        index, doc_id, doc_hash, outcome = pending.popleft()
+        if isinstance(outcome, dict):
+            return outcome
+        try:
+            result = outcome.result()
+        except Exception as e:
+            logger.error(f"Entity extraction failed for document {doc_id!r}: {str(e)}")
+            return {"index": index, "id": doc_id, "error": str(e)}
+        document_cache.set(doc_hash, entities_kind, result["entities"])
+        return result
+
+    index = 0
+    try:
+        for doc_id, text in documents:
+            if index >= limit:
+                pending.append((index, doc_id, None, {"index": index, "id": doc_id,
+                                                      "error": f"Batch limit of {limit} documents reached"}))
+                break
+            if isinstance(text, str):
+                doc_hash = text_hash(text)
+                entities = document_cache.get(doc_hash, entities_kind)
+                if entities is not None:
+                    pending.append((index, doc_id, doc_hash, {
+                        "index": index,
+                        "id": doc_id,
+                        "entities": entities,
+                        "drug_interactions": check_interactions({}, entities),
+                        "elapsed_ms": 0.0,
+                        "cached": True,
+                    }))
+                else:
+                    pending.append((index, doc_id, doc_hash, _submit(index, doc_id, text)))
+            else:
+                pending.append((index, doc_id, None, {"index": index, "id": doc_id,
+                                                      "error": "Document has no text"}))
+            index += 1
+
+            # Results go out in input order, so only the oldest document is waited on
+            while pending and (len(pending) >= window or ready()):
+                yield next_result()
+
+        while pending:
+            yield next_result()
+    finally:
+        # The client went away: don't keep the pool busy with documents nobody will read
+        for _, _, _, outcome in pending:
+            if not isinstance(outcome, dict):
+                outcome.cancel()
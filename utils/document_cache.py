@@ -0,0 +1,170 @@
+"""
+Document Cache Module
+
+Persistent cache of what was extracted from a document, keyed by the document's content
+hash (see utils.upload_store) and by what was extracted with which extractor version:
+the text of a PDF for a PyPDF2 version, the entities for an NER version. Re-uploads of
+the same report, which are common, skip PDF parsing and entity extraction entirely.
+
+Entries are zlib-compressed JSON in a SQLite file shared by all worker processes. When
+the stored payloads exceed DOCUMENT_CACHE_MAX_BYTES, the least recently used entries
+are evicted.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DOCUMENT_CACHE_DB = os.environ.get("DOCUMENT_CACHE_DB", os.path.join(os.getcwd(), "instance", "document_cache.db"))
+DOCUMENT_CACHE_MAX_BYTES = int(os.environ.get("DOCUMENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def text_hash(text: str) -> str:
+    """Content hash of a text document (pasted reports, batch items)"""
+    return hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class DocumentCache:
+    """SQLite cache from (document hash, kind) to a compressed JSON value"""
+
+    def __init__(self, db_path: str = DOCUMENT_CACHE_DB, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES):
+        """
+        Initialize the cache
+
+        Args:
+            db_path: Path of the SQLite file (empty to disable the cache)
+            max_bytes: Maximum total size of the compressed payloads
+        """
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_stored": 0}
+
+        if self.db_path:
+            self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the cache safe across threads and workers
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS documents ("
+                    "doc_hash TEXT NOT NULL, kind TEXT NOT NULL, payload BLOB NOT NULL, "
+                    "size INTEGER NOT NULL, accessed_at REAL NOT NULL, PRIMARY KEY (doc_hash, kind))"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_accessed ON documents (accessed_at)")
+        except sqlite3.Error as e:
+            logger.error(f"Disabling document cache: {str(e)}")
+            self.db_path = ""
+
+    def get(self, doc_hash: str, kind: str) -> Optional[Any]:
+        """
+        Look up a cached value
+
+        Args:
+            doc_hash: Content hash of the document
+            kind: What was extracted, with the extractor version (e.g. "entities:<version>")
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        row = None
+        if self.db_path and doc_hash:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT payload FROM documents WHERE doc_hash = ? AND kind = ?", (doc_hash, kind)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("UPDATE documents SET accessed_at = ? WHERE doc_hash = ? AND kind = ?",
+                                     (time.time(), doc_hash, kind))
+            except sqlite3.Error as e:
+                logger.warning(f"Document cache lookup failed: {str(e)}")
+                row = None
+
+        with self._lock:
+            self._stats["hits" if row is not None else "misses"] += 1
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, doc_hash: str, kind: str, value: Any):
+        """Store a value for a document, then evict the oldest entries beyond max_bytes"""
+        if not self.db_path or not doc_hash:
+            return
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (doc_hash, kind, payload, size, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (doc_hash, kind, payload, len(payload), time.time())
+                )
+                # Keep the most recently used entries that fit in the size budget
+                evicted = conn.execute(
+                    "DELETE FROM documents WHERE rowid IN ("
+                    "SELECT rowid FROM (SELECT rowid, SUM(size) OVER (ORDER BY accessed_at DESC) AS total "
+                    "FROM documents) WHERE total > ?)",
+                    (self.max_bytes,)
+                ).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Document cache store failed: {str(e)}")
+            return
+
+        with self._lock:
+            self._stats["stores"] += 1
+            self._stats["bytes_stored"] += len(payload)
+            self._stats["evictions"] += max(evicted, 0)
+
+    def clear(self):
+        """Remove all entries"""
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM documents")
+            except sqlite3.Error as e:
+                logger.warning(f"Document cache clear failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit-rate statistics for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["enabled"] = bool(self.db_path)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_document_cache() -> DocumentCache:
+    """Get the process-wide document cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DocumentCache()
+    return _cache
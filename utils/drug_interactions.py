@@ -0,0 +1,331 @@
+"""
+Drug Interactions Module
+
+Checks every pair of drugs across the patient's current medications and the recommended
+therapies against a local drug-drug interaction table (data/drug_interactions.tsv).
+Drugs get dense integer ids; the interaction graph is kept as CSR adjacency (sorted
+neighbor ids per drug in flat arrays), and a drug's row is turned into a frozenset when
+it is first checked. A check intersects each drug's row with the other drugs in the
+set, which walks the smaller of the two, so its cost depends on the few drugs a patient
+takes, not on the size of the formulary or on how many interactions a drug has.
+"""
+
+import os
+import bisect
+import logging
+import threading
+import functools
+from array import array
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+from utils.entity_matcher import EntityMatcher
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DDI_TABLE_PATH = os.environ.get("DDI_TABLE_PATH", os.path.join(_DATA_DIR, "drug_interactions.tsv"))
+# Brand names and synonyms (canonical<TAB>synonym|synonym), shared with the NER lexicon
+DDI_NAMES_PATH = os.environ.get("DDI_NAMES_PATH", os.path.join(_DATA_DIR, "lexicons", "medications.tsv"))
+# Drugs whose row set is kept in memory
+DDI_ROW_CACHE = int(os.environ.get("DDI_ROW_CACHE", "4096"))
+
+SEVERITIES = ("major", "moderate", "minor")
+
+# Interactions of this severity are added to a therapy's contraindications
+CONTRAINDICATION_SEVERITY = "major"
+CONTRAINDICATION_PREFIX = "Drug interaction"
+
+
+class InteractionGraph:
+    """Drug-drug interactions as CSR adjacency over dense drug ids"""
+
+    def __init__(self, interactions: Iterable[Tuple[str, str, str, str]],
+                 names: Iterable[Tuple[str, str]] = ()):
+        """
+        Assign drug ids and build the adjacency
+
+        Args:
+            interactions: (drug, drug, severity, description) rows; a pair listed twice
+                keeps its most severe row
+            names: (name, drug) pairs for brand names and synonyms; every drug is also
+                matched by its own name
+        """
+        self.drugs: List[str] = []
+        self._ids: Dict[str, int] = {}
+        # Distinct (severity, description) rows, referenced by index from the adjacency
+        self._details: List[Tuple[str, str]] = []
+        detail_ids: Dict[Tuple[str, str], int] = {}
+        pairs: Dict[Tuple[int, int], int] = {}
+
+        for first, second, severity, description in interactions:
+            if severity not in SEVERITIES:
+                raise ValueError(f"Unknown severity for {first}/{second}: {severity}")
+            a, b = self._add_drug(first), self._add_drug(second)
+            if a == b:
+                continue
+            detail = detail_ids.setdefault((severity, description), len(detail_ids))
+            if detail == len(self._details):
+                self._details.append((severity, description))
+            key = (min(a, b), max(a, b))
+            if key not in pairs or SEVERITIES.index(severity) < SEVERITIES.index(self._details[pairs[key]][0]):
+                pairs[key] = detail
+
+        # CSR: the neighbors of drug i are neighbors[offsets[i]:offsets[i + 1]], sorted,
+        # with the detail index of each pair at the same position in details
+        count = len(self.drugs)
+        degree = [0] * count
+        for a, b in pairs:
+            degree[a] += 1
+            degree[b] += 1
+        self._offsets = array("I", [0])
+        for value in degree:
+            self._offsets.append(self._offsets[-1] + value)
+        self._neighbors = array("I", bytes(4 * len(pairs) * 2))
+        self._pair_details = array("I", bytes(4 * len(pairs) * 2))
+        fill = list(self._offsets[:-1])
+        for (a, b), detail in pairs.items():
+            for source, target in ((a, b), (b, a)):
+                self._neighbors[fill[source]] = target
+                self._pair_details[fill[source]] = detail
+                fill[source] += 1
+        for drug in range(count):
+            start, end = self._offsets[drug], self._offsets[drug + 1]
+            if end - start > 1:
+                row = sorted(zip(self._neighbors[start:end], self._pair_details[start:end]))
+                self._neighbors[start:end] = array("I", (target for target, _ in row))
+                self._pair_details[start:end] = array("I", (detail for _, detail in row))
+        self.size = len(pairs)
+
+        # Only drugs that interact with something need to be found in text
+        terms = [(drug, drug) for drug in self.drugs]
+        terms.extend((name, drug) for name, drug in names if drug in self._ids)
+        self._matcher = EntityMatcher({"drugs": terms}, {"drugs": "insensitive"})
+        self._row = functools.lru_cache(maxsize=DDI_ROW_CACHE)(self._build_row)
+
+    def _add_drug(self, name: str) -> int:
+        name = name.strip().lower()
+        drug_id = self._ids.get(name)
+        if drug_id is None:
+            drug_id = self._ids[name] = len(self.drugs)
+            self.drugs.append(name)
+        return drug_id
+
+    @classmethod
+    def from_files(cls, table_path: str, names_path: Optional[str] = None) -> "InteractionGraph":
+        """
+        Load an interaction table and, optionally, a names file
+
+        Args:
+            table_path: TSV of drug, drug, severity and description ('#' starts a comment)
+            names_path: TSV of drug and its other names separated by "|" (skipped when missing)
+        """
+        interactions = []
+        with open(table_path, encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                first, second, severity, description = line.rstrip("\n").split("\t")[:4]
+                interactions.append((first, second, severity.strip(), description.strip()))
+
+        names = []
+        if names_path and os.path.exists(names_path):
+            with open(names_path, encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.strip() or line.startswith("#"):
+                        continue
+                    drug, _, synonyms = line.rstrip("\n").partition("\t")
+                    names.extend((synonym.strip(), drug.strip().lower())
+                                 for synonym in synonyms.split("|") if synonym.strip())
+        return cls(interactions, names)
+
+    def drug_id(self, name: str) -> Optional[int]:
+        """Id of a drug by its table name (None if it has no interactions)"""
+        return self._ids.get(name.strip().lower())
+
+    def find_drugs(self, text: str) -> Dict[int, str]:
+        """
+        Find drugs named in free text
+
+        Args:
+            text: Medication list, therapy name, ...
+
+        Returns:
+            Drug id -> name as written, in order of appearance
+        """
+        found = {}
+        for mention in self._matcher.find_all(text or ""):
+            found.setdefault(self._ids[mention["term"]], mention["text"])
+        return found
+
+    def _build_row(self, drug_id: int) -> frozenset:
+        return frozenset(self._neighbors[self._offsets[drug_id]:self._offsets[drug_id + 1]])
+
+    def interaction(self, first: int, second: int) -> Optional[Tuple[str, str]]:
+        """
+        Look up one pair
+
+        Args:
+            first: Drug id
+            second: Drug id
+
+        Returns:
+            (severity, description), or None if the drugs do not interact
+        """
+        start, end = self._offsets[first], self._offsets[first + 1]
+        position = bisect.bisect_left(self._neighbors, second, start, end)
+        if position < end and self._neighbors[position] == second:
+            return self._details[self._pair_details[position]]
+        return None
+
+    def check_ids(self, drug_ids: Iterable[int]) -> List[Tuple[int, int, str, str]]:
+        """
+        Find every interacting pair in a set of drugs
+
+        Args:
+            drug_ids: Drug ids (duplicates are ignored)
+
+        Returns:
+            (drug id, drug id, severity, description) per interacting pair, smaller id first
+        """
+        drug_ids = sorted(set(drug_ids))
+        others = set(drug_ids)
+        found = []
+        for drug_id in drug_ids:
+            # Only pairs with a later drug, so each pair is reported once
+            others.discard(drug_id)
+            for target in others.intersection(self._row(drug_id)):
+                found.append((drug_id, target) + self.interaction(drug_id, target))
+        found.sort()
+        return found
+
+    def info(self) -> Dict[str, Any]:
+        """Sizes of the graph and of the row cache"""
+        cache = self._row.cache_info()
+        return {"drugs": len(self.drugs), "interactions": self.size,
+                "rows_cached": cache.currsize, "row_hits": cache.hits, "row_misses": cache.misses}
+
+
+_graph = None
+_graph_loaded = False
+_graph_lock = threading.Lock()
+
+
+def get_interaction_graph() -> Optional[InteractionGraph]:
+    """Get the graph for DDI_TABLE_PATH (loaded once per process), or None if it cannot be read"""
+    global _graph, _graph_loaded
+    with _graph_lock:
+        if not _graph_loaded:
+            _graph_loaded = True
+            try:
+                _graph = InteractionGraph.from_files(DDI_TABLE_PATH, DDI_NAMES_PATH)
+                logger.info(f"Loaded drug interaction table {DDI_TABLE_PATH} "
+                            f"({len(_graph.drugs)} drugs, {_graph.size} interactions)")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load drug interaction table {DDI_TABLE_PATH}: {str(e)}")
+    return _graph
+
+
+def _current_medications(profile: Dict[str, Any], entities: Dict[str, Any]) -> List[Tuple[str, str]]:
+    sources = [((profile or {}).get("current_medications") or "", "current medications")]
+    sources.extend((str(item), "report") for item in (entities or {}).get("medications") or [])
+    return sources
+
+
+def check_interactions(profile: Dict[str, Any], entities: Dict[str, Any],
+                       therapies: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Check every pair across the current medications and the recommended therapies
+
+    Args:
+        profile: User profile data (current_medications is free text)
+        entities: Extracted entities (their medications count as current)
+        therapies: Therapy recommendations
+
+    Returns:
+        Interactions with drug_a, drug_b (as written), severity, description and the
+        source of each drug (current medications, report or the therapy name), most
+        severe first (empty without a table)
+    """
+    graph = get_interaction_graph()
+    if graph is None:
+        return []
+    sources = _current_medications(profile, entities)
+    sources.extend((str(therapy.get("therapy_name", "")), str(therapy.get("therapy_name", "")))
+                   for therapy in therapies or [] if isinstance(therapy, dict))
+
+    # Drug id -> (name as written, source), first mention wins
+    drugs: Dict[int, Tuple[str, str]] = {}
+    for text, source in sources:
+        for drug_id, written in graph.find_drugs(text).items():
+            drugs.setdefault(drug_id, (written, source))
+    if len(drugs) < 2:
+        return []
+
+    interactions = []
+    for first, second, severity, description in graph.check_ids(drugs):
+        interactions.append({
+            "drug_a": drugs[first][0],
+            "drug_b": drugs[second][0],
+            "severity": severity,
+            "description": description,
+            "source_a": drugs[first][1],
+            "source_b": drugs[second][1],
+        })
+    interactions.sort(key=lambda interaction: SEVERITIES.index(interaction["severity"]))
+    return interactions
+
+
+def flag_interactions(therapies: List[Dict[str, Any]], profile: Dict[str, Any],
+                      entities: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Add drug interactions to therapies in place
+
+    Each therapy whose drugs interact with the current medications (or with each other)
+    gets a drug_interactions list; major interactions also become contraindications.
+
+    Args:
+        therapies: Therapy recommendations
+        profile: User profile data
+        entities: Extracted entities
+
+    Returns:
+        The same therapies
+    """
+    graph = get_interaction_graph()
+    if graph is None or not therapies:
+        return therapies
+
+    current: Dict[int, str] = {}
+    for text, _ in _current_medications(profile, entities):
+        for drug_id, written in graph.find_drugs(text).items():
+            current.setdefault(drug_id, written)
+
+    for therapy in therapies:
+        if not isinstance(therapy, dict):
+            continue
+        proposed = graph.find_drugs(str(therapy.get("therapy_name", "")))
+        if not proposed:
+            continue
+        names = {**current, **proposed}
+        interactions = [
+            {"drug_a": names[first], "drug_b": names[second], "severity": severity, "description": description}
+            for first, second, severity, description in graph.check_ids(list(current) + list(proposed))
+            if first in proposed or second in proposed
+        ]
+        if not interactions:
+            continue
+        interactions.sort(key=lambda interaction: SEVERITIES.index(interaction["severity"]))
+        therapy["drug_interactions"] = interactions
+        contraindications = therapy.get("contraindications") or []
+        if not isinstance(contraindications, list):
+            contraindications = [str(contraindications)]
+        for interaction in interactions:
+            if interaction["severity"] != CONTRAINDICATION_SEVERITY:
+                continue
+            note = (f"{CONTRAINDICATION_PREFIX} ({interaction['drug_a']} with {interaction['drug_b']}, "
+                    f"{interaction['severity']}): {interaction['description']}")
+            if note not in contraindications:
+                contraindications.insert(0, note)
+        therapy["contraindications"] = contraindications
+    return therapies
@@ -0,0 +1,209 @@
+"""
+Entity Matcher Module
+
+Multi-pattern dictionary matcher for medical entity extraction. The lexicon is compiled
+once into an Aho-Corasick automaton over word tokens, so a report is scanned in a single
+linear pass no matter how many terms the lexicon holds. Matching on whole tokens gives
+word boundaries for free ("pain" does not match "Spain", "T3" does not match "T3X99").
+"""
+
+import re
+import logging
+from collections import deque
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+_SPLIT = re.compile(r"(\w+)")
+
+# Case rules per category:
+#   insensitive - match regardless of case
+#   sensitive   - match the exact case of the lexicon term
+#   acronyms    - terms containing capitals (TSH, WBC) are case-sensitive, others are not
+CASE_RULES = ("insensitive", "sensitive", "acronyms")
+
+
+def tokenize_term(term: str) -> Tuple[str, ...]:
+    """Split a lexicon term into the word tokens the matcher works on"""
+    return tuple(_TOKEN.findall(term))
+
+
+def split_tokens(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Split text for matching
+
+    Returns:
+        tuple: (parts, tokens) where parts alternates separator and token, so joining
+        parts[:2 * i + 1] gives the offset of token i, and tokens are lowercased
+    """
+    # Lowercasing once is much cheaper than per token, but only keeps offsets valid
+    # when no character changes length (e.g. "İ")
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        parts = _SPLIT.split(lowered)
+        return parts, parts[1::2]
+    parts = _SPLIT.split(text)
+    return parts, [token.lower() for token in parts[1::2]]
+
+
+def token_start_from_end(text: str, count: int) -> int:
+    """
+    Offset at which the count-th last word token of text starts
+
+    Args:
+        text: Text to look at
+        count: Number of trailing tokens
+
+    Returns:
+        Character offset (0 when text has fewer tokens, len(text) when count is 0)
+    """
+    if count <= 0:
+        return len(text)
+    window = 64 * count
+    while True:
+        start = max(len(text) - window, 0)
+        starts = [match.start() for match in _TOKEN.finditer(text, start)]
+        # The first token may be cut by the window edge, so it only counts at offset 0
+        if len(starts) > count:
+            return starts[-count]
+        if start == 0:
+            return starts[-count] if len(starts) == count else 0
+        window *= 4
+
+
+def is_case_sensitive(term: str, rule: str) -> bool:
+    """Whether a term must match with its exact case under the given case rule"""
+    return rule == "sensitive" or (rule == "acronyms" and term != term.lower())
+
+
+class EntityMatcher:
+    """Token-level Aho-Corasick automaton over a categorized lexicon"""
+
+    def __init__(self, lexicon: Dict[str, Iterable[str]], case_rules: Optional[Dict[str, str]] = None):
+        """
+        Compile the lexicon
+
+        Args:
+            lexicon: Terms keyed by category (e.g. {"diseases": ["diabetes", ...]}); a term
+                may also be a (synonym, canonical term) pair, reported as the canonical term
+            case_rules: Case rule per category (default "insensitive")
+        """
+        case_rules = case_rules or {}
+        # State 0 is the root; outputs are (category, term, token count, exact tokens or None)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int, Optional[Tuple[str, ...]]]]] = [[]]
+        self._vocabulary = set()
+        self.max_tokens = 0
+        self.size = 0
+
+        for category, terms in lexicon.items():
+            rule = case_rules.get(category, "insensitive")
+            if rule not in CASE_RULES:
+                raise ValueError(f"Unknown case rule for {category}: {rule}")
+            for term in terms:
+                surface, canonical = (term, term) if isinstance(term, str) else term
+                tokens = tokenize_term(surface)
+                if not tokens:
+                    continue
+                self._add(tuple(token.lower() for token in tokens),
+                          (category, canonical, len(tokens), tokens if is_case_sensitive(surface, rule) else None))
+        self._build_failure_links()
+        logger.debug(f"Compiled entity matcher: {self.size} terms, {len(self._goto)} states")
+
+    def _add(self, tokens: Tuple[str, ...], output: Tuple[str, str, int, Optional[Tuple[str, ...]]]):
+        self._vocabulary.update(tokens)
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        if output not in self._out[state]:
+            self._out[state].append(output)
+            self.size += 1
+            self.max_tokens = max(self.max_tokens, len(tokens))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                # Inherit the outputs of the longest proper suffix that is also a term
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find_all(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Find every lexicon term in text
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            List of mentions in order of their end offset, each with category, term
+            (the lexicon form), text (as written) and start/end character offsets
+        """
+        mentions = []
+        if not text:
+            return mentions
+
+        parts, tokens = split_tokens(text)
+
+        # Only tokens that occur in some term can take part in a match; any other token
+        # sends the automaton back to the root, so it is skipped without a Python step
+        vocabulary = self._vocabulary
+        candidates = [index for index, token in enumerate(tokens) if token in vocabulary]
+
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        recent = deque(maxlen=self.max_tokens or 1)
+        state = 0
+        previous = -2
+        offset = 0
+        offset_part = 0
+
+        for index in candidates:
+            if index != previous + 1:
+                state = 0
+            previous = index
+            token = tokens[index]
+
+            # Character offset of this token: lengths of all parts before it
+            part = 2 * index + 1
+            offset += sum(map(len, parts[offset_part:part]))
+            offset_part = part
+            recent.append((offset, offset + len(parts[part])))
+
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if not out[state]:
+                continue
+
+            for category, term, length, exact in out[state]:
+                if exact is not None:
+                    words = tuple(text[recent[i][0]:recent[i][1]] for i in range(-length, 0))
+                    if words != exact:
+                        continue
+                start, end = recent[-length][0], recent[-1][1]
+                mentions.append({
+                    "category": category,
+                    "term": term,
+                    "text": text[start:end],
+                    "start": start,
+                    "end": end,
+                })
+
+        return mentions
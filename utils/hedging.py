@@ -0,0 +1,136 @@
+"""
+Hedged LLM Requests
+
+Cuts tail latency by sending a duplicate request to a second provider when the primary
+has not answered within its recent latency percentile. The first answer that parses to
+a valid result wins; the other request is cancelled by shutting down its HTTP response,
+which frees its connection and pool thread even if it has not sent a first byte yet.
+
+Enable with LLM_HEDGING=1. The hedge delay is the primary provider's
+LLM_HEDGE_PERCENTILE latency (default p95), or LLM_HEDGE_DEFAULT_DELAY seconds until
+enough calls have been observed.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Callable
+
+from utils.llm_providers import LLMProvider, StreamCanceller, complete_with_failover
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+HEDGING_ENABLED = os.environ.get("LLM_HEDGING", "0") == "1"
+HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY = float(os.environ.get("LLM_HEDGE_DEFAULT_DELAY", "10"))
+HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "1"))
+
+_hedge_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("LLM_HEDGE_POOL_SIZE", "8")),
+    thread_name_prefix="llm-hedge"
+)
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "hedges_fired": 0, "hedges_won": 0, "primary_wins": 0, "failovers": 0}
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def hedge_delay(provider: LLMProvider) -> float:
+    """Seconds to wait on the primary provider before firing a hedge"""
+    delay = provider.latency_percentile(HEDGE_PERCENTILE)
+    if delay is None:
+        delay = HEDGE_DEFAULT_DELAY
+    return max(delay, HEDGE_MIN_DELAY)
+
+
+def _collect(provider: LLMProvider, system_prompt: str, user_content: str, max_tokens: int,
+             temperature: float, canceller: StreamCanceller) -> str:
+    # Streaming lets the loser be abandoned from the winner's thread: the canceller shuts
+    # its response down and the stream raises StreamCancelled
+    return "".join(provider.stream(system_prompt, user_content, max_tokens, temperature, canceller))
+
+
+def hedged_complete(providers: List[LLMProvider], system_prompt: str, user_content: str,
+                    parse: Callable[[str], Any], max_tokens: int = 2000,
+                    temperature: float = 0.2) -> Any:
+    """
+    Complete a prompt, hedging to the secondary provider if the primary is slow
+
+    Args:
+        providers: Configured providers in preference order
+        system_prompt: System instructions
+        user_content: User message
+        parse: Turns reply text into a result; a falsy result counts as invalid
+        max_tokens: Maximum number of output tokens
+        temperature: Sampling temperature
+
+    Returns:
+        The first valid parsed result, or the primary's (invalid) result if no
+        request produced a valid one
+
+    Raises:
+        Exception: The primary provider's error if every request failed (the last
+            provider's error when hedging is off and every provider failed)
+    """
+    primary = providers[0]
+    if not HEDGING_ENABLED or len(providers) < 2:
+        return parse(complete_with_failover(providers, system_prompt, user_content, max_tokens, temperature))
+
+    secondary = providers[1]
+    _count("requests")
+    cancellers = {primary.name: StreamCanceller(), secondary.name: StreamCanceller()}
+
+    def attempt(provider: LLMProvider):
+        text = _collect(provider, system_prompt, user_content, max_tokens, temperature,
+                        cancellers[provider.name])
+        return parse(text)
+
+    primary_future = _hedge_executor.submit(attempt, primary)
+    futures = {primary_future: primary}
+
+    done, _ = wait([primary_future], timeout=hedge_delay(primary))
+    if done and not primary_future.exception() and primary_future.result():
+        _count("primary_wins")
+        return primary_future.result()
+
+    if done:
+        logger.warning(f"{primary.name} returned no valid answer, failing over to {secondary.name}")
+        _count("failovers")
+    else:
+        logger.info(f"{primary.name} slower than its p{HEDGE_PERCENTILE:g}, hedging to {secondary.name}")
+        _count("hedges_fired")
+    futures[_hedge_executor.submit(attempt, secondary)] = secondary
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and future.result():
+                winner = futures[future]
+                for other, provider in futures.items():
+                    if other is not future:
+                        cancellers[provider.name].cancel()
+                        other.cancel()
+                if winner is primary:
+                    _count("primary_wins")
+                else:
+                    _count("hedges_won")
+                return future.result()
+
+    # No valid answer anywhere: behave like the unhedged call would have
+    return primary_future.result()
+
+
+def get_hedging_stats() -> Dict[str, Any]:
+    """Get hedge counters for this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["enabled"] = HEDGING_ENABLED
+    stats["percentile"] = HEDGE_PERCENTILE
+    return stats
@@ -0,0 +1,400 @@
+"""
+Job Queue Module
+
+Durable background jobs for work that should not hold a web worker: report analysis
+(PDF parsing and entity extraction) and therapy recommendation (the LLM call). A request
+enqueues a job and returns its id at once; worker processes claim jobs from a SQLite
+queue shared by every web worker, run them, and record their stage, progress, partial
+results and result, which clients poll (GET /api/jobs/<id>).
+
+A claimed job is leased to its worker, and the lease is renewed while the job runs. A
+job whose worker died (its lease ran out) is picked up again, up to JOB_MAX_ATTEMPTS
+times. Finished jobs are kept for JOB_RETENTION_SECONDS.
+
+Each web process starts JOB_WORKERS worker processes (1 by default) on its first
+enqueue. The count multiplies: every web worker gets its own job workers, and every job
+worker may start a PDF pool of PDF_POOL_SIZE processes. With several web workers, set
+JOB_WORKERS=0 and run a single pool of workers separately instead:
+    python -m utils.job_queue [workers]
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import signal
+import socket
+import sqlite3
+import logging
+import importlib
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_DB = os.environ.get("JOB_QUEUE_DB", os.path.join(os.getcwd(), "instance", "jobs.db"))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_WORKER_START_METHOD = os.environ.get("JOB_WORKER_START_METHOD", "forkserver")
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", "0.25"))
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", str(24 * 3600)))
+
+# Handlers by job kind, as "module:function", imported in the worker on first use.
+# A handler is called with the job payload and its JobContext and returns the result.
+JOB_HANDLERS = {
+    "analysis": "utils.analysis_jobs:run_analysis",
+    "recommendation": "utils.analysis_jobs:run_recommendation",
+}
+
+# Stage and progress updates are written at most this often (a new stage always is)
+_UPDATE_INTERVAL = 0.25
+
+_JSON_COLUMNS = ("payload", "partial", "result")
+
+
+class JobQueue:
+    """SQLite-backed queue of jobs with their status, progress and results"""
+
+    def __init__(self, db_path: str = JOB_QUEUE_DB):
+        """
+        Initialize the queue
+
+        Args:
+            db_path: Path of the SQLite file shared by the web and worker processes
+        """
+        self.db_path = db_path
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the queue safe across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, owner TEXT, status TEXT NOT NULL, "
+                "stage TEXT, progress REAL NOT NULL DEFAULT 0, payload TEXT NOT NULL, partial TEXT, "
+                "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, claim TEXT, "
+                "lease_until REAL, created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at)")
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], owner: Optional[str] = None) -> str:
+        """
+        Add a job to the queue
+
+        Args:
+            kind: Job kind (a key of JOB_HANDLERS)
+            payload: JSON-serialisable input of the job
+            owner: Id of the user the job belongs to, if any
+
+        Returns:
+            Job id
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, owner, status, stage, payload, created_at) "
+                "VALUES (?, ?, ?, 'queued', 'Queued', ?, ?)",
+                (job_id, kind, owner, json.dumps(payload), now)
+            )
+            # Finished jobs are dropped once their results are no longer needed
+            conn.execute("DELETE FROM jobs WHERE finished_at < ?", (now - JOB_RETENTION_SECONDS,))
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id: str, include_payload: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get a job by id
+
+        Args:
+            job_id: Job id
+            include_payload: Include the job's input
+
+        Returns:
+            Job with id, kind, owner, status (queued, running, succeeded or failed),
+            stage, progress (0 to 1), partial results, result, error, attempts and
+            timestamps, or None if there is no such job
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for column in _JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        del job["claim"]
+        if not include_payload:
+            del job["payload"]
+        return job
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the oldest runnable job to a worker
+
+        Args:
+            worker: Worker name
+
+        Returns:
+            The job with its payload, or None if no job is waiting
+        """
+        now = time.time()
+        claim = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'The job was interrupted too many times', "
+                "finished_at = ? WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, JOB_MAX_ATTEMPTS)
+            )
+            # A single statement, so two workers never claim the same job
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, claim = ?, lease_until = ?, "
+                "attempts = attempts + 1, started_at = ? WHERE id = ("
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1)",
+                (worker, claim, now + JOB_LEASE_SECONDS, now, now)
+            ).rowcount
+            if not claimed:
+                return None
+            job_id = conn.execute("SELECT id FROM jobs WHERE claim = ?", (claim,)).fetchone()["id"]
+        return self.get(job_id, include_payload=True)
+
+    def update(self, job_id: str, worker: str, stage: Optional[str] = None, progress: Optional[float] = None,
+               partial: Optional[List[Any]] = None) -> bool:
+        """
+        Record a running job's progress and renew its lease
+
+        Returns:
+            False if the job is no longer leased to this worker
+        """
+        assignments = ["lease_until = ?"]
+        values: List[Any] = [time.time() + JOB_LEASE_SECONDS]
+        if stage is not None:
+            assignments.append("stage = ?")
+            values.append(stage)
+        if progress is not None:
+            assignments.append("progress = ?")
+            values.append(min(max(progress, 0.0), 1.0))
+        if partial is not None:
+            assignments.append("partial = ?")
+            values.append(json.dumps(partial))
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET {', '.join(assignments)} WHERE id = ? AND worker = ? AND status = 'running'",
+                values + [job_id, worker]
+            ).rowcount > 0
+
+    def finish(self, job_id: str, worker: str, result: Any = None, error: Optional[str] = None):
+        """Record a job's result, or the error it failed with"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, progress = ?, result = ?, error = ?, finished_at = ?, "
+                "lease_until = NULL WHERE id = ? AND worker = ? AND status = 'running'",
+                ("failed" if error else "succeeded", "Failed" if error else "Done", 0.0 if error else 1.0,
+                 None if error else json.dumps(result), error, time.time(), job_id, worker)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of jobs by status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        stats = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        stats.update({row[0]: row[1] for row in rows})
+        return stats
+
+
+class JobContext:
+    """Handle a job handler reports its progress through"""
+
+    def __init__(self, queue: JobQueue, job_id: str, worker: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self.partial: List[Any] = []
+        self._stage = None
+        self._written = 0.0
+
+    def update(self, stage: str, progress: Optional[float] = None):
+        """
+        Report the stage the job is in
+
+        Args:
+            stage: Short description of the current step, shown to the user
+            progress: Fraction of the job done (0 to 1)
+        """
+        now = time.monotonic()
+        if stage != self._stage or now - self._written >= _UPDATE_INTERVAL:
+            self._stage = stage
+            self._written = now
+            self.queue.update(self.job_id, self.worker, stage, progress)
+
+    def add_partial(self, item: Any):
+        """Publish part of the result before the job finishes (e.g. one therapy)"""
+        self.partial.append(item)
+        self.queue.update(self.job_id, self.worker, partial=self.partial)
+
+
+def _handler(kind: str) -> Callable[[Dict[str, Any], JobContext], Any]:
+    module, function = JOB_HANDLERS[kind].split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any], worker: str):
+    """
+    Run a claimed job and record its outcome
+
+    ValueError messages are shown to the user as they are; other errors are logged.
+    """
+    context = JobContext(queue, job["id"], worker)
+    done = threading.Event()
+
+    def keep_leased():
+        # Long steps (an LLM call, a large PDF) report nothing for a while
+        while not done.wait(JOB_LEASE_SECONDS / 3):
+            queue.update(job["id"], worker)
+
+    heartbeat = threading.Thread(target=keep_leased, daemon=True)
+    heartbeat.start()
+    started = time.perf_counter()
+    try:
+        result = _handler(job["kind"])(job["payload"], context)
+    except ValueError as e:
+        logger.warning(f"{job['kind']} job {job['id']} failed: {str(e)}")
+        queue.finish(job["id"], worker, error=str(e))
+    except Exception as e:
+        logger.exception(f"{job['kind']} job {job['id']} failed")
+        queue.finish(job["id"], worker, error=f"{type(e).__name__}: {str(e)}")
+    else:
+        queue.finish(job["id"], worker, result=result)
+        logger.info(f"Finished {job['kind']} job {job['id']} in {time.perf_counter() - started:.2f}s")
+    finally:
+        done.set()
+        heartbeat.join()
+
+
+def _worker_main(db_path: str, stop):
+    # Worker processes are stopped by their parent; the terminal's Ctrl-C is its business
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    queue = JobQueue(db_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    parent = multiprocessing.parent_process()
+    logger.info(f"Job worker {worker} started")
+    # Exits with its parent, even when the parent was killed without cleaning up
+    while not stop.is_set() and (parent is None or parent.is_alive()):
+        try:
+            job = queue.claim(worker)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not claim a job: {str(e)}")
+            job = None
+        if job is None:
+            stop.wait(JOB_POLL_INTERVAL)
+            continue
+        run_job(queue, job, worker)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+_workers: List[multiprocessing.Process] = []
+_workers_pid = None
+_stop = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get the process-wide job queue"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def start_workers(count: Optional[int] = None) -> List[multiprocessing.Process]:
+    """
+    Start the job worker processes for the current process
+
+    Started once, and again after a fork, so each gunicorn worker owns its own.
+
+    Args:
+        count: Number of workers (defaults to JOB_WORKERS)
+
+    Returns:
+        The worker processes
+    """
+    global _workers, _workers_pid, _stop
+    count = JOB_WORKERS if count is None else count
+    pid = os.getpid()
+    with _queue_lock:
+        if _workers_pid != pid:
+            context = multiprocessing.get_context(JOB_WORKER_START_METHOD)
+            _stop = context.Event()
+            # Not daemonic: a job may start its own process pool (PDF extraction)
+            _workers = [context.Process(target=_worker_main, args=(get_job_queue().db_path, _stop),
+                                        name=f"job-worker-{number}")
+                        for number in range(count)]
+            for process in _workers:
+                process.start()
+            _workers_pid = pid
+            if _workers:
+                logger.info(f"Started {len(_workers)} job workers")
+                atexit.register(stop_workers)
+    return _workers
+
+
+def stop_workers(timeout: float = 10.0):
+    """Stop the worker processes after their current job"""
+    if _stop is None or _workers_pid != os.getpid():
+        return
+    _stop.set()
+    for process in _workers:
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+
+
+def submit_job(kind: str, payload: Dict[str, Any], owner: Optional[str] = None) -> str:
+    """
+    Enqueue a job, starting this process's workers if they are not running yet
+
+    Args:
+        kind: Job kind (a key of JOB_HANDLERS)
+        payload: JSON-serialisable input of the job
+        owner: Id of the user the job belongs to, if any
+
+    Returns:
+        Job id
+    """
+    job_id = get_job_queue().enqueue(kind, payload, owner)
+    start_workers()
+    return job_id
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    workers = start_workers(int(sys.argv[1]) if len(sys.argv) > 1 else max(JOB_WORKERS, 1))
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        stop_workers()
@@ -0,0 +1,177 @@
+r"""
+JSON Extraction Utility
+
+Linear-time extraction of JSON values from free-form LLM output. Replaces the greedy
+r'(\{.*\})' DOTALL search, which backtracks quadratically on long replies and discards
+everything when the reply has trailing text or was cut off mid-object.
+"""
+
+import re
+import json
+import logging
+from typing import Dict, Any, List, Iterator, Optional, Sequence, Tuple
+
+from utils.therapy_stream import TherapyStreamParser
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"```[A-Za-z0-9_-]*[ \t]*\n?")
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+_DECODER = json.JSONDecoder()
+_INVALID = object()
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove markdown code fences (```json ... ```) around or inside a reply"""
+    return _FENCE.sub("", text)
+
+
+def _decode(text: str, start: int, end: int) -> Any:
+    try:
+        value, stop = _DECODER.raw_decode(text, start)
+    except (json.JSONDecodeError, RecursionError):
+        return _INVALID
+    return value if stop == end else _INVALID
+
+
+def _decode_candidate(text: str, start: int, end: int, has_object: bool,
+                      nested: List[Tuple[int, int, bool]]) -> Iterator[Any]:
+    value = _decode(text, start, end)
+    if value is not _INVALID:
+        yield value
+        return
+    if text[start] != "[" or not has_object:
+        return
+    # A bracket in prose ("[see above]") is not JSON; the values nested in it are
+    # tried in order instead, without descending into one that decoded
+    done_until = start
+    for inner_start, inner_end, inner_has_object in sorted(nested):
+        if inner_start < done_until:
+            continue
+        value = _decode(text, inner_start, inner_end)
+        if value is not _INVALID:
+            yield value
+            done_until = inner_end
+        elif text[inner_start] != "[" or not inner_has_object:
+            done_until = inner_end
+
+
+def iter_json_values(text: str) -> Iterator[Any]:
+    """
+    Yield every balanced top-level JSON object or array found in text
+
+    The text is scanned once; string literals are tracked only inside a candidate so
+    that apostrophes and quotes in surrounding prose cannot desynchronize the scan.
+    The brackets nested in a candidate are recorded on the way, so a candidate that is
+    not JSON is searched for values without scanning it again.
+
+    Args:
+        text: Free-form text that may contain JSON
+
+    Yields:
+        Decoded JSON values in order of appearance
+    """
+    # Offsets of the open brackets of the current candidate, and the brackets closed
+    # inside it, as (start, end, whether an object is nested in it)
+    opened: List[int] = []
+    nested: List[Tuple[int, int, bool]] = []
+    last_object = -1
+    in_string = False
+    skip = -1
+
+    # Only structural characters matter, so jump between them with a regex scan
+    for match in _STRUCTURAL.finditer(text):
+        i = match.start()
+        if i == skip:
+            continue
+        char = match.group()
+
+        if not opened:
+            if char == "{" or char == "[":
+                opened.append(i)
+            continue
+
+        if in_string:
+            if char == "\\":
+                skip = i + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{" or char == "[":
+            if char == "{":
+                last_object = i
+            opened.append(i)
+        elif char == "}" or char == "]":
+            start = opened.pop()
+            if opened:
+                nested.append((start, i + 1, last_object > start))
+            else:
+                yield from _decode_candidate(text, start, i + 1, last_object > start, nested)
+                nested = []
+
+
+def extract_json_object(text: str, required_keys: Sequence[str] = ()) -> Optional[Dict[str, Any]]:
+    """
+    Find the first JSON object in text that contains all required keys
+
+    Args:
+        text: Free-form model output
+        required_keys: Keys the object must contain
+
+    Returns:
+        The decoded object, or None if no suitable object was found
+    """
+    if not text:
+        return None
+
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict) and all(key in value for key in required_keys):
+            return value
+    except json.JSONDecodeError:
+        pass
+
+    for value in iter_json_values(strip_code_fences(text)):
+        if isinstance(value, dict) and all(key in value for key in required_keys):
+            return value
+    return None
+
+
+def parse_therapies(text: str) -> List[Dict[str, Any]]:
+    """
+    Extract the therapies array from a model reply
+
+    Handles a bare JSON reply, a reply wrapped in fences or prose, a top-level array,
+    and a truncated reply (complete therapy objects before the cut are recovered).
+
+    Args:
+        text: Model output
+
+    Returns:
+        List of therapy dictionaries (empty if none could be recovered)
+    """
+    if not text:
+        return []
+
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        value = None
+    if isinstance(value, dict) and isinstance(value.get("therapies"), list):
+        return [therapy for therapy in value["therapies"] if isinstance(therapy, dict)]
+
+    cleaned = strip_code_fences(text)
+    for value in iter_json_values(cleaned):
+        if isinstance(value, dict) and isinstance(value.get("therapies"), list):
+            return [therapy for therapy in value["therapies"] if isinstance(therapy, dict)]
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            return value
+
+    # No complete object: salvage the therapies that were finished before the cut-off
+    parser = TherapyStreamParser()
+    therapies = parser.feed(cleaned)
+    if therapies:
+        logger.warning(f"Recovered {len(therapies)} therapies from a truncated response")
+    return therapies
@@ -0,0 +1,211 @@
+"""
+Lab Value Extraction Module
+
+Extracts numeric lab results from report text in one pass of a single precompiled
+regex (analyte, value, unit and any printed reference range), normalizes values to a
+canonical unit per analyte and flags results outside the reference range.
+"""
+
+import re
+import logging
+from typing import Dict, Any, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Canonical unit and adult reference range per analyte, with the names reports use for it
+LAB_REFERENCE = {
+    "hemoglobin": {"unit": "g/dL", "low": 12.0, "high": 17.5, "aliases": ["hemoglobin", "haemoglobin", "hgb", "hb"]},
+    "glucose": {"unit": "mg/dL", "low": 70.0, "high": 99.0, "aliases": ["glucose", "blood sugar", "fbs"]},
+    "cholesterol": {"unit": "mg/dL", "low": 0.0, "high": 200.0, "aliases": ["total cholesterol", "cholesterol"]},
+    "triglycerides": {"unit": "mg/dL", "low": 0.0, "high": 150.0, "aliases": ["triglycerides", "triglyceride", "tg"]},
+    "creatinine": {"unit": "mg/dL", "low": 0.6, "high": 1.3, "aliases": ["creatinine", "creat"]},
+    "TSH": {"unit": "mIU/L", "low": 0.4, "high": 4.0, "aliases": ["TSH"]},
+    "T3": {"unit": "ng/dL", "low": 80.0, "high": 200.0, "aliases": ["T3"]},
+    "T4": {"unit": "μg/dL", "low": 5.0, "high": 12.0, "aliases": ["T4"]},
+    "WBC": {"unit": "cells/μL", "low": 4000.0, "high": 11000.0, "aliases": ["WBC"]},
+    "RBC": {"unit": "million/μL", "low": 4.2, "high": 5.9, "aliases": ["RBC"]},
+}
+
+# Multipliers from a reported unit to the analyte's canonical unit. Units are looked up
+# after _unit_key() normalization (lowercase, "µ"/"μ" -> "u", no spaces)
+UNIT_CONVERSIONS = {
+    "hemoglobin": {"g/dl": 1.0, "g/l": 0.1, "mmol/l": 1.611},
+    "glucose": {"mg/dl": 1.0, "mmol/l": 18.016},
+    "cholesterol": {"mg/dl": 1.0, "mmol/l": 38.67},
+    "triglycerides": {"mg/dl": 1.0, "mmol/l": 88.57},
+    "creatinine": {"mg/dl": 1.0, "umol/l": 1 / 88.4},
+    "TSH": {"miu/l": 1.0, "uiu/ml": 1.0, "mu/l": 1.0},
+    "T3": {"ng/dl": 1.0, "nmol/l": 65.1},
+    "T4": {"ug/dl": 1.0, "nmol/l": 1 / 12.87},
+    "WBC": {"cells/ul": 1.0, "/ul": 1.0, "x10^3/ul": 1000.0, "10^3/ul": 1000.0, "k/ul": 1000.0,
+            "x10^9/l": 1000.0, "10^9/l": 1000.0},
+    "RBC": {"million/ul": 1.0, "m/ul": 1.0, "x10^6/ul": 1.0, "10^6/ul": 1.0, "x10^12/l": 1.0, "10^12/l": 1.0},
+}
+
+_ALIASES = {alias.lower(): name for name, spec in LAB_REFERENCE.items() for alias in spec["aliases"]}
+
+
+def _unit_key(unit: str) -> str:
+    return re.sub(r"\s+", "", unit).lower().replace("µ", "u").replace("μ", "u").replace("×", "x")
+
+
+def _alternation(items: List[str]) -> str:
+    # Longest first so "total cholesterol" wins over "cholesterol"
+    return "|".join(re.escape(item).replace(r"\ ", r"\s+") for item in sorted(set(items), key=len, reverse=True))
+
+
+_GROUPED_NUMBER = r"[1-9]\d{0,2}(?:,\d{3})+(?:\.\d+)?"
+_GROUPED_NUMBER_RE = re.compile(rf"(?:{_GROUPED_NUMBER})\Z")
+
+
+def _compile_pattern() -> re.Pattern:
+    acronyms = [alias for spec in LAB_REFERENCE.values() for alias in spec["aliases"] if alias.isupper() or alias[-1].isdigit()]
+    words = [alias for alias in _ALIASES if alias not in {acronym.lower() for acronym in acronyms}]
+    units = {unit for conversions in UNIT_CONVERSIONS.values() for unit in conversions}
+    # Accept the micro sign spellings and optional spaces in units
+    unit_patterns = sorted(
+        (re.escape(unit).replace("u", "[uµμ]").replace(r"x", r"[x×*]\s*").replace("/", r"\s*/\s*") for unit in units),
+        key=len, reverse=True
+    )
+    unit_group = "|".join(unit_patterns)
+    # Thousands groups ("7,500", "11,200.5") are tried before a decimal comma ("5,5")
+    number = rf"{_GROUPED_NUMBER}|\d+(?:[.,]\d+)?"
+    return re.compile(
+        # Gene symbols and acronyms keep their case; analyte words match any case
+        rf"(?<![\w-])(?P<analyte>(?i:{_alternation(words)})|{_alternation(acronyms)})(?![\w-])"
+        # Optional qualifier such as "(fasting)" and a separator
+        rf"(?:\s*\([^()\n]{{0,30}}\))?\s*[:=]?\s*"
+        rf"(?P<comparator>[<>]=?)?\s*(?P<value>{number})(?!\d|[.,]\d)"
+        rf"(?:\s*(?P<unit>(?i:{unit_group})))?"
+        # Printed reference range: "(70-99)", "[ref 70 - 99 mg/dL]", "normal: 0.4 to 4.0"
+        rf"(?:\s*[(\[]?\s*(?i:ref(?:erence)?(?:\s+range)?|normal(?:\s+range)?|nr)?\s*[:=]?\s*"
+        rf"(?P<low>{number})\s*(?:-|–|to)\s*(?P<high>{number})(?:\s*(?i:{unit_group}))?\s*[)\]]?)?"
+    )
+
+
+# Compiled once per process
+_LAB_PATTERN = _compile_pattern()
+
+
+def _number(text: str) -> float:
+    if _GROUPED_NUMBER_RE.match(text):
+        return float(text.replace(",", ""))
+    return float(text.replace(",", "."))
+
+
+def _tidy(value: float) -> Any:
+    value = round(float(value), 2)
+    return int(value) if value.is_integer() else value
+
+
+def extract_lab_values(text: str) -> List[Dict[str, Any]]:
+    """
+    Extract numeric lab results from text
+
+    Args:
+        text: Report text
+
+    Returns:
+        List of lab results (name, value and unit normalized to the canonical unit,
+        reported_value/reported_unit as written, comparator, reference_range, flag and
+        offsets), in order of appearance. A result in a unit that cannot be converted
+        is kept as reported and is only flagged against a range printed with it.
+    """
+    labs = []
+    if not text:
+        return labs
+
+    for match in _LAB_PATTERN.finditer(text):
+        name = _ALIASES[re.sub(r"\s+", " ", match.group("analyte")).lower()]
+        reported_unit = match.group("unit")
+        conversions = UNIT_CONVERSIONS[name]
+        factor = conversions.get(_unit_key(reported_unit), None) if reported_unit else 1.0
+        unit = LAB_REFERENCE[name]["unit"]
+        if factor is None:
+            logger.debug(f"Unknown unit {reported_unit!r} for {name}, value kept unconverted")
+            factor, unit = 1.0, reported_unit
+
+        value = _number(match.group("value")) * factor
+        reference = None
+        if match.group("low") is not None:
+            low, high = _number(match.group("low")) * factor, _number(match.group("high")) * factor
+            # A descending "range" is usually something else, such as a date
+            if low <= high:
+                reference = (low, high)
+
+        labs.append({
+            "name": name,
+            "value": value,
+            "unit": unit,
+            "reported_value": match.group("value"),
+            "reported_unit": reported_unit or "",
+            "comparator": match.group("comparator") or "",
+            "reference_range": list(reference) if reference else None,
+            "start": match.start(),
+            "end": match.end(),
+        })
+
+    # Flagged on the converted values; rounded for display only afterwards
+    return flag_lab_values(labs)
+
+
+def _flag(value: float, comparator: str, low: float, high: float) -> Optional[str]:
+    if value != value:
+        return None
+    if not comparator:
+        return "low" if value < low else "high" if value > high else "normal"
+    # "<5" / ">200" only bound the result: flag it when every value it allows falls
+    # on the same side of the range (results are not negative)
+    if comparator.startswith("<"):
+        if value < low or (value == low and comparator == "<"):
+            return "low"
+        if low <= 0.0 and value <= high:
+            return "normal"
+    else:
+        if value > high or (value == high and comparator == ">"):
+            return "high"
+    return "indeterminate"
+
+
+def flag_lab_values(labs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Flag every lab result in a batch as low, high, normal or indeterminate
+
+    The printed reference range is used, else the local reference table when the value
+    is in the analyte's canonical unit. A result given as a bound ("<70") is
+    indeterminate unless the bound settles it. Values and ranges are compared as
+    given and rounded for display afterwards.
+
+    Args:
+        labs: Lab results with name, numeric value, unit and optional comparator and
+            reference_range
+
+    Returns:
+        The same list, with "flag" (None when there is no range to compare with) and
+        "reference_range" set on each result
+    """
+    for lab in labs:
+        reference = lab.get("reference_range")
+        spec = LAB_REFERENCE.get(lab["name"])
+        if reference:
+            low, high = reference[0], reference[1]
+        elif spec and lab.get("unit", spec["unit"]) == spec["unit"]:
+            low, high = spec["low"], spec["high"]
+        else:
+            low = high = None
+
+        value = lab["value"] if isinstance(lab["value"], (int, float)) else float("nan")
+        lab["flag"] = _flag(value, lab.get("comparator") or "", low, high) if low is not None else None
+        lab["reference_range"] = [_tidy(low), _tidy(high)] if low is not None else None
+        if value == value:
+            lab["value"] = _tidy(value)
+    return labs
+
+
+def get_reference_range(name: str) -> Optional[Dict[str, Any]]:
+    """Get the local reference range and canonical unit for an analyte"""
+    spec = LAB_REFERENCE.get(name)
+    if spec is None:
+        return None
+    return {"low": spec["low"], "high": spec["high"], "unit": spec["unit"]}
@@ -0,0 +1,418 @@
+"""
+Lexicon Store Module
+
+Loads large medical lexicons (diseases, drugs, genes, ... with synonyms) from TSV files
+and compiles them into a single binary artifact holding the token-level Aho-Corasick
+automaton used by utils.entity_matcher. The artifact is memory-mapped read-only, so
+loading it costs a header read regardless of lexicon size, and every gunicorn worker
+shares the same page-cache pages instead of holding a private copy of the automaton.
+
+Lexicon files are named <category>.tsv, one entry per line:
+    canonical term<TAB>synonym|synonym|...
+Blank lines and lines starting with '#' are ignored.
+
+utils.ner_extraction builds the artifact on import when it is missing or older than the
+lexicons. To build or inspect it by hand:
+    python -m utils.lexicon_store build data/lexicons -o data/lexicon.bin
+    python -m utils.lexicon_store info data/lexicon.bin
+"""
+
+import os
+import sys
+import mmap
+import zlib
+import struct
+import logging
+import argparse
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+
+from utils.entity_matcher import EntityMatcher, split_tokens
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GILEXv1\0"
+
+# Header: magic, then counts and the byte offset of each section
+_COUNTS = ("states", "edges", "tokens", "outputs", "patterns", "strings", "hash_size", "max_tokens")
+_SECTIONS = ("token_offsets", "token_blob", "token_hash", "root_next", "edge_offsets", "edge_tokens",
+             "edge_targets", "fail", "out_offsets", "out_patterns", "patterns", "string_offsets", "string_blob")
+_HEADER = struct.Struct(f"<8s{len(_COUNTS)}Q{len(_SECTIONS)}Q")
+
+# Per pattern: category string id, canonical string id, exact-case surface string id
+# (0xFFFFFFFF when case-insensitive), token count
+_PATTERN_FIELDS = 4
+_NO_STRING = 0xFFFFFFFF
+
+
+def read_lexicon_dir(path: str) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Read every <category>.tsv file in a directory
+
+    Args:
+        path: Directory containing the lexicon files
+
+    Returns:
+        (surface form, canonical term) pairs keyed by category
+    """
+    lexicon = {}
+    for filename in sorted(os.listdir(path)):
+        if not filename.endswith(".tsv"):
+            continue
+        category = filename[:-4]
+        entries = lexicon.setdefault(category, [])
+        with open(os.path.join(path, filename), encoding="utf-8") as handle:
+            for line in handle:
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                canonical, _, synonyms = line.partition("\t")
+                canonical = canonical.strip()
+                entries.append((canonical, canonical))
+                for synonym in synonyms.split("|"):
+                    if synonym.strip():
+                        entries.append((synonym.strip(), canonical))
+    return lexicon
+
+
+class _Strings:
+    """Deduplicated string table"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def add(self, value: str) -> int:
+        if value not in self.ids:
+            self.ids[value] = len(self.values)
+            self.values.append(value)
+        return self.ids[value]
+
+
+def _u32(values: Iterable[int]) -> bytes:
+    return array("I", values).tobytes()
+
+
+def _blob(items: List[str]) -> Tuple[bytes, bytes]:
+    encoded = [item.encode("utf-8") for item in items]
+    offsets = [0]
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    return _u32(offsets), b"".join(encoded)
+
+
+def build_lexicon(lexicon: Dict[str, Iterable[Any]], output_path: str,
+                  case_rules: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Compile a lexicon into a memory-mappable artifact
+
+    Args:
+        lexicon: Terms or (synonym, canonical) pairs keyed by category
+        output_path: Where to write the artifact (replaced atomically)
+        case_rules: Case rule per category (see utils.entity_matcher.CASE_RULES)
+
+    Returns:
+        Summary with term, state and byte counts
+    """
+    matcher = EntityMatcher(lexicon, case_rules)
+    goto, fail, outputs = matcher._goto, matcher._fail, matcher._out
+
+    # Token ids in sorted order so each state's edges can be binary searched
+    tokens = sorted({token for edges in goto for token in edges})
+    token_ids = {token: index for index, token in enumerate(tokens)}
+
+    strings = _Strings()
+    pattern_ids: Dict[Tuple, int] = {}
+    pattern_rows: List[int] = []
+    out_offsets = [0]
+    out_patterns: List[int] = []
+    for state_outputs in outputs:
+        for output in state_outputs:
+            if output not in pattern_ids:
+                category, canonical, length, exact = output
+                pattern_ids[output] = len(pattern_ids)
+                pattern_rows.extend((
+                    strings.add(category),
+                    strings.add(canonical),
+                    strings.add(" ".join(exact)) if exact is not None else _NO_STRING,
+                    length,
+                ))
+            out_patterns.append(pattern_ids[output])
+        out_offsets.append(len(out_patterns))
+
+    edge_offsets = [0]
+    edge_tokens: List[int] = []
+    edge_targets: List[int] = []
+    for edges in goto:
+        for token_id, target in sorted((token_ids[token], target) for token, target in edges.items()):
+            edge_tokens.append(token_id)
+            edge_targets.append(target)
+        edge_offsets.append(len(edge_tokens))
+
+    root_next = [0] * len(tokens)
+    for token, target in goto[0].items():
+        root_next[token_ids[token]] = target
+
+    # Open-addressing hash table from token bytes to token id + 1 (load factor <= 0.5)
+    hash_size = 1
+    while hash_size < 2 * max(len(tokens), 1):
+        hash_size *= 2
+    token_hash = [0] * hash_size
+    for token_id, token in enumerate(tokens):
+        slot = zlib.crc32(token.encode("utf-8")) & (hash_size - 1)
+        while token_hash[slot]:
+            slot = (slot + 1) & (hash_size - 1)
+        token_hash[slot] = token_id + 1
+
+    token_offsets, token_blob = _blob(tokens)
+    string_offsets, string_blob = _blob(strings.values)
+    sections = {
+        "token_offsets": token_offsets,
+        "token_blob": token_blob,
+        "token_hash": _u32(token_hash),
+        "root_next": _u32(root_next),
+        "edge_offsets": _u32(edge_offsets),
+        "edge_tokens": _u32(edge_tokens),
+        "edge_targets": _u32(edge_targets),
+        "fail": _u32(fail),
+        "out_offsets": _u32(out_offsets),
+        "out_patterns": _u32(out_patterns),
+        "patterns": _u32(pattern_rows),
+        "string_offsets": string_offsets,
+        "string_blob": string_blob,
+    }
+    counts = {
+        "states": len(goto),
+        "edges": len(edge_tokens),
+        "tokens": len(tokens),
+        "outputs": len(out_patterns),
+        "patterns": len(pattern_ids),
+        "strings": len(strings.values),
+        "hash_size": hash_size,
+        "max_tokens": matcher.max_tokens,
+    }
+
+    # Sections are 8-byte aligned so they can be cast to typed memoryviews in place
+    offsets = {}
+    position = _HEADER.size
+    for name in _SECTIONS:
+        position += -position % 8
+        offsets[name] = position
+        position += len(sections[name])
+
+    # Per process, so workers building the same artifact at start-up do not collide
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(_HEADER.pack(MAGIC, *(counts[name] for name in _COUNTS),
+                                  *(offsets[name] for name in _SECTIONS)))
+        for name in _SECTIONS:
+            handle.write(b"\0" * (offsets[name] - handle.tell()))
+            handle.write(sections[name])
+    os.replace(tmp_path, output_path)
+
+    summary = dict(counts, terms=matcher.size, bytes=position, path=output_path)
+    logger.info(f"Built lexicon {output_path}: {matcher.size} terms, {len(goto)} states, {position} bytes")
+    return summary
+
+
+class MappedEntityMatcher:
+    """EntityMatcher backed by a memory-mapped lexicon artifact"""
+
+    def __init__(self, path: str):
+        """
+        Map a lexicon artifact
+
+        Args:
+            path: Artifact written by build_lexicon()
+
+        Raises:
+            ValueError: The file is not a lexicon artifact of this version
+        """
+        if sys.byteorder != "little" or array("I").itemsize != 4:
+            raise ValueError("Lexicon artifacts require a little-endian platform with 32-bit unsigned ints")
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"{path} is not a lexicon artifact")
+        header = _HEADER.unpack_from(self._mmap, 0)
+        if header[0] != MAGIC:
+            raise ValueError(f"{path} is not a lexicon artifact (bad magic)")
+        counts = dict(zip(_COUNTS, header[1:1 + len(_COUNTS)]))
+        offsets = dict(zip(_SECTIONS, header[1 + len(_COUNTS):]))
+        self.counts = counts
+        self.max_tokens = counts["max_tokens"]
+
+        view = memoryview(self._mmap)
+        lengths = {
+            "token_offsets": counts["tokens"] + 1,
+            "token_hash": counts["hash_size"],
+            "root_next": counts["tokens"],
+            "edge_offsets": counts["states"] + 1,
+            "edge_tokens": counts["edges"],
+            "edge_targets": counts["edges"],
+            "fail": counts["states"],
+            "out_offsets": counts["states"] + 1,
+            "out_patterns": counts["outputs"],
+            "patterns": counts["patterns"] * _PATTERN_FIELDS,
+            "string_offsets": counts["strings"] + 1,
+        }
+        arrays = {name: view[offsets[name]:offsets[name] + 4 * length].cast("I")
+                  for name, length in lengths.items()}
+        self._token_offsets = arrays["token_offsets"]
+        self._token_hash = arrays["token_hash"]
+        self._root_next = arrays["root_next"]
+        self._edge_offsets = arrays["edge_offsets"]
+        self._edge_tokens = arrays["edge_tokens"]
+        self._edge_targets = arrays["edge_targets"]
+        self._fail = arrays["fail"]
+        self._out_offsets = arrays["out_offsets"]
+        self._out_patterns = arrays["out_patterns"]
+        self._patterns = arrays["patterns"]
+        self._string_offsets = arrays["string_offsets"]
+        self._token_blob = offsets["token_blob"]
+        self._string_blob = offsets["string_blob"]
+        self._hash_mask = counts["hash_size"] - 1
+        self.size = counts["patterns"]
+        # Decoded patterns, filled lazily: only patterns that actually match are decoded
+        self._pattern_cache: Dict[int, Tuple[str, str, int, Optional[Tuple[str, ...]]]] = {}
+
+    def _string(self, string_id: int) -> str:
+        start = self._string_blob + self._string_offsets[string_id]
+        end = self._string_blob + self._string_offsets[string_id + 1]
+        return self._mmap[start:end].decode("utf-8")
+
+    def _pattern(self, pattern_id: int) -> Tuple[str, str, int, Optional[Tuple[str, ...]]]:
+        pattern = self._pattern_cache.get(pattern_id)
+        if pattern is None:
+            base = pattern_id * _PATTERN_FIELDS
+            category, canonical, surface, length = self._patterns[base:base + _PATTERN_FIELDS]
+            exact = tuple(self._string(surface).split(" ")) if surface != _NO_STRING else None
+            pattern = (self._string(category), self._string(canonical), length, exact)
+            self._pattern_cache[pattern_id] = pattern
+        return pattern
+
+    def token_id(self, token: str) -> int:
+        """Id of a lowercase token in the lexicon vocabulary, or -1"""
+        encoded = token.encode("utf-8")
+        slot = zlib.crc32(encoded) & self._hash_mask
+        while True:
+            entry = self._token_hash[slot]
+            if not entry:
+                return -1
+            start = self._token_blob + self._token_offsets[entry - 1]
+            end = self._token_blob + self._token_offsets[entry]
+            if end - start == len(encoded) and self._mmap[start:end] == encoded:
+                return entry - 1
+            slot = (slot + 1) & self._hash_mask
+
+    def find_all(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Find every lexicon term in text
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            List of mentions in order of their end offset, each with category, term
+            (the canonical form), text (as written) and start/end character offsets
+        """
+        mentions = []
+        if not text:
+            return mentions
+
+        parts, tokens = split_tokens(text)
+
+        # Reports repeat the same words constantly, so each distinct token is hashed once
+        ids: Dict[str, int] = {}
+        token_id = self.token_id
+        for token in set(tokens):
+            ids[token] = token_id(token)
+        candidates = [(index, ids[token]) for index, token in enumerate(tokens) if ids[token] >= 0]
+
+        root_next = self._root_next
+        edge_offsets = self._edge_offsets
+        edge_tokens = self._edge_tokens
+        edge_targets = self._edge_targets
+        fail = self._fail
+        out_offsets = self._out_offsets
+        out_patterns = self._out_patterns
+        recent = deque(maxlen=self.max_tokens or 1)
+        state = 0
+        previous = -2
+        offset = 0
+        offset_part = 0
+
+        for index, tid in candidates:
+            if index != previous + 1:
+                state = 0
+            previous = index
+
+            part = 2 * index + 1
+            offset += sum(map(len, parts[offset_part:part]))
+            offset_part = part
+            recent.append((offset, offset + len(parts[part])))
+
+            # Follow failure links until some state has an edge for this token
+            while True:
+                if state == 0:
+                    state = root_next[tid]
+                    break
+                lo, hi = edge_offsets[state], edge_offsets[state + 1]
+                position = bisect_left(edge_tokens, tid, lo, hi)
+                if position < hi and edge_tokens[position] == tid:
+                    state = edge_targets[position]
+                    break
+                state = fail[state]
+
+            lo, hi = out_offsets[state], out_offsets[state + 1]
+            for position in range(lo, hi):
+                category, term, length, exact = self._pattern(out_patterns[position])
+                if exact is not None:
+                    words = tuple(text[recent[i][0]:recent[i][1]] for i in range(-length, 0))
+                    if words != exact:
+                        continue
+                start, end = recent[-length][0], recent[-1][1]
+                mentions.append({
+                    "category": category,
+                    "term": term,
+                    "text": text[start:end],
+                    "start": start,
+                    "end": end,
+                })
+
+        return mentions
+
+    def info(self) -> Dict[str, Any]:
+        """Get artifact counts and size"""
+        return dict(self.counts, path=self.path, bytes=len(self._mmap))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for building and inspecting lexicon artifacts"""
+    from utils.ner_extraction import CASE_RULES
+
+    parser = argparse.ArgumentParser(prog="python -m utils.lexicon_store", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile <category>.tsv lexicons into an artifact")
+    build.add_argument("lexicon_dir")
+    build.add_argument("-o", "--output", default="data/lexicon.bin")
+    info = commands.add_parser("info", help="show artifact counts")
+    info.add_argument("artifact")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "build":
+        summary = build_lexicon(read_lexicon_dir(args.lexicon_dir), args.output, CASE_RULES)
+    else:
+        summary = MappedEntityMatcher(args.artifact).info()
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
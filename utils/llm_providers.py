@@ -0,0 +1,550 @@
+"""
+LLM Provider Registry
+
+Common interface over the Anthropic, OpenAI and Gemini APIs. Each worker process keeps
+one long-lived provider instance (and model client) per provider instead of rebuilding
+clients on every request, and records per-provider latency and error counters.
+
+Every call goes through the resilience layer (utils.resilience): transient failures are
+retried with jittered backoff, and a provider whose circuit breaker is open is left out
+of get_configured_providers() so callers fail over to the next provider.
+
+Provider preference is configured with LLM_PROVIDERS (comma separated, default
+"anthropic,openai,gemini"); the first provider with an API key is used.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterator
+
+from utils.llm_transport import get_transport
+from utils.prompt_builder import estimate_tokens
+from utils.resilience import CircuitBreaker, RetryPolicy, LLM_READ_TIMEOUT
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDER_ORDER = [
+    name.strip() for name in os.environ.get("LLM_PROVIDERS", "anthropic,openai,gemini").split(",") if name.strip()
+]
+
+# Number of recent call latencies kept per provider for percentile estimates
+LATENCY_WINDOW = int(os.environ.get("LLM_LATENCY_WINDOW", "256"))
+
+# Mark the static system prompt as a cacheable prefix where the API supports it
+PROMPT_CACHING = os.environ.get("LLM_PROMPT_CACHING", "1") == "1"
+
+# Anthropic does not cache prefixes shorter than this (1024 tokens for Sonnet and Opus,
+# 2048 for Haiku); a marker on a shorter prompt is ignored
+ANTHROPIC_MIN_CACHE_TOKENS = int(os.environ.get("ANTHROPIC_MIN_CACHE_TOKENS", "1024"))
+
+
+class StreamCancelled(Exception):
+    """Raised by a stream that was cancelled from another thread"""
+
+
+class StreamCanceller:
+    """
+    Cancels a provider stream from another thread
+
+    HTTP providers attach their streaming response; cancel() shuts its socket down, so a
+    read blocked on the first (or next) byte returns at once instead of holding the
+    connection and its thread until LLM_READ_TIMEOUT. Streams without an attached
+    response (Gemini's SDK) stop at their next chunk.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._response = None
+        self.cancelled = False
+
+    def attach(self, response):
+        """Register the HTTP response of the stream (shut down at once if already cancelled)"""
+        with self._lock:
+            self._response = response
+            cancelled = self.cancelled
+        if cancelled:
+            _shutdown_response(response)
+
+    def cancel(self):
+        """Cancel the stream"""
+        with self._lock:
+            self.cancelled = True
+            response = self._response
+        if response is not None:
+            _shutdown_response(response)
+
+
+def _shutdown_response(response):
+    # Closing the socket does not wake a read blocked in another thread; shutting it
+    # down does (urllib3 >= 2.3)
+    try:
+        shutdown = getattr(response.raw, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
+        else:
+            response.close()
+    except Exception as e:
+        logger.debug(f"Error shutting down a cancelled stream: {str(e)}")
+
+
+class LLMProvider:
+    """Base class for LLM providers"""
+
+    name = ""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._calls = 0
+        self._errors = 0
+        self._total_latency = 0.0
+        self._input_tokens = 0
+        self._cached_input_tokens = 0
+        self.breaker = CircuitBreaker(self.name)
+        self.retry_policy = RetryPolicy()
+
+    def is_configured(self) -> bool:
+        """Whether credentials for this provider are available"""
+        raise NotImplementedError("Subclasses must implement is_configured()")
+
+    def complete(self, system_prompt: str, user_content: str, max_tokens: int = 2000,
+                 temperature: float = 0.2, json_mode: bool = False) -> str:
+        """
+        Generate a complete reply
+
+        Args:
+            system_prompt: System instructions
+            user_content: User message
+            max_tokens: Maximum number of output tokens
+            temperature: Sampling temperature
+            json_mode: Ask the provider for a JSON object where supported
+
+        Returns:
+            The reply text
+
+        Raises:
+            CircuitOpenError: The provider's circuit breaker is open
+            Exception: Any provider or transport error left after retries (recorded in
+                the error counter and the circuit breaker)
+        """
+        self.breaker.before_call()
+        started = time.perf_counter()
+        try:
+            text = self.retry_policy.call(
+                lambda: self._complete(system_prompt, user_content, max_tokens, temperature, json_mode),
+                label=self.name
+            )
+        except Exception:
+            self._record(time.perf_counter() - started, error=True)
+            self.breaker.record_failure()
+            raise
+        self._record(time.perf_counter() - started)
+        self.breaker.record_success()
+        return text
+
+    def stream(self, system_prompt: str, user_content: str, max_tokens: int = 2000,
+               temperature: float = 0.2, canceller: Optional[StreamCanceller] = None) -> Iterator[str]:
+        """
+        Generate a reply as a stream of text fragments
+
+        Args:
+            system_prompt: System instructions
+            user_content: User message
+            max_tokens: Maximum number of output tokens
+            temperature: Sampling temperature
+            canceller: Lets another thread abandon the stream
+
+        Yields:
+            Text fragments in generation order
+
+        Raises:
+            CircuitOpenError: The provider's circuit breaker is open
+            StreamCancelled: The canceller was cancelled (not counted as an error)
+        """
+        self.breaker.before_call()
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            received = False
+            try:
+                for chunk in self._stream(system_prompt, user_content, max_tokens, temperature, canceller):
+                    if canceller is not None and canceller.cancelled:
+                        raise StreamCancelled(self.name)
+                    received = True
+                    yield chunk
+                break
+            except StreamCancelled:
+                raise
+            except Exception as e:
+                # A cancelled stream fails with whatever the shut-down socket raised
+                if canceller is not None and canceller.cancelled:
+                    raise StreamCancelled(self.name) from e
+                # Only retry before anything was yielded; a partial reply cannot be replayed
+                if not received and self.retry_policy.should_retry(e, attempt):
+                    delay = self.retry_policy.delay(e, attempt)
+                    logger.warning(f"{self.name} stream failed ({str(e)}), retrying in {delay:.2f}s")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self._record(time.perf_counter() - started, error=True)
+                self.breaker.record_failure()
+                raise
+        if canceller is not None and canceller.cancelled:
+            # The shut-down socket may read as a clean end of the reply
+            raise StreamCancelled(self.name)
+        self._record(time.perf_counter() - started)
+        self.breaker.record_success()
+
+    def _complete(self, system_prompt: str, user_content: str, max_tokens: int,
+                  temperature: float, json_mode: bool) -> str:
+        raise NotImplementedError("Subclasses must implement _complete()")
+
+    def _stream(self, system_prompt: str, user_content: str, max_tokens: int,
+                temperature: float, canceller: Optional[StreamCanceller]) -> Iterator[str]:
+        raise NotImplementedError("Subclasses must implement _stream()")
+
+    def _record(self, elapsed: float, error: bool = False):
+        with self._lock:
+            self._calls += 1
+            if error:
+                self._errors += 1
+            else:
+                self._latencies.append(elapsed)
+                self._total_latency += elapsed
+
+    def _record_usage(self, input_tokens: Optional[int], cached_tokens: Optional[int] = 0):
+        """Record input tokens reported by the provider (cached_tokens were read from its prompt cache)"""
+        with self._lock:
+            self._input_tokens += input_tokens or 0
+            self._cached_input_tokens += cached_tokens or 0
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Latency of recent successful calls at the given percentile
+
+        Args:
+            percentile: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds, or None if no calls have completed yet
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        index = min(int(len(samples) * percentile / 100), len(samples) - 1)
+        return samples[index]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get call, error and latency counters for this provider"""
+        with self._lock:
+            calls = self._calls
+            errors = self._errors
+            successes = calls - errors
+            total_latency = self._total_latency
+            input_tokens = self._input_tokens
+            cached_input_tokens = self._cached_input_tokens
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "configured": self.is_configured(),
+            "calls": calls,
+            "errors": errors,
+            "avg_latency_ms": round(total_latency / successes * 1000, 1) if successes else None,
+            "p50_latency_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_latency_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "circuit": self.breaker.stats(),
+        }
+
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic Messages API over the pooled transport"""
+
+    name = "anthropic"
+    url = "https://api.anthropic.com/v1/messages"
+
+    def __init__(self):
+        super().__init__()
+        self.api_key = os.environ.get("ANTHROPIC_API_KEY", "")
+        self.model = os.environ.get("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022")
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "x-api-key": self.api_key,
+            "content-type": "application/json",
+            "anthropic-version": "2023-06-01"
+        }
+
+    def _payload(self, system_prompt: str, user_content: str, max_tokens: int,
+                 temperature: float) -> Dict[str, Any]:
+        system = system_prompt
+        if PROMPT_CACHING and estimate_tokens(system_prompt) >= ANTHROPIC_MIN_CACHE_TOKENS:
+            # The system prompt is identical across calls, so later calls read it from cache
+            system = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "system": system,
+            "messages": [
+                {"role": "user", "content": user_content}
+            ],
+            "temperature": temperature
+        }
+
+    def _complete(self, system_prompt, user_content, max_tokens, temperature, json_mode):
+        response = get_transport().post(
+            self.url,
+            headers=self._headers(),
+            json=self._payload(system_prompt, user_content, max_tokens, temperature)
+        )
+        response.raise_for_status()
+        body = response.json()
+        self._record_anthropic_usage(body.get("usage", {}))
+        return body["content"][0]["text"]
+
+    def _stream(self, system_prompt, user_content, max_tokens, temperature, canceller):
+        data = self._payload(system_prompt, user_content, max_tokens, temperature)
+        data["stream"] = True
+        response = get_transport().post(self.url, headers=self._headers(), json=data, stream=True)
+        if canceller is not None:
+            canceller.attach(response)
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event.get("type") == "content_block_delta":
+                    yield event["delta"].get("text", "")
+                elif event.get("type") == "message_start":
+                    self._record_anthropic_usage(event.get("message", {}).get("usage", {}))
+
+    def _record_anthropic_usage(self, usage: Dict[str, Any]):
+        cached = usage.get("cache_read_input_tokens") or 0
+        written = usage.get("cache_creation_input_tokens") or 0
+        self._record_usage((usage.get("input_tokens") or 0) + cached + written, cached)
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI Chat Completions API over the pooled transport"""
+
+    name = "openai"
+    url = "https://api.openai.com/v1/chat/completions"
+
+    def __init__(self):
+        super().__init__()
+        self.api_key = os.environ.get("OPENAI_API_KEY", "")
+        # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
+        self.model = os.environ.get("OPENAI_MODEL", "gpt-4o")
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def _payload(self, system_prompt: str, user_content: str, max_tokens: int,
+                 temperature: float) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+
+    def _complete(self, system_prompt, user_content, max_tokens, temperature, json_mode):
+        data = self._payload(system_prompt, user_content, max_tokens, temperature)
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
+        response = get_transport().post(self.url, headers=self._headers(), json=data)
+        response.raise_for_status()
+        body = response.json()
+        self._record_openai_usage(body.get("usage"))
+        return body["choices"][0]["message"]["content"]
+
+    def _stream(self, system_prompt, user_content, max_tokens, temperature, canceller):
+        data = self._payload(system_prompt, user_content, max_tokens, temperature)
+        data["stream"] = True
+        data["stream_options"] = {"include_usage": True}
+        response = get_transport().post(self.url, headers=self._headers(), json=data, stream=True)
+        if canceller is not None:
+            canceller.attach(response)
+        with response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                event = json.loads(payload)
+                self._record_openai_usage(event.get("usage"))
+                choices = event.get("choices") or [{}]
+                yield choices[0].get("delta", {}).get("content") or ""
+
+    def _record_openai_usage(self, usage: Optional[Dict[str, Any]]):
+        # Prompts over 1024 tokens are cached by OpenAI automatically; the static system
+        # prompt comes first so it forms the shared prefix
+        if usage:
+            details = usage.get("prompt_tokens_details") or {}
+            self._record_usage(usage.get("prompt_tokens"), details.get("cached_tokens"))
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini via google-generativeai, configured once per process"""
+
+    name = "gemini"
+
+    def __init__(self):
+        super().__init__()
+        self.api_key = os.environ.get("GEMINI_API_KEY", "")
+        self.model_name = os.environ.get("GEMINI_MODEL", "gemini-2.0-flash")
+        self._model = None
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def _generation_config(self, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        return {"max_output_tokens": max_tokens, "temperature": temperature}
+
+    def _complete(self, system_prompt, user_content, max_tokens, temperature, json_mode):
+        response = self._get_model().generate_content(
+            f"{system_prompt}\n\n{user_content}",
+            generation_config=self._generation_config(max_tokens, temperature),
+            request_options={"timeout": LLM_READ_TIMEOUT}
+        )
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self._record_usage(usage.prompt_token_count, getattr(usage, "cached_content_token_count", 0))
+        return response.text
+
+    def _stream(self, system_prompt, user_content, max_tokens, temperature, canceller):
+        response = self._get_model().generate_content(
+            f"{system_prompt}\n\n{user_content}",
+            generation_config=self._generation_config(max_tokens, temperature),
+            stream=True,
+            request_options={"timeout": LLM_READ_TIMEOUT}
+        )
+        for chunk in response:
+            yield chunk.text
+
+
+PROVIDER_CLASSES = {
+    "anthropic": AnthropicProvider,
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+}
+
+_providers = {}
+_providers_pid = None
+_providers_lock = threading.Lock()
+
+
+def get_provider(name: str) -> LLMProvider:
+    """
+    Get the long-lived provider instance for the current process
+
+    Args:
+        name: Provider name (anthropic, openai, gemini)
+
+    Returns:
+        The provider instance
+    """
+    global _providers_pid
+    pid = os.getpid()
+    with _providers_lock:
+        # Clients created before a fork are not reused by gunicorn workers
+        if _providers_pid != pid:
+            _providers.clear()
+            _providers_pid = pid
+        provider = _providers.get(name)
+        if provider is None:
+            provider = PROVIDER_CLASSES[name]()
+            _providers[name] = provider
+    return provider
+
+
+def get_configured_providers() -> List[LLMProvider]:
+    """Get configured providers whose circuit is not open, in preference order"""
+    providers = []
+    for name in LLM_PROVIDER_ORDER:
+        if name not in PROVIDER_CLASSES:
+            logger.warning(f"Ignoring unknown LLM provider: {name}")
+            continue
+        provider = get_provider(name)
+        if not provider.is_configured():
+            continue
+        if not provider.breaker.allows_calls():
+            logger.debug(f"Skipping {name}: circuit open")
+            continue
+        providers.append(provider)
+    return providers
+
+
+def get_active_provider() -> Optional[LLMProvider]:
+    """Get the preferred available provider, or None if no provider can be called"""
+    providers = get_configured_providers()
+    return providers[0] if providers else None
+
+
+def complete_with_failover(providers: List[LLMProvider], system_prompt: str, user_content: str,
+                           max_tokens: int = 2000, temperature: float = 0.2,
+                           json_mode: bool = False) -> str:
+    """
+    Complete a prompt with the first provider that answers
+
+    Args:
+        providers: Providers in preference order
+        system_prompt: System instructions
+        user_content: User message
+        max_tokens: Maximum number of output tokens
+        temperature: Sampling temperature
+        json_mode: Ask the provider for a JSON object where supported
+
+    Returns:
+        The reply text
+
+    Raises:
+        Exception: The last provider's error if every provider failed
+    """
+    last_error = None
+    for provider in providers:
+        try:
+            return provider.complete(system_prompt, user_content, max_tokens, temperature, json_mode)
+        except Exception as e:
+            logger.warning(f"{provider.name} call failed, trying next provider: {str(e)}")
+            last_error = e
+    if last_error is None:
+        raise RuntimeError("No LLM provider available")
+    raise last_error
+
+
+def get_provider_stats() -> Dict[str, Any]:
+    """Get latency and error counters for every known provider"""
+    return {name: get_provider(name).stats() for name in PROVIDER_CLASSES}
@@ -0,0 +1,105 @@
+"""
+LLM Transport Module
+
+Shared HTTP transport for outbound LLM provider calls. Each worker process keeps one
+pooled, keep-alive session so repeated recommendations reuse TCP/TLS connections
+instead of paying a fresh handshake on every call.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.resilience import LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Pool sizing (number of hosts kept, connections kept per host)
+POOL_CONNECTIONS = int(os.environ.get("LLM_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.environ.get("LLM_POOL_MAXSIZE", "16"))
+
+
+class ProviderTransport:
+    """Pooled keep-alive HTTP session used for all LLM provider requests"""
+
+    def __init__(self, pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE):
+        """
+        Initialize the transport
+
+        Args:
+            pool_connections: Number of per-host connection pools to keep
+            pool_maxsize: Maximum number of connections kept open per host
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request over the pooled session (with connect/read timeouts by default)"""
+        kwargs.setdefault("timeout", (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT))
+        return self.session.post(url, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Report connection reuse for this process
+
+        Returns:
+            Dictionary with request, hit (reused connection) and miss (new connection) counts
+        """
+        pools = self._adapter.poolmanager.pools
+        requests_sent = 0
+        connections_opened = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+
+        return {
+            "pid": os.getpid(),
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "requests": requests_sent,
+            "pool_hits": max(requests_sent - connections_opened, 0),
+            "pool_misses": connections_opened,
+        }
+
+
+_transport = None
+_transport_pid = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> ProviderTransport:
+    """
+    Get the transport for the current process
+
+    The transport is created lazily and re-created after a fork, so gunicorn workers
+    never share sockets inherited from the master process.
+    """
+    global _transport, _transport_pid
+    pid = os.getpid()
+    if _transport is None or _transport_pid != pid:
+        with _transport_lock:
+            if _transport is None or _transport_pid != pid:
+                logger.debug(f"Creating LLM transport for process {pid}")
+                _transport = ProviderTransport()
+                _transport_pid = pid
+    return _transport
+
+
+def get_transport_stats() -> Dict[str, Any]:
+    """Get pool hit/miss counts for the current process"""
+    return get_transport().stats()
@@ -1,107 +1,403 @@
+import os
+import zlib
 import logging
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Iterable, Iterator
+
+from utils.entity_matcher import EntityMatcher, token_start_from_end
+from utils.lexicon_store import MappedEntityMatcher, build_lexicon, read_lexicon_dir
+from utils.lab_values import extract_lab_values
+from utils.variants import extract_variants
+from utils.pharmacogenomics import extract_phenotypes
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def extract_entities_from_text(text: str) -> Dict[str, Any]:
+# Simple disease keywords
+DISEASE_KEYWORDS = [
+    "diabetes", "hypertension", "cancer", "asthma", "arthritis",
+    "alzheimer", "parkinson", "hypothyroidism", "hyperthyroidism",
+    "fibroids", "covid", "tuberculosis", "pneumonia", "anemia"
+]
+
+# Simple symptom keywords
+SYMPTOM_KEYWORDS = [
+    "pain", "fever", "cough", "fatigue", "headache",
+    "nausea", "vomiting", "dizziness", "rash", "swelling",
+    "shortness of breath", "insomnia", "anxiety", "depression"
+]
+
+# Simple lab test keywords (with units)
+LAB_UNITS = {
+    "hemoglobin": "g/dL",
+    "glucose": "mg/dL",
+    "cholesterol": "mg/dL",
+    "triglycerides": "mg/dL",
+    "creatinine": "mg/dL",
+    "TSH": "mIU/L",
+    "T3": "ng/dL",
+    "T4": "μg/dL",
+    "WBC": "cells/μL",
+    "RBC": "million/μL"
+}
+
+# Simple gene mutation patterns
+GENE_PATTERNS = [
+    "BRCA1", "BRCA2", "EGFR", "KRAS", "HER2", "TP53",
+    "BRAF", "MLH1", "MSH2", "APC", "RET", "PTEN"
+]
+
+# Medication patterns
+MEDICATION_PATTERNS = [
+    "aspirin", "acetaminophen", "ibuprofen", "lisinopril",
+    "metformin", "atorvastatin", "levothyroxine", "amlodipine",
+    "albuterol", "metoprolol", "simvastatin", "omeprazole"
+]
+
+# Gene symbols are case-sensitive ("APC"/"RET" are also English words), as are
+# abbreviations such as TSH or HTN; other terms match regardless of case
+CASE_RULES = {
+    "diseases": "acronyms",
+    "symptoms": "insensitive",
+    "lab_values": "acronyms",
+    "genes": "sensitive",
+    "medications": "insensitive",
+}
+
+# Compiled lexicon artifact (see utils/lexicon_store.py), built from the TSV lexicons
+# when it is missing or older than them; the built-in keyword lists are only a fallback
+LEXICON_PATH = os.environ.get(
+    "NER_LEXICON_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lexicon.bin")
+)
+LEXICON_DIR = os.environ.get(
+    "NER_LEXICON_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "lexicons")
+)
+
+# Characters carried over between chunks in streaming mode so that a lab result split
+# across a chunk (page) boundary is still read whole; longer lab rows may be missed
+NER_LAB_OVERLAP = int(os.environ.get("NER_LAB_OVERLAP", "256"))
+# Characters of the last line carried over for variants; a line longer than this
+# (e.g. pages without line breaks) is cut, and its pieces are grouped per side
+NER_VARIANT_OVERLAP = int(os.environ.get("NER_VARIANT_OVERLAP", "256"))
+
+# Bump when a change to extraction changes its output, so cached entities
+# (utils/document_cache.py) from the previous version are not served
+NER_EXTRACTOR_VERSION = "4"
+
+
+def _lexicon_is_stale() -> bool:
+    if not os.path.isdir(LEXICON_DIR):
+        return False
+    sources = [os.path.join(LEXICON_DIR, name) for name in os.listdir(LEXICON_DIR) if name.endswith(".tsv")]
+    if not os.path.exists(LEXICON_PATH):
+        return bool(sources)
+    built = os.path.getmtime(LEXICON_PATH)
+    return any(os.path.getmtime(source) > built for source in sources)
+
+
+def _load_matcher():
+    if _lexicon_is_stale():
+        try:
+            build_lexicon(read_lexicon_dir(LEXICON_DIR), LEXICON_PATH, CASE_RULES)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not build NER lexicon {LEXICON_PATH} from {LEXICON_DIR}: {str(e)}")
+    if os.path.exists(LEXICON_PATH):
+        try:
+            matcher = MappedEntityMatcher(LEXICON_PATH)
+            logger.info(f"Loaded NER lexicon {LEXICON_PATH} ({matcher.size} patterns)")
+            return matcher
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load NER lexicon {LEXICON_PATH}: {str(e)}")
+    # Synonyms, brand names and most pharmacogenes are only in the TSV lexicons
+    logger.error(f"NER lexicon unavailable, using the built-in keyword lists: synonyms, brand names "
+                 f"and genes from {LEXICON_DIR} will not be recognized")
+    return EntityMatcher({
+        "diseases": DISEASE_KEYWORDS,
+        "symptoms": SYMPTOM_KEYWORDS,
+        "lab_values": list(LAB_UNITS),
+        "genes": GENE_PATTERNS,
+        "medications": MEDICATION_PATTERNS,
+    }, CASE_RULES)
+
+
+# Loaded once per process (a memory-mapped lexicon shares its pages across workers)
+_matcher = _load_matcher()
+_extractor_version = None
+
+
+def extractor_version() -> str:
     """
-    Extract medical entities from text using spaCy
-    
-    In a production implementation, this would use a proper medical NER model like BioBERT
-    For this demo, we'll use a simplified implementation with some heuristics
-    
+    Version of the entity extractor: NER_EXTRACTOR_VERSION and the lexicon in use
+
+    Rebuilding the lexicon changes the version, so cached entities are re-extracted.
+    """
+    global _extractor_version
+    if _extractor_version is None:
+        if isinstance(_matcher, MappedEntityMatcher):
+            with open(LEXICON_PATH, "rb") as handle:
+                checksum = 0
+                for block in iter(lambda: handle.read(1024 * 1024), b""):
+                    checksum = zlib.crc32(block, checksum)
+            lexicon = f"{checksum:08x}"
+        else:
+            lexicon = "builtin"
+        _extractor_version = f"{NER_EXTRACTOR_VERSION}-{lexicon}"
+    return _extractor_version
+
+
+def find_entity_mentions(text: str) -> List[Dict[str, Any]]:
+    """
+    Find every entity mention in text with its character offsets
+
     Args:
-        text: The text to extract entities from
-        
+        text: The text to scan
+
     Returns:
-        Dictionary of extracted entities
+        List of mentions with category, term, text, start and end
     """
-    logger.debug(f"Extracting entities from text: {text[:100]}...")
-    
-    # Initialize results
-    entities = {
+    return _matcher.find_all(text)
+
+
+def empty_entities() -> Dict[str, Any]:
+    """Entities structure with every category empty"""
+    return {
         "diseases": [],
         "symptoms": [],
         "lab_values": [],
         "genes": [],
-        "medications": []
+        "medications": [],
+        "variants": [],
+        "phenotypes": []
     }
-    
-    # Simple disease keywords
-    disease_keywords = [
-        "diabetes", "hypertension", "cancer", "asthma", "arthritis", 
-        "alzheimer", "parkinson", "hypothyroidism", "hyperthyroidism", 
-        "fibroids", "covid", "tuberculosis", "pneumonia", "anemia"
-    ]
-    
-    # Simple symptom keywords
-    symptom_keywords = [
-        "pain", "fever", "cough", "fatigue", "headache", 
-        "nausea", "vomiting", "dizziness", "rash", "swelling",
-        "shortness of breath", "insomnia", "anxiety", "depression"
-    ]
-    
-    # Simple lab test keywords (with units)
-    lab_value_patterns = [
-        (r"hemoglobin", "g/dL"),
-        (r"glucose", "mg/dL"),
-        (r"cholesterol", "mg/dL"),
-        (r"triglycerides", "mg/dL"),
-        (r"creatinine", "mg/dL"),
-        (r"TSH", "mIU/L"),
-        (r"T3", "ng/dL"),
-        (r"T4", "μg/dL"),
-        (r"WBC", "cells/μL"),
-        (r"RBC", "million/μL")
-    ]
-    
-    # Simple gene mutation patterns
-    gene_patterns = [
-        "BRCA1", "BRCA2", "EGFR", "KRAS", "HER2", "TP53", 
-        "BRAF", "MLH1", "MSH2", "APC", "RET", "PTEN"
-    ]
-    
-    # Medication patterns
-    medication_patterns = [
-        "aspirin", "acetaminophen", "ibuprofen", "lisinopril", 
-        "metformin", "atorvastatin", "levothyroxine", "amlodipine", 
-        "albuterol", "metoprolol", "simvastatin", "omeprazole"
-    ]
-    
-    # Convert text to lowercase for case-insensitive matching
-    text_lower = text.lower()
-    
-    # Extract diseases
-    for disease in disease_keywords:
-        if disease.lower() in text_lower:
-            entities["diseases"].append(disease)
-    
-    # Extract symptoms
-    for symptom in symptom_keywords:
-        if symptom.lower() in text_lower:
-            entities["symptoms"].append(symptom)
-    
-    # Extract lab values (simple implementation)
-    for lab_name, unit in lab_value_patterns:
-        if lab_name.lower() in text_lower:
-            # Add as a placeholder - in a real implementation we would extract the actual value
-            entities["lab_values"].append({
-                "name": lab_name,
-                "value": "Detected",
-                "unit": unit
+
+
+class _EntityCollector:
+    """Merges mentions and lab results into the extracted entities as they are found"""
+
+    def __init__(self):
+        self.entities = empty_entities()
+        self._seen = set()
+        self._measured = set()
+        self._measured_count = 0
+        # Lab placeholders by name, replaced if a value for the lab turns up later
+        self._placeholders = {}
+
+    def add_labs(self, labs: List[Dict[str, Any]]):
+        lab_values = self.entities["lab_values"]
+        for lab in labs:
+            # "<0.5" and "0.5" are different results
+            key = (lab["name"], lab["comparator"], lab["value"])
+            if key in self._measured:
+                continue
+            self._measured.add(key)
+            placeholder = self._placeholders.pop(lab["name"], None)
+            if placeholder is not None:
+                lab_values.remove(placeholder)
+            # Measured results come before placeholders, in order of appearance
+            lab_values.insert(self._measured_count, {
+                "name": lab["name"],
+                "value": lab["value"],
+                "unit": lab["unit"],
+                "comparator": lab["comparator"],
+                "reported_value": lab["reported_value"],
+                "reported_unit": lab["reported_unit"],
+                "flag": lab["flag"],
+                "reference_range": lab["reference_range"]
             })
-    
-    # Extract genes (case-sensitive)
-    for gene in gene_patterns:
-        if gene in text:
-            entities["genes"].append(gene)
-    
-    # Extract medications
-    for med in medication_patterns:
-        if med.lower() in text_lower:
-            entities["medications"].append(med)
-    
+            self._measured_count += 1
+
+    def add_variants(self, variants: List[Dict[str, Any]]):
+        for variant in variants:
+            key = (variant["gene"], variant["hgvs_c"], variant["hgvs_p"], variant["rsid"])
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self.entities["variants"].append({
+                "gene": variant["gene"],
+                "hgvs_c": variant["hgvs_c"],
+                "hgvs_p": variant["hgvs_p"],
+                "rsid": variant["rsid"],
+                "zygosity": variant["zygosity"]
+            })
+
+    def add_phenotypes(self, phenotypes: List[Dict[str, Any]]):
+        for phenotype in phenotypes:
+            key = ("phenotype", phenotype["gene"], phenotype["phenotype"])
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self.entities["phenotypes"].append({"gene": phenotype["gene"], "phenotype": phenotype["phenotype"]})
+
+    def add_mentions(self, mentions: List[Dict[str, Any]]):
+        measured_names = {key[0] for key in self._measured}
+        for mention in mentions:
+            category = mention["category"]
+            term = mention["term"]
+            # Each term is reported once, in order of first appearance
+            if (category, term) in self._seen:
+                continue
+            self._seen.add((category, term))
+
+            if category == "lab_values":
+                # Labs mentioned without a readable value are kept as a placeholder
+                if term not in measured_names:
+                    placeholder = {
+                        "name": term,
+                        "value": "Detected",
+                        "unit": LAB_UNITS.get(term, "")
+                    }
+                    self._placeholders[term] = placeholder
+                    self.entities["lab_values"].append(placeholder)
+            else:
+                self.entities.setdefault(category, []).append(term)
+
+
+def extract_entities_from_text(text: str) -> Dict[str, Any]:
+    """
+    Extract medical entities from text using spaCy
+
+    In a production implementation, this would use a proper medical NER model like BioBERT
+    For this demo, we'll use a simplified implementation with a compiled keyword matcher
+
+    Args:
+        text: The text to extract entities from
+
+    Returns:
+        Dictionary of extracted entities
+    """
+    logger.debug(f"Extracting entities from text: {text[:100]}...")
+
+    collector = _EntityCollector()
+    # Measured lab results, normalized to canonical units and flagged against reference ranges
+    collector.add_labs(extract_lab_values(text))
+    # Variants (gene, HGVS c./p. notation, rsID, zygosity) from genomic sections
+    collector.add_variants(extract_variants(text))
+    # Stated pharmacogenomic phenotypes ("CYP2D6 poor metabolizer")
+    collector.add_phenotypes(extract_phenotypes(text))
+    collector.add_mentions(find_entity_mentions(text))
+
+    logger.debug(f"Extracted entities: {json.dumps(collector.entities)}")
+    return collector.entities
+
+
+def _collect_window(collector: _EntityCollector, window: str, base: int,
+                    floors: Dict[str, int], cuts: Dict[str, int]) -> Dict[str, int]:
+    """
+    Report what starts between the floors and the cuts of a streaming window
+
+    Args:
+        collector: Entities merged so far
+        window: Held back text plus the new chunk
+        base: Document offset of window[0]
+        floors: Document offsets below which mentions, labs and variants were reported
+        cuts: Window offsets at which each kind is held back for the next chunk
+
+    Returns:
+        The cuts, moved back before lab results that may continue in the next chunk
+    """
+    labs = []
+    lab_cut = cuts["labs"]
+    for lab in extract_lab_values(window):
+        if base + lab["start"] < floors["labs"]:
+            continue
+        if lab["end"] > lab_cut:
+            # May continue in the next chunk, so it is read again from there
+            lab_cut = min(lab_cut, lab["start"])
+            continue
+        labs.append(lab)
+    collector.add_labs(labs)
+    collector.add_variants([
+        variant for variant in extract_variants(window)
+        if base + variant["start"] >= floors["variants"] and variant["start"] < cuts["variants"]
+    ])
+    # Phenotypes are read on a line, like variants
+    collector.add_phenotypes([
+        phenotype for phenotype in extract_phenotypes(window)
+        if base + phenotype["start"] >= floors["variants"] and phenotype["start"] < cuts["variants"]
+    ])
+    collector.add_mentions([
+        mention for mention in find_entity_mentions(window)
+        if base + mention["start"] >= floors["mentions"] and mention["start"] < cuts["mentions"]
+    ])
+    return dict(cuts, labs=lab_cut)
+
+
+def _cut_after_space(window: str, cut: int) -> int:
+    """Move a cut back to just after whitespace, by at most NER_LAB_OVERLAP characters"""
+    limit = max(cut - NER_LAB_OVERLAP, 0)
+    for position in range(cut, limit, -1):
+        if window[position - 1].isspace():
+            return position
+    return cut if limit else 0
+
+
+def iter_entities_from_chunks(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Extract medical entities from text arriving in chunks (e.g. PDF pages)
+
+    Only the current chunk and a short overlap from the previous one are held in memory.
+    The overlap keeps the trailing word tokens of the longest lexicon term, the last
+    NER_LAB_OVERLAP characters and the last line (variants are grouped by line, up to
+    NER_VARIANT_OVERLAP characters of it), so terms, lab results and variants split
+    across a chunk boundary are still found, and nothing is reported twice: the merged
+    result is the same as extract_entities_from_text on the joined text. The overlap is
+    bounded, so text without line breaks costs no more than text with them.
+
+    Args:
+        chunks: Consecutive pieces of the document text; separators between pages
+            must be part of the chunks
+
+    Yields:
+        The entities extracted so far, after each chunk (and once more for the held
+        back tail). The same dictionary is updated in place and is final after the
+        last yield.
+    """
+    collector = _EntityCollector()
+    carry = ""
+    base = 0  # Document offset of carry[0]
+    floors = {"mentions": 0, "labs": 0, "variants": 0}
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        window = carry + chunk
+        # Hold back the tail for the lab pattern, starting after whitespace so that its
+        # word-boundary checks see the same context as in the whole text
+        lab_cut = _cut_after_space(window, max(len(window) - NER_LAB_OVERLAP, 0))
+        cuts = _collect_window(collector, window, base, floors, {
+            # The last token may continue in the next chunk, and a term starting before
+            # the trailing tokens of the longest term cannot reach past them
+            "mentions": token_start_from_end(window, _matcher.max_tokens),
+            "labs": lab_cut,
+            "variants": max(window.rfind("\n", 0, lab_cut) + 1,
+                            _cut_after_space(window, max(lab_cut - NER_VARIANT_OVERLAP, 0))),
+        })
+        for kind, cut in cuts.items():
+            floors[kind] = max(floors[kind], base + cut)
+        cut = min(cuts.values())
+        carry = window[cut:]
+        base += cut
+        yield collector.entities
+
+    if carry:
+        _collect_window(collector, carry, base, floors, {kind: len(carry) for kind in floors})
+        yield collector.entities
+
+
+def extract_entities_from_chunks(chunks: Iterable[str]) -> Dict[str, Any]:
+    """
+    Extract medical entities from text arriving in chunks, in bounded memory
+
+    Args:
+        chunks: Consecutive pieces of the document text (see iter_entities_from_chunks)
+
+    Returns:
+        Dictionary of extracted entities
+    """
+    entities = empty_entities()
+    for entities in iter_entities_from_chunks(chunks):
+        pass
     logger.debug(f"Extracted entities: {json.dumps(entities)}")
     return entities
@@ -1,19 +1,12 @@
-import os
 import json
 import logging
 from typing import Dict, Any, List
 
-# the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-# do not change this unless explicitly requested by the user
-from openai import OpenAI
+from utils.llm_providers import get_provider
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI client
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
 def get_therapy_recommendations(
     agent_type: str,
     profile: Dict[str, Any],
@@ -34,8 +27,9 @@ def get_therapy_recommendations(
     """
     logger.debug(f"Getting therapy recommendations for agent type: {agent_type}")
     
-    # Handle empty API key
-    if not OPENAI_API_KEY:
+    # Handle empty API key (the client is created lazily by the provider registry)
+    provider = get_provider("openai")
+    if not provider.is_configured():
         logger.warning("OpenAI API key not provided. Using mock data.")
         return _get_mock_recommendations(agent_type)
     
@@ -59,18 +53,15 @@ def get_therapy_recommendations(
     
     try:
         # Call OpenAI API
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Here is the user data:\n{user_data_json}\n\nPlease provide therapy recommendations."}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.5
+        response_text = provider.complete(
+            system_prompt,
+            f"Here is the user data:\n{user_data_json}\n\nPlease provide therapy recommendations.",
+            temperature=0.5,
+            json_mode=True
         )
         
         # Parse response
-        recommendations = json.loads(response.choices[0].message.content)
+        recommendations = json.loads(response_text)
         
         # Ensure we have the therapies field
         if "therapies" not in recommendations:
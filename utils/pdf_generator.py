@@ -5,8 +5,9 @@ PDF Generator for therapy reports
 import os
 import logging
 import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from fpdf import FPDF
+from utils.variants import format_variant
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -64,7 +65,9 @@ def generate_therapy_report(
     therapies: List[Dict[str, Any]],
     agent_type: str,
     query: str,
-    output_path: str
+    output_path: str,
+    pgx_alerts: Optional[List[Dict[str, Any]]] = None,
+    drug_interactions: Optional[List[Dict[str, Any]]] = None
 ) -> str:
     """
     Generate a PDF report of therapy recommendations
@@ -76,6 +79,8 @@ def generate_therapy_report(
         agent_type: Type of agent used (allopathy, homeopathy, or both)
         query: User's query
         output_path: Directory to save the PDF
+        pgx_alerts: Pharmacogenomic alerts for the current medications
+        drug_interactions: Interactions between the current medications and the therapies
         
     Returns:
         Path to the generated PDF file
@@ -156,6 +161,8 @@ def generate_therapy_report(
                 ('Symptoms', entities.get('symptoms', [])),
                 ('Lab Values', entities.get('lab_values', [])),
                 ('Genes', entities.get('genes', [])),
+                ('Variants', [format_variant(variant) for variant in entities.get('variants', [])]),
+                ('Phenotypes', [f"{item['gene']} {item['phenotype']}" for item in entities.get('phenotypes', [])]),
                 ('Medications', entities.get('medications', []))
             ]
             
@@ -170,7 +177,9 @@ def generate_therapy_report(
                         for item in items:
                             if 'name' in item and 'value' in item:
                                 unit_str = f" {item.get('unit', '')}" if 'unit' in item else ""
-                                pdf.safe_cell(0, 10, f"* {item['name']}: {item['value']}{unit_str}", 0, 1)
+                                flag_str = f" ({item['flag'].upper()})" if item.get('flag') in ('low', 'high') else ""
+                                value_str = f"{item.get('comparator', '')}{item['value']}"
+                                pdf.safe_cell(0, 10, f"* {item['name']}: {value_str}{unit_str}{flag_str}", 0, 1)
                     else:
                         # For simple string lists
                         for item in items:
@@ -181,6 +190,30 @@ def generate_therapy_report(
         
         pdf.ln(5)
         
+        # Pharmacogenomic Alerts Section
+        if pgx_alerts:
+            pdf.set_font('Arial', 'B', 12)
+            pdf.cell(0, 10, 'Pharmacogenomic Alerts', 0, 1, 'L')
+            pdf.ln(2)
+            for alert in pgx_alerts:
+                pdf.set_font('Arial', 'B', 10)
+                pdf.safe_cell(0, 10, f"{alert['drug']} / {alert['gene']} ({alert['severity']})", 0, 1)
+                pdf.set_font('Arial', '', 10)
+                pdf.safe_multi_cell(0, 10, alert['recommendation'])
+            pdf.ln(5)
+        
+        # Drug Interactions Section
+        if drug_interactions:
+            pdf.set_font('Arial', 'B', 12)
+            pdf.cell(0, 10, 'Drug Interactions', 0, 1, 'L')
+            pdf.ln(2)
+            for interaction in drug_interactions:
+                pdf.set_font('Arial', 'B', 10)
+                pdf.safe_cell(0, 10, f"{interaction['drug_a']} / {interaction['drug_b']} ({interaction['severity']})", 0, 1)
+                pdf.set_font('Arial', '', 10)
+                pdf.safe_multi_cell(0, 10, interaction['description'])
+            pdf.ln(5)
+        
         # Therapy Recommendations Section
         pdf.add_page()
         pdf.set_font('Arial', 'B', 14)
@@ -1,71 +1,225 @@
 """
 PDF Processing Utility for extracting text from PDF files
+
+Text is extracted page by page and yielded as it becomes available (iter_pdf_pages).
+Short documents are read serially on the calling thread; long ones (PDF_PARALLEL_MIN_PAGES
+and up) are spooled to a file once and their page ranges are spread across a process
+pool, where each worker parses the file once and extracts the ranges it is given. A
+document whose first pages have no text is given up on without reading the rest.
 """
 
 import os
+import mmap
+import time
+import shutil
 import logging
-from typing import Optional
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Iterator, Optional, Tuple
 import PyPDF2
-from werkzeug.utils import secure_filename
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(pdf_file_stream) -> str:
+PDF_POOL_SIZE = int(os.environ.get("PDF_POOL_SIZE", str(os.cpu_count() or 1)))
+# Documents with fewer pages are extracted serially: below this, starting the work in
+# the pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "24"))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+PDF_POOL_START_METHOD = os.environ.get("PDF_POOL_START_METHOD", "forkserver")
+# A document whose first pages have no text (an image-only scan) is given up on after this many
+PDF_TEXT_SAMPLE_PAGES = int(os.environ.get("PDF_TEXT_SAMPLE_PAGES", "5"))
+# Identifies the text extraction for cached document text (utils/document_cache.py)
+PDF_EXTRACTOR_VERSION = f"pypdf2-{PyPDF2.__version__}"
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+# Reader of the last file a pool worker opened: (path, size, mtime, reader)
+_worker_reader = None
+
+
+def _map_file(path: str) -> mmap.mmap:
+    """Map a file read-only, so the parser reads pages from the page cache instead of a copy"""
+    with open(path, "rb") as handle:
+        return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Get the PDF extraction process pool for the current process
+
+    Created lazily on first use and re-created after a fork, so each gunicorn worker
+    owns its own pool.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            logger.info(f"Starting PDF extraction pool with {PDF_POOL_SIZE} processes")
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_POOL_SIZE,
+                mp_context=multiprocessing.get_context(PDF_POOL_START_METHOD)
+            )
+            _pool_pid = pid
+    return _pool
+
+
+def extract_page_range(path: str, start: int, end: int) -> List[str]:
     """
-    Extract text content from a PDF file stream
-    
+    Extract the text of a range of pages (runs inside a pool process)
+
+    The parsed file is kept between calls, so a worker given several ranges of the same
+    document parses it once.
+
     Args:
-        pdf_file_stream: File-like object containing PDF data
-        
+        path: PDF file
+        start: First page (0-based)
+        end: Page after the last one
+
     Returns:
-        Extracted text content as a string
+        Text of each page in the range
+    """
+    global _worker_reader
+    status = os.stat(path)
+    if _worker_reader is None or _worker_reader[:3] != (path, status.st_size, status.st_mtime_ns):
+        if _worker_reader is not None:
+            _worker_reader[3].stream.close()
+        _worker_reader = (path, status.st_size, status.st_mtime_ns, PyPDF2.PdfReader(_map_file(path)))
+    pages = _worker_reader[3].pages
+    return [pages[number].extract_text() or "" for number in range(start, end)]
+
+
+class NoExtractableTextError(ValueError):
+    """Raised when the first pages of a PDF have no text layer (e.g. a scan without OCR)"""
+
+
+def _submit(path: str, start: int, end: int) -> Future:
+    global _pool
+    try:
+        return get_pdf_pool().submit(extract_page_range, path, start, end)
+    except BrokenProcessPool:
+        # A crashed child (e.g. killed by the OOM killer) breaks the pool for good
+        logger.warning("PDF extraction pool is broken, restarting it")
+        with _pool_lock:
+            _pool = None
+        return get_pdf_pool().submit(extract_page_range, path, start, end)
+
+
+def _iter_parallel(source: Any, page_count: int) -> Iterator[str]:
+    spooled = None
+    # Page ranges in flight, in page order; a few per worker are submitted ahead so
+    # extracted pages do not pile up when the consumer is slower than the pool
+    pending = deque()
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            path = os.fspath(source)
+        else:
+            # Workers open the document by path, so an upload is written out once
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as spooled:
+                source.seek(0)
+                shutil.copyfileobj(source, spooled)
+            path = spooled.name
+
+        window = max(PDF_POOL_SIZE * 2, 1)
+        for start in range(0, page_count, PDF_PAGES_PER_TASK):
+            pending.append(_submit(path, start, min(start + PDF_PAGES_PER_TASK, page_count)))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Stopped early: don't keep the pool busy with pages nobody will read
+        for future in pending:
+            future.cancel()
+        if spooled is not None:
+            os.unlink(spooled.name)
+
+
+def iter_pdf_pages(pdf_file_stream: Any, parallel: Optional[bool] = None, sample_pages: Optional[int] = None,
+                   stats: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield the text of each page of a PDF as it is extracted
+
+    Pages can be fed straight into entity extraction (utils.ner_extraction.
+    iter_entities_from_chunks), so the first results do not wait for the last page and
+    the whole text never has to be held in memory.
+
+    Args:
+        pdf_file_stream: Path (read through a memory map, e.g. a file in the upload
+            store) or file-like object containing PDF data
+        parallel: Force parallel (True) or serial (False) extraction; by default long
+            documents are extracted in parallel when the pool has more than one process
+        sample_pages: Give up when this many leading pages have no text (defaults to
+            PDF_TEXT_SAMPLE_PAGES; 0 reads every page)
+        stats: Optional dict updated with the page count, mode and pages extracted, and
+            once all pages are read, elapsed seconds and pages per second
+
+    Yields:
+        (page number starting at 1, page text)
+
+    Raises:
+        NoExtractableTextError: The sampled pages have no text
     """
+    sample_pages = PDF_TEXT_SAMPLE_PAGES if sample_pages is None else sample_pages
+    stats = stats if stats is not None else {}
+    started = time.perf_counter()
+    is_path = isinstance(pdf_file_stream, (str, os.PathLike))
+    position = None if is_path else pdf_file_stream.tell()
+    mapped = _map_file(pdf_file_stream) if is_path else None
     try:
-        # Create a PDF reader object
-        pdf_reader = PyPDF2.PdfReader(pdf_file_stream)
-        
-        # Get the number of pages
-        num_pages = len(pdf_reader.pages)
-        logger.info(f"Processing PDF with {num_pages} pages")
-        
-        # Extract text from each page
-        text = ""
-        for page_num in range(num_pages):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n\n"
-        
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting text from PDF: {str(e)}")
-        raise ValueError(f"Could not extract text from PDF: {str(e)}")
-
-def save_uploaded_pdf(pdf_file, save_dir: str = "uploads") -> Optional[str]:
+        pdf_reader = PyPDF2.PdfReader(mapped if mapped is not None else pdf_file_stream)
+        page_count = len(pdf_reader.pages)
+        if parallel is None:
+            parallel = PDF_POOL_SIZE > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+        stats.update(pages=page_count, mode="parallel" if parallel else "serial", extracted=0)
+
+        if parallel:
+            texts = _iter_parallel(pdf_file_stream, page_count)
+        else:
+            texts = (page.extract_text() or "" for page in pdf_reader.pages)
+        try:
+            has_text = False
+            for page_no, text in enumerate(texts, start=1):
+                has_text = has_text or bool(text.strip())
+                if not has_text and page_no == min(sample_pages, page_count):
+                    logger.info(f"No text in the first {page_no} of {page_count} PDF pages, giving up")
+                    raise NoExtractableTextError(f"No extractable text in the first {page_no} pages")
+                stats["extracted"] = page_no
+                yield page_no, text
+        finally:
+            texts.close()
+    finally:
+        if mapped is not None:
+            mapped.close()
+        if position is not None:
+            # Leave the upload where it was, so it can still be saved
+            pdf_file_stream.seek(position)
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["pages_per_s"] = round(page_count / elapsed, 1) if elapsed else 0
+    logger.info(f"Extracted {page_count} PDF pages ({stats['mode']}) in {elapsed:.2f}s "
+                f"({stats['pages_per_s']} pages/s)")
+
+
+def extract_pdf_pages(pdf_file_stream: Any, parallel: Optional[bool] = None) -> Tuple[List[str], Dict[str, Any]]:
     """
-    Save uploaded PDF file to disk
-    
+    Extract the text of every page of a PDF
+
     Args:
-        pdf_file: Flask FileStorage object
-        save_dir: Directory to save the file
-        
+        pdf_file_stream: Path or file-like object containing PDF data
+        parallel: Force parallel (True) or serial (False) extraction (see iter_pdf_pages)
+
     Returns:
-        Path to saved file or None if save failed
+        tuple: (pages, stats) where pages has the text of each page and stats has the
+        page count, mode, elapsed seconds and pages per second
     """
-    try:
-        # Create directory if it doesn't exist
-        os.makedirs(save_dir, exist_ok=True)
-        
-        # Generate a secure filename
-        filename = secure_filename(pdf_file.filename)
-        
-        # Create file path
-        file_path = os.path.join(save_dir, filename)
-        
-        # Save the file
-        pdf_file.save(file_path)
-        logger.info(f"Saved PDF file to {file_path}")
-        
-        return file_path
-    except Exception as e:
-        logger.error(f"Error saving PDF file: {str(e)}")
-        return None
\ No newline at end of file
+    stats: Dict[str, Any] = {}
+    pages = [text for _, text in iter_pdf_pages(pdf_file_stream, parallel=parallel, sample_pages=0, stats=stats)]
+    return pages, stats
@@ -0,0 +1,313 @@
+"""
+Pharmacogenomics Module
+
+Checks gene findings against drugs with a local table of pharmacogenomic gene-drug pairs
+(data/pgx_interactions.tsv), instead of leaving it to the LLM. The table is loaded once
+per process into a pair index and a token-level drug name matcher (utils.entity_matcher),
+so a check is a scan of a few short strings and a few dict lookups: it runs on the
+analysis and on every therapy the agents return, and flagged pairs are added to the
+therapy's contraindications.
+
+Only actionable findings raise the table's severity: a variant that is not classified as
+benign, or a stated phenotype such as "CYP2D6 poor metabolizer" (extract_phenotypes). A
+gene that is only named (tested panels list many) gets a "review" alert, which is shown
+but not added to the contraindications.
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Dict, Any, List, Iterable, Optional, Set
+
+from utils.entity_matcher import EntityMatcher
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PGX_TABLE_PATH = os.environ.get(
+    "PGX_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "pgx_interactions.tsv")
+)
+
+SEVERITIES = ("avoid", "adjust")
+
+# Severity of a pair whose gene is named in the report without a genotype or phenotype
+REVIEW_SEVERITY = "review"
+
+# Prefix of contraindications added from the table
+CONTRAINDICATION_PREFIX = "Pharmacogenomic"
+
+# Phenotypes that make a gene finding actionable, as written in reports
+_PHENOTYPE_RE = re.compile(
+    r"\b(?:(poor|intermediate|ultra-?rapid)[ \t-]+metaboli[sz]ers?"
+    r"|(?:decreased|reduced|poor)[ \t-]+(function)"
+    r"|(deficien(?:t|cy))"
+    r"|(positive|carrier))\b",
+    re.IGNORECASE
+)
+_NEGATION_RE = re.compile(r"\b(?:not|no|non|negative|normal)\b", re.IGNORECASE)
+_NEGATED_AFTER_RE = re.compile(r"[ \t:,-]*(?:not detected|not present|negative|absent|ruled out)\b",
+                               re.IGNORECASE)
+# How far from its phenotype a gene may be written on the same line
+_PHENOTYPE_REACH = 80
+
+
+class PgxTable:
+    """Gene-drug pairs indexed by drug, with a matcher for drug names in free text"""
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        """
+        Index the pairs
+
+        Args:
+            rows: Pairs with gene, drug, aliases (other names of the drug or of drugs
+                in the same class), severity and recommendation
+        """
+        self._by_drug: Dict[str, List[Dict[str, Any]]] = {}
+        names = []
+        for row in rows:
+            if row["severity"] not in SEVERITIES:
+                raise ValueError(f"Unknown severity for {row['gene']}/{row['drug']}: {row['severity']}")
+            self._by_drug.setdefault(row["drug"], []).append(row)
+            names.append((row["drug"], row["drug"]))
+            names.extend((alias, row["drug"]) for alias in row["aliases"])
+        self.genes: Set[str] = {row["gene"] for rows in self._by_drug.values() for row in rows}
+        self._gene_re = re.compile(
+            r"\b(?:" + "|".join(re.escape(gene) for gene in sorted(self.genes, key=len, reverse=True))
+            + r")(?![A-Za-z0-9])"
+        ) if self.genes else None
+        self._matcher = EntityMatcher({"drugs": names}, {"drugs": "insensitive"})
+        self.size = sum(len(rows) for rows in self._by_drug.values())
+
+    @classmethod
+    def from_file(cls, path: str) -> "PgxTable":
+        """Load a TSV of gene, drug, other names (|), severity and recommendation ('#' starts a comment)"""
+        rows = []
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                gene, drug, aliases, severity, recommendation = line.rstrip("\n").split("\t")[:5]
+                rows.append({
+                    "gene": gene.strip(),
+                    "drug": drug.strip().lower(),
+                    "aliases": [alias.strip() for alias in aliases.split("|") if alias.strip()],
+                    "severity": severity.strip(),
+                    "recommendation": recommendation.strip(),
+                })
+        return cls(rows)
+
+    def find_drugs(self, text: str) -> Dict[str, str]:
+        """
+        Find table drugs named in free text
+
+        Args:
+            text: Medication list, therapy name, ...
+
+        Returns:
+            Table drug -> name as written, in order of appearance
+        """
+        found = {}
+        for mention in self._matcher.find_all(text or ""):
+            found.setdefault(mention["term"], mention["text"])
+        return found
+
+    def find_phenotypes(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Find stated phenotypes of table genes in free text
+
+        A phenotype belongs to the nearest table gene before it on the same line (or,
+        failing that, right after it: "poor metabolizer (CYP2D6)"); negated statements
+        ("not a poor metabolizer", "G6PD deficiency: not detected") are skipped.
+
+        Args:
+            text: Report text
+
+        Returns:
+            Phenotypes with gene, phenotype (normalized, e.g. "poor metabolizer"), start
+            and end offsets, in order of appearance
+        """
+        found = []
+        if self._gene_re is None or not text:
+            return found
+        for match in _PHENOTYPE_RE.finditer(text):
+            line_start = text.rfind("\n", 0, match.start()) + 1
+            line_end = text.find("\n", match.end())
+            line_end = len(text) if line_end == -1 else line_end
+            genes = list(self._gene_re.finditer(text, max(line_start, match.start() - _PHENOTYPE_REACH),
+                                                match.start()))
+            if genes:
+                gene = genes[-1]
+                between = text[gene.end():match.start()]
+            else:
+                gene = self._gene_re.search(text, match.end(), min(line_end, match.end() + 20))
+                between = text[match.end():gene.start()] if gene else ""
+            if gene is None or _NEGATION_RE.search(between) or _NEGATION_RE.search(
+                    text[max(line_start, match.start() - 12):match.start()]):
+                continue
+            if _NEGATED_AFTER_RE.match(text, match.end()):
+                continue
+            metabolizer, function, deficient, positive = match.groups()
+            if metabolizer:
+                phenotype = f"{metabolizer.lower().replace('-', '')} metabolizer"
+            elif function:
+                phenotype = "decreased function"
+            elif deficient:
+                phenotype = "deficient"
+            elif gene.group().startswith("HLA-") and genes:
+                # "HLA-B*57:01 positive"; elsewhere "positive" is about something else
+                phenotype = "positive"
+            else:
+                continue
+            found.append({"gene": gene.group(), "phenotype": phenotype,
+                          "start": match.start(), "end": match.end()})
+        return found
+
+    def check(self, genes: Iterable[str], drugs: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Pairs between gene findings and drugs
+
+        Args:
+            genes: Gene symbols found for the patient
+            drugs: Table drug -> name as written (see find_drugs)
+
+        Returns:
+            Alerts with gene, drug (as written), severity and recommendation,
+            "avoid" pairs first
+        """
+        genes = set(genes)
+        alerts = []
+        for drug, written in drugs.items():
+            for row in self._by_drug.get(drug, ()):
+                if row["gene"] in genes:
+                    alerts.append({
+                        "gene": row["gene"],
+                        "drug": written,
+                        "severity": row["severity"],
+                        "recommendation": row["recommendation"],
+                    })
+        alerts.sort(key=lambda alert: SEVERITIES.index(alert["severity"]))
+        return alerts
+
+
+_table = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def get_pgx_table() -> Optional[PgxTable]:
+    """Get the table at PGX_TABLE_PATH (loaded once per process), or None if it cannot be read"""
+    global _table, _table_loaded
+    with _table_lock:
+        if not _table_loaded:
+            _table_loaded = True
+            try:
+                _table = PgxTable.from_file(PGX_TABLE_PATH)
+                logger.info(f"Loaded pharmacogenomic table {PGX_TABLE_PATH} ({_table.size} pairs)")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load pharmacogenomic table {PGX_TABLE_PATH}: {str(e)}")
+    return _table
+
+
+def extract_phenotypes(text: str) -> List[Dict[str, Any]]:
+    """
+    Find stated pharmacogenomic phenotypes in report text (see PgxTable.find_phenotypes)
+
+    Returns:
+        Phenotypes with gene, phenotype, start and end (empty without a table)
+    """
+    table = get_pgx_table()
+    if table is None:
+        return []
+    return table.find_phenotypes(text)
+
+
+def patient_genes(entities: Dict[str, Any]) -> Set[str]:
+    """
+    Genes with an actionable finding in the report: genes of variants that are not
+    classified as benign, and genes with a stated phenotype
+    """
+    genes = {phenotype["gene"] for phenotype in entities.get("phenotypes") or [] if phenotype.get("gene")}
+    for variant in entities.get("variants") or []:
+        significance = str(variant.get("clinical_significance") or "").lower()
+        if variant.get("gene") and ("benign" not in significance or "pathogenic" in significance):
+            genes.add(variant["gene"])
+    return genes
+
+
+def _alerts(table: PgxTable, entities: Dict[str, Any], drugs: Dict[str, str]) -> List[Dict[str, Any]]:
+    genes = patient_genes(entities)
+    alerts = table.check(genes, drugs)
+    # A gene that is only named may have been tested with a normal result
+    named = set(entities.get("genes") or []) - genes
+    for alert in table.check(named, drugs):
+        alert["severity"] = REVIEW_SEVERITY
+        alert["recommendation"] = (f"The report names {alert['gene']} without a genotype or phenotype; "
+                                   f"check the result before prescribing. {alert['recommendation']}")
+        alerts.append(alert)
+    return alerts
+
+
+def check_medications(profile: Dict[str, Any], entities: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Check the patient's current medications (profile and report) against their gene findings
+
+    Args:
+        profile: User profile data (current_medications is free text)
+        entities: Extracted entities
+
+    Returns:
+        Alerts with gene, drug, severity and recommendation, "review" alerts for genes
+        that are only named last (empty without a table)
+    """
+    table = get_pgx_table()
+    entities = entities or {}
+    genes = patient_genes(entities) | set(entities.get("genes") or [])
+    if table is None or not genes & table.genes:
+        return []
+    medications = " ; ".join([str((profile or {}).get("current_medications") or "")]
+                             + [str(item) for item in entities.get("medications") or []])
+    return _alerts(table, entities, table.find_drugs(medications))
+
+
+def flag_therapies(therapies: List[Dict[str, Any]], entities: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Add pharmacogenomic contraindications to therapies in place
+
+    Each therapy whose name contains a drug paired with one of the patient's genes gets
+    a pgx_alerts list and one contraindication per pair with an actionable finding;
+    "review" alerts (the gene is only named) are not contraindications.
+
+    Args:
+        therapies: Therapy recommendations
+        entities: Extracted entities
+
+    Returns:
+        The same therapies
+    """
+    table = get_pgx_table()
+    entities = entities or {}
+    genes = patient_genes(entities) | set(entities.get("genes") or [])
+    if table is None or not therapies or not genes & table.genes:
+        return therapies
+
+    for therapy in therapies:
+        if not isinstance(therapy, dict):
+            continue
+        alerts = _alerts(table, entities, table.find_drugs(str(therapy.get("therapy_name", ""))))
+        if not alerts:
+            continue
+        therapy["pgx_alerts"] = alerts
+        contraindications = therapy.get("contraindications") or []
+        if not isinstance(contraindications, list):
+            contraindications = [str(contraindications)]
+        for alert in alerts:
+            if alert["severity"] == REVIEW_SEVERITY:
+                continue
+            note = (f"{CONTRAINDICATION_PREFIX} ({alert['drug']} with {alert['gene']} finding, "
+                    f"{alert['severity']}): {alert['recommendation']}")
+            if note not in contraindications:
+                contraindications.insert(0, note)
+        therapy["contraindications"] = contraindications
+    return therapies
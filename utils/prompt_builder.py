@@ -0,0 +1,195 @@
+"""
+Prompt Builder Module
+
+Builds token-budgeted recommendation prompts. User data is serialized as compact JSON
+with empty fields removed, system prompts are normalized so they form an identical
+(and therefore provider-cacheable) prefix on every call, and the input tokens saved
+against the previous indent=2 serialization are counted per request.
+"""
+
+import os
+import json
+import logging
+import textwrap
+import threading
+from typing import Dict, Any, Tuple, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Estimated input-token budget for one recommendation request (system + user message)
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "6000"))
+
+# Average characters per token for English text and JSON; used for estimates only
+CHARS_PER_TOKEN = 4
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "input_tokens": 0, "tokens_saved": 0, "over_budget": 0, "trimmed": 0}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def prune_empty(value: Any) -> Any:
+    """
+    Recursively drop None, empty strings, empty lists and empty dicts
+
+    Args:
+        value: JSON-serializable value
+
+    Returns:
+        The value without empty fields (zero and False are kept)
+    """
+    if isinstance(value, dict):
+        pruned = {key: prune_empty(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        pruned = [prune_empty(item) for item in value]
+        return [item for item in pruned if item not in (None, "", [], {})]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def compact_json(value: Any) -> str:
+    """Serialize value without indentation or padding whitespace"""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def response_format(*therapy_types: str) -> str:
+    """
+    Output format instructions shared by the recommendation system prompts
+
+    Args:
+        therapy_types: Therapy types the reply may contain; the example has one entry per type
+    """
+    example = {
+        "therapies": [{
+            "therapy_type": therapy_type,
+            "therapy_name": "Name",
+            "description": "Detailed description",
+            "efficacy_score": 85,
+            "compatibility_score": 90,
+            "safety_score": 80,
+            "cost_score": 70,
+            "overall_score": 82,
+            "side_effects": ["effect1"],
+            "contraindications": ["contraindication1"],
+            "supporting_evidence": "Evidence details"
+        } for therapy_type in therapy_types]
+    }
+    return f"Respond with JSON only: an object with a 'therapies' array, formatted like {compact_json(example)}"
+
+
+def normalize_system_prompt(text: str) -> str:
+    """Remove source indentation, trailing spaces and repeated blank lines from a prompt"""
+    lines = [line.rstrip() for line in textwrap.dedent(text).strip().splitlines()]
+    normalized = []
+    for line in lines:
+        if line or (normalized and normalized[-1]):
+            normalized.append(line)
+    return "\n".join(normalized)
+
+
+def _user_message(user_data: Dict[str, Any], serialized: Optional[str] = None) -> str:
+    if serialized is None:
+        serialized = compact_json(user_data)
+    return f"Here is the user data:\n{serialized}\n\nPlease provide therapy recommendations."
+
+
+def _trim_longest_list(value: Any) -> bool:
+    """Halve the longest list inside value in place; return False if nothing can be trimmed"""
+    longest = None
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        children = item.values() if isinstance(item, dict) else item if isinstance(item, list) else ()
+        if isinstance(item, list) and len(item) > 1 and (longest is None or len(item) > len(longest)):
+            longest = item
+        stack.extend(child for child in children if isinstance(child, (dict, list)))
+    if longest is None:
+        return False
+    del longest[(len(longest) + 1) // 2:]
+    return True
+
+
+def _drop_benign_variants(entities: Dict[str, Any]):
+    """Leave out variants annotated (utils.variant_index) as benign; they do not affect therapy"""
+    variants = entities.get("variants")
+    if not variants:
+        return
+    kept = [variant for variant in variants
+            if "benign" not in str(variant.get("clinical_significance", "")).lower()
+            or "pathogenic" in str(variant.get("clinical_significance", "")).lower()]
+    if kept:
+        entities["variants"] = kept
+    else:
+        del entities["variants"]
+
+
+def build_recommendation_prompt(system_prompt: str, profile: Dict[str, Any], entities: Dict[str, Any],
+                                query: str, token_budget: Optional[int] = None) -> Tuple[str, str]:
+    """
+    Build the system prompt and user message for a recommendation request
+
+    Variants already classified as benign by the local variant index are left out.
+    When the estimated size exceeds the budget, the longest entity lists are shortened
+    (keeping their first items) until the prompt fits or nothing more can be trimmed.
+
+    Args:
+        system_prompt: Static system prompt of the agent
+        profile: User profile data
+        entities: Extracted entities from pathology report
+        query: User query
+        token_budget: Input-token budget (defaults to PROMPT_TOKEN_BUDGET)
+
+    Returns:
+        tuple: (system_prompt, user_content)
+    """
+    budget = token_budget or PROMPT_TOKEN_BUDGET
+    raw_data = {"profile": profile, "entities": entities, "query": query}
+    baseline_tokens = (estimate_tokens(system_prompt)
+                       + estimate_tokens(_user_message(raw_data, json.dumps(raw_data, indent=2, default=str))))
+
+    system = normalize_system_prompt(system_prompt)
+    user_data = prune_empty(raw_data)
+    _drop_benign_variants(user_data.get("entities", {}))
+    user_content = _user_message(user_data)
+    input_tokens = estimate_tokens(system) + estimate_tokens(user_content)
+
+    trimmed = False
+    while input_tokens > budget and _trim_longest_list(user_data.get("entities", {})):
+        trimmed = True
+        user_content = _user_message(user_data)
+        input_tokens = estimate_tokens(system) + estimate_tokens(user_content)
+
+    over_budget = input_tokens > budget
+    if over_budget:
+        logger.warning(f"Prompt uses ~{input_tokens} tokens, over the {budget} token budget")
+    elif trimmed:
+        logger.info(f"Trimmed entity lists to fit the {budget} token prompt budget")
+
+    saved = max(baseline_tokens - input_tokens, 0)
+    logger.debug(f"Prompt ~{input_tokens} input tokens ({saved} saved)")
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["input_tokens"] += input_tokens
+        _stats["tokens_saved"] += saved
+        _stats["over_budget"] += int(over_budget)
+        _stats["trimmed"] += int(trimmed)
+        _stats["last_input_tokens"] = input_tokens
+        _stats["last_tokens_saved"] = saved
+
+    return system, user_content
+
+
+def get_prompt_stats() -> Dict[str, Any]:
+    """Get estimated input-token counters for this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    requests_built = stats["requests"]
+    stats["token_budget"] = PROMPT_TOKEN_BUDGET
+    stats["avg_tokens_saved"] = round(stats["tokens_saved"] / requests_built, 1) if requests_built else None
+    return stats
@@ -0,0 +1,251 @@
+"""
+Recommendation Cache Module
+
+Content-addressed cache for LLM therapy recommendations. Requests are keyed on a
+canonical hash of the normalized (agent_type, profile, entities, query) tuple and the
+prompt version, so page reloads, re-exports and re-runs of the same report are served
+without another LLM round-trip.
+
+Two tiers are used: an in-memory LRU per worker process and an optional SQLite file
+shared by all workers (enabled by setting RECOMMENDATION_CACHE_DB).
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Bump when the cached payload format changes
+CACHE_SCHEMA_VERSION = "1"
+
+CACHE_MAX_ENTRIES = int(os.environ.get("RECOMMENDATION_CACHE_SIZE", "512"))
+CACHE_TTL_SECONDS = float(os.environ.get("RECOMMENDATION_CACHE_TTL", "86400"))
+CACHE_DB_PATH = os.environ.get("RECOMMENDATION_CACHE_DB", "")
+CACHE_DB_MAX_ENTRIES = int(os.environ.get("RECOMMENDATION_CACHE_DB_MAX", "20000"))
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Normalize a value for hashing: drop empty fields, trim strings and sort lists so
+    that semantically identical inputs produce the same key
+    """
+    if isinstance(value, dict):
+        normalized = {}
+        for key, item in value.items():
+            item = _normalize(item)
+            if item in (None, "", [], {}):
+                continue
+            normalized[str(key)] = item
+        return normalized
+    if isinstance(value, (list, tuple)):
+        items = [_normalize(item) for item in value]
+        items = [item for item in items if item not in (None, "", [], {})]
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def prompt_fingerprint(prompt: str) -> str:
+    """Short hash of a system prompt, used as its version in cache keys"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(agent_type: str, profile: Dict[str, Any], entities: Dict[str, Any],
+                   query: str, prompt_version: str) -> str:
+    """
+    Build the content-addressed key for a recommendation request
+
+    Args:
+        agent_type: The type of agent
+        profile: User profile data
+        entities: Extracted entities from pathology report
+        query: User query
+        prompt_version: Version (or fingerprint) of the prompt used for the request
+
+    Returns:
+        Hex SHA-256 digest of the canonical request
+    """
+    canonical = json.dumps({
+        "schema": CACHE_SCHEMA_VERSION,
+        "agent_type": agent_type,
+        "profile": _normalize(profile or {}),
+        "entities": _normalize(entities or {}),
+        "query": _normalize((query or "").lower()),
+        "prompt_version": prompt_version,
+    }, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """Two-tier (memory LRU + optional SQLite) cache with TTL and size-based eviction"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS,
+                 db_path: str = CACHE_DB_PATH, max_db_entries: int = CACHE_DB_MAX_ENTRIES):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries in the in-memory tier
+            ttl: Time to live for an entry in seconds
+            db_path: Path of the SQLite tier (empty to disable it)
+            max_db_entries: Maximum number of entries kept in the SQLite tier
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        if self.db_path:
+            self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps the tier safe across threads and workers
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS recommendations ("
+                    "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                    "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_recommendations_accessed "
+                    "ON recommendations (accessed_at)"
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Disabling on-disk recommendation cache: {str(e)}")
+            self.db_path = ""
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Look up cached recommendations
+
+        Returns:
+            A fresh copy of the cached therapies, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return json.loads(payload)
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT payload, expires_at FROM recommendations WHERE key = ? AND expires_at > ?",
+                        (key, now)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("UPDATE recommendations SET accessed_at = ? WHERE key = ?", (now, key))
+                if row is not None:
+                    payload, expires_at = row
+                    with self._lock:
+                        self._store_memory(key, payload, expires_at)
+                        self._stats["disk_hits"] += 1
+                    return json.loads(payload)
+            except sqlite3.Error as e:
+                logger.warning(f"Recommendation cache lookup failed: {str(e)}")
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, therapies: List[Dict[str, Any]]):
+        """Store recommendations under a key"""
+        now = time.time()
+        expires_at = now + self.ttl
+        payload = json.dumps(therapies, separators=(",", ":"))
+
+        with self._lock:
+            self._store_memory(key, payload, expires_at)
+            self._stats["stores"] += 1
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO recommendations (key, payload, expires_at, accessed_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, payload, expires_at, now)
+                    )
+                    conn.execute("DELETE FROM recommendations WHERE expires_at <= ?", (now,))
+                    conn.execute(
+                        "DELETE FROM recommendations WHERE key IN ("
+                        "SELECT key FROM recommendations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_db_entries,)
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Recommendation cache store failed: {str(e)}")
+
+    def _store_memory(self, key: str, payload: str, expires_at: float):
+        # Caller holds self._lock
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        """Remove all entries from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM recommendations")
+            except sqlite3.Error as e:
+                logger.warning(f"Recommendation cache clear failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit-rate statistics for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        stats["disk_enabled"] = bool(self.db_path)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_recommendation_cache() -> RecommendationCache:
+    """Get the process-wide recommendation cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RecommendationCache()
+    return _cache
@@ -0,0 +1,190 @@
+"""
+Resilience Utilities
+
+Timeouts, bounded retries with jittered exponential backoff, and a per-provider circuit
+breaker for outbound LLM calls. A provider whose breaker is open is skipped immediately,
+so requests fail over to the next provider (or the rule-based path) instead of tying up
+a worker on an unhealthy upstream.
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional
+
+import requests
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Connect and read timeouts (seconds) for every provider HTTP call
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.environ.get("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.environ.get("LLM_RETRY_MAX_DELAY", "8"))
+
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RECOVERY_TIMEOUT = float(os.environ.get("LLM_BREAKER_RECOVERY", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the provider's circuit is open"""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP status of a provider error (requests or google-api-core), if any"""
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error is transient (rate limit, server error, timeout, dropped connection)"""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    status = _status_code(error)
+    return status in RETRYABLE_STATUS_CODES
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES, base_delay: float = LLM_RETRY_BASE_DELAY,
+                 max_delay: float = LLM_RETRY_MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        """Whether the given failed attempt (0-based) should be retried"""
+        return attempt < self.max_retries and is_retryable(error)
+
+    def delay(self, error: Exception, attempt: int) -> float:
+        """Backoff before the next attempt, honouring a Retry-After header when present"""
+        response = getattr(error, "response", None)
+        retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable[[], Any], label: str = "") -> Any:
+        """
+        Call fn, retrying transient failures
+
+        Args:
+            fn: Function performing one attempt
+            label: Name used in log messages
+
+        Returns:
+            The result of the first successful attempt
+        """
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                delay = self.delay(e, attempt)
+                logger.warning(f"{label} call failed ({str(e)}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker (closed -> open -> half-open -> closed)
+
+    A half-open breaker admits a single probe call; other callers keep failing fast
+    until the probe succeeds (closed) or fails (open again). A probe that never reports
+    back (an abandoned stream) is replaced after recovery_timeout.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = BREAKER_RECOVERY_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._rejected = 0
+        self._trips = 0
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker becomes half-open once the recovery timeout passes"""
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        # Caller holds self._lock
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = "half_open"
+        return self._state
+
+    def _probe_in_flight(self) -> bool:
+        # Caller holds self._lock
+        return (self._probe_started is not None
+                and time.monotonic() - self._probe_started < self.recovery_timeout)
+
+    def allows_calls(self) -> bool:
+        """Whether a call may be attempted now"""
+        with self._lock:
+            state = self._current_state()
+            return state == "closed" or (state == "half_open" and not self._probe_in_flight())
+
+    def before_call(self):
+        """
+        Reject the call with CircuitOpenError while the breaker is open, or while it is
+        half-open and another call is already probing the provider
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == "open" or (state == "half_open" and self._probe_in_flight()):
+                self._rejected += 1
+                raise CircuitOpenError(f"Circuit for {self.name} is open")
+            if state == "half_open":
+                self._probe_started = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                logger.info(f"Circuit for {self.name} closed")
+            self._state = "closed"
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            state = self._current_state()
+            if state == "half_open" or (state == "closed" and self._failures >= self.failure_threshold):
+                logger.warning(f"Circuit for {self.name} opened after {self._failures} consecutive failures")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._trips += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get breaker state and counters"""
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "trips": self._trips,
+                "rejected_calls": self._rejected,
+            }
@@ -0,0 +1,241 @@
+"""
+Single-Flight Module
+
+Coalesces identical in-flight LLM requests. When several threads ask for the same key
+at the same moment, only the first (the leader) calls the provider; the others wait and
+share its result. Streamed calls (do_stream) take part too: the leader passes its items
+on as they arrive, and followers get the complete list once it is done.
+
+Setting SINGLE_FLIGHT_LOCK_DIR extends this across gunicorn workers: the leader holds
+an exclusive file lock per key, and workers that were blocked on it re-check the shared
+recommendation cache before calling the provider themselves. A lock file only exists
+while its request is in flight.
+"""
+
+import os
+import copy
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; cross-worker mode is disabled there
+    fcntl = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_LOCK_DIR = os.environ.get("SINGLE_FLIGHT_LOCK_DIR", "")
+
+
+class _Call:
+    """A request that is currently in flight"""
+
+    __slots__ = ("event", "result", "error", "abandoned")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        # A streaming leader whose consumer stopped reading before the end
+        self.abandoned = False
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key"""
+
+    def __init__(self, lock_dir: str = SINGLE_FLIGHT_LOCK_DIR):
+        """
+        Initialize the single-flight group
+
+        Args:
+            lock_dir: Directory for cross-worker lock files (empty for threads only)
+        """
+        if lock_dir and fcntl is None:
+            logger.warning("File locking is not available; single-flight is limited to threads")
+            lock_dir = ""
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "leaders": 0, "coalesced": 0, "coalesced_across_workers": 0}
+
+    def do(self, key: str, fn: Callable[[], Any],
+           recheck: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Run fn once per key among concurrent callers
+
+        Args:
+            key: Identity of the request (e.g. the recommendation cache key)
+            fn: Function that performs the upstream call
+            recheck: Optional lookup run after waiting on another worker's lock; a
+                non-None result is returned instead of calling fn
+
+        Returns:
+            The result of fn (followers receive their own copy)
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+        call, leader = self._join(key)
+        if not leader:
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            result = self._lead(key, fn, recheck)
+            # Followers copy from a private snapshot so the leader's caller may mutate its result
+            call.result = copy.deepcopy(result)
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def do_stream(self, key: str, fn: Callable[[], Iterable[Any]],
+                  recheck: Optional[Callable[[], Any]] = None) -> Iterator[Any]:
+        """
+        Run a streaming call once per key among concurrent callers
+
+        Shares its keys with do(): a follower of either kind waits for the leader's
+        complete list of items. If the leader's consumer stops reading early, a waiting
+        follower takes over as leader.
+
+        Args:
+            key: Identity of the request (e.g. the recommendation cache key)
+            fn: Function that performs the upstream call and returns an iterable of items
+            recheck: Optional lookup run after waiting on another worker's lock; a
+                non-None list is yielded instead of calling fn
+
+        Yields:
+            The leader's items as they arrive (followers receive their own copies)
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+        call, leader = self._join(key)
+        if not leader:
+            if call.error is not None:
+                raise call.error
+            yield from copy.deepcopy(call.result)
+            return
+
+        items = []
+        try:
+            for item in self._lead_stream(key, fn, recheck):
+                # Snapshot before the consumer can mutate the item
+                items.append(copy.deepcopy(item))
+                yield item
+            call.result = items
+        except GeneratorExit:
+            call.abandoned = True
+            raise
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        # Become the leader for key, or wait for the current leader to finish
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._stats["leaders"] += 1
+                    return call, True
+                self._stats["coalesced"] += 1
+            call.event.wait()
+            if not call.abandoned:
+                return call, False
+
+    def _finish(self, key: str, call: _Call):
+        with self._lock:
+            del self._calls[key]
+        call.event.set()
+
+    def _lead(self, key: str, fn: Callable[[], Any], recheck: Optional[Callable[[], Any]]) -> Any:
+        if not self.lock_dir:
+            return fn()
+
+        lock_path = self._lock_path(key)
+        lock_file = self._acquire(lock_path)
+        try:
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    with self._lock:
+                        self._stats["coalesced_across_workers"] += 1
+                    return result
+            return fn()
+        finally:
+            # Removed while still held, so a worker that opens the path afterwards
+            # gets a fresh file rather than one nobody will unlock
+            os.unlink(lock_path)
+            lock_file.close()
+
+    def _lead_stream(self, key: str, fn: Callable[[], Iterable[Any]],
+                     recheck: Optional[Callable[[], Any]]) -> Iterator[Any]:
+        if not self.lock_dir:
+            yield from fn()
+            return
+
+        lock_path = self._lock_path(key)
+        lock_file = self._acquire(lock_path)
+        try:
+            if recheck is not None:
+                result = recheck()
+                if result is not None:
+                    with self._lock:
+                        self._stats["coalesced_across_workers"] += 1
+                    yield from result
+                    return
+            yield from fn()
+        finally:
+            os.unlink(lock_path)
+            lock_file.close()
+
+    def _lock_path(self, key: str) -> str:
+        lock_name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.lock_dir, f"{lock_name}.lock")
+
+    @staticmethod
+    def _acquire(lock_path: str):
+        # Blocks while another worker is leading the same request
+        while True:
+            lock_file = open(lock_path, "a")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # The previous leader may have removed the file while this worker waited on it
+            try:
+                if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                    return lock_file
+            except FileNotFoundError:
+                pass
+            lock_file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["cross_worker"] = bool(self.lock_dir)
+        return stats
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """Get the process-wide single-flight group"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
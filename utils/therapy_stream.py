@@ -0,0 +1,120 @@
+"""
+Therapy Stream Parser
+
+Incrementally extracts completed therapy objects from a JSON reply while the LLM is
+still generating it, so each therapy can be pushed to the browser as soon as its
+closing brace arrives instead of after the whole response has been parsed.
+"""
+
+import re
+import json
+import logging
+from typing import Dict, Any, List
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_ARRAY_START = re.compile(r'"therapies"\s*:\s*\[')
+_STRUCTURAL = re.compile(r'[{}\[\]"\\]')
+
+
+class TherapyStreamParser:
+    """Single-pass parser for the 'therapies' array of a streamed reply"""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._skip = -1
+        self._object_start = -1
+        self.count = 0
+
+    @property
+    def finished(self) -> bool:
+        """True once the closing bracket of the therapies array has been seen"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Consume the next chunk of model output
+
+        Args:
+            chunk: Text fragment as delivered by the provider stream
+
+        Returns:
+            Therapy objects completed by this chunk (possibly empty)
+        """
+        if self._finished or not chunk:
+            return []
+
+        self._text += chunk
+        if not self._in_array and not self._find_array_start():
+            return []
+
+        completed = []
+        text = self._text
+        skip = self._skip
+        i = len(text)
+        # Only structural characters matter, so jump between them instead of
+        # visiting every character of the reply
+        for match in _STRUCTURAL.finditer(text, self._pos):
+            position = match.start()
+            if position == skip:
+                continue
+            char = match.group()
+            if self._in_string:
+                if char == "\\":
+                    skip = position + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = position
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    therapy = self._decode(text[self._object_start:position + 1])
+                    if therapy is not None:
+                        completed.append(therapy)
+                    self._object_start = -1
+            elif char == "]" and self._depth == 0:
+                self._finished = True
+                i = position
+                break
+
+        # Drop everything that has been fully consumed so the buffer stays small
+        keep_from = self._object_start if self._object_start >= 0 else i
+        self._text = text[keep_from:]
+        self._pos = i - keep_from
+        self._skip = skip - keep_from
+        if self._object_start >= 0:
+            self._object_start = 0
+        return completed
+
+    def _find_array_start(self) -> bool:
+        match = _ARRAY_START.search(self._text)
+        if match is None:
+            # Keep only a tail long enough to hold a split '"therapies": [' marker
+            self._text = self._text[-64:]
+            return False
+        self._in_array = True
+        self._text = self._text[match.end():]
+        self._pos = 0
+        return True
+
+    def _decode(self, fragment: str):
+        try:
+            therapy = json.loads(fragment)
+        except json.JSONDecodeError:
+            logger.warning("Skipping malformed therapy object in streamed response")
+            return None
+        if not isinstance(therapy, dict):
+            return None
+        self.count += 1
+        return therapy
@@ -0,0 +1,80 @@
+"""
+Upload Store Module
+
+Content-addressed storage for uploaded reports. An upload is copied to disk in a single
+pass that also computes its SHA-256, then renamed to <store>/<first two hex digits>/<hash>
+<extension>. A re-upload of the same report finds its file already there and is not
+stored again, and user-supplied file names never collide. The hash identifies the
+document for downstream caches.
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+from typing import Dict, Any, BinaryIO, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+UPLOAD_STORE_DIR = os.environ.get("UPLOAD_STORE_DIR", os.path.join(os.getcwd(), "uploads", "store"))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def document_path(sha256: str, extension: str = "", store_dir: Optional[str] = None) -> str:
+    """Path of a stored document by its content hash"""
+    return os.path.join(store_dir or UPLOAD_STORE_DIR, sha256[:2], sha256 + extension)
+
+
+def store_upload(stream: BinaryIO, extension: str = "", store_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Spool an upload into the store, hashing it on the way
+
+    Args:
+        stream: Binary stream of the upload, read once from its current position
+        extension: File extension to store the document with (e.g. ".pdf")
+        store_dir: Store directory (defaults to UPLOAD_STORE_DIR)
+
+    Returns:
+        Dictionary with sha256 (hex), path, size in bytes and duplicate (whether the
+        same content was already stored)
+
+    Raises:
+        ValueError: The upload is larger than UPLOAD_MAX_BYTES
+    """
+    store_dir = store_dir or UPLOAD_STORE_DIR
+    os.makedirs(store_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    # Spooled next to its final place, so the rename below stays on one filesystem
+    spooled = tempfile.NamedTemporaryFile(dir=store_dir, prefix=".upload-", delete=False)
+    try:
+        with spooled:
+            while True:
+                chunk = stream.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise ValueError(f"Upload is larger than {UPLOAD_MAX_BYTES / (1024 * 1024):g} MB")
+                digest.update(chunk)
+                spooled.write(chunk)
+
+        sha256 = digest.hexdigest()
+        path = document_path(sha256, extension, store_dir)
+        duplicate = os.path.exists(path)
+        if duplicate:
+            os.unlink(spooled.name)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Atomic: a concurrent upload of the same content replaces it with identical bytes
+            os.replace(spooled.name, path)
+    except BaseException:
+        if os.path.exists(spooled.name):
+            os.unlink(spooled.name)
+        raise
+
+    logger.info(f"Stored upload {sha256[:12]} ({size} bytes{', already stored' if duplicate else ''})")
+    return {"sha256": sha256, "path": path, "size": size, "duplicate": duplicate}
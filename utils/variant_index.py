@@ -0,0 +1,517 @@
+"""
+Variant Index Module
+
+Annotates variants with clinical significance from a local ClinVar dump, without an LLM
+call. The tab-separated dump (ClinVar's variant_summary.txt, or any TSV with the same
+column names) is compiled once into a binary index of sorted arrays:
+    - (chromosome, position) keys, with ref/alt alleles per record
+    - dbSNP rs numbers
+    - hashes of gene-qualified HGVS coding notation ("BRCA1:c.68_69del")
+Each lookup is a binary search over the memory-mapped arrays, so the index costs no
+load time and is shared by every worker through the page cache.
+
+Build the index after downloading the dump:
+    python -m utils.variant_index build variant_summary.txt -o data/variant_index.bin
+    python -m utils.variant_index info data/variant_index.bin
+"""
+
+import os
+import re
+import csv
+import sys
+import mmap
+import struct
+import bisect
+import hashlib
+import logging
+import argparse
+import threading
+from array import array
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.variants import normalize_cdna
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GIVARv1\0"
+
+VARIANT_INDEX_PATH = os.environ.get(
+    "VARIANT_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "variant_index.bin")
+)
+# Only records on this assembly are indexed (ClinVar lists GRCh37 and GRCh38 rows)
+VARIANT_INDEX_ASSEMBLY = os.environ.get("VARIANT_INDEX_ASSEMBLY", "GRCh38")
+
+# Dump columns, by ClinVar variant_summary.txt name and plain alternatives
+COLUMNS = {
+    "chrom": ("Chromosome", "chrom"),
+    "pos": ("PositionVCF", "pos"),
+    "ref": ("ReferenceAlleleVCF", "ref"),
+    "alt": ("AlternateAlleleVCF", "alt"),
+    "rsid": ("RS# (dbSNP)", "rsid"),
+    "gene": ("GeneSymbol", "gene"),
+    "name": ("Name", "hgvs"),
+    "significance": ("ClinicalSignificance", "significance"),
+    "condition": ("PhenotypeList", "condition"),
+    "review_status": ("ReviewStatus", "review_status"),
+    "assembly": ("Assembly", "assembly"),
+}
+
+CHROMOSOMES = [str(number) for number in range(1, 23)] + ["X", "Y", "MT"]
+_CHROM_CODES = {name: code for code, name in enumerate(CHROMOSOMES, start=1)}
+_CHROM_CODES["M"] = _CHROM_CODES["MT"]
+
+# Header: magic, then counts and the byte offset of each section
+_COUNTS = ("records", "rsids", "hgvs", "annotations", "strings")
+_SECTIONS = ("keys", "alleles", "record_annotations", "rs_numbers", "rs_records", "hgvs_hashes",
+             "hgvs_records", "annotations", "string_offsets", "string_blob")
+_HEADER = struct.Struct(f"<8s{len(_COUNTS)}Q{len(_SECTIONS)}Q")
+
+# Per annotation: string ids of gene, significance, condition, review status and HGVS name
+_ANNOTATION_FIELDS = ("gene", "clinical_significance", "condition", "review_status", "hgvs")
+
+_HGVS_NAME = re.compile(r"\((?P<gene>[A-Za-z0-9-]+)\):(?P<cdna>c\.[^ ]+)")
+
+
+def _chrom_code(chrom: str) -> int:
+    chrom = chrom[3:] if chrom[:3].lower() == "chr" else chrom
+    return _CHROM_CODES.get(chrom.upper(), 0)
+
+
+def _position_key(chrom: str, pos: int) -> int:
+    return (_chrom_code(chrom) << 32) | pos
+
+
+def _rs_number(rsid: Any) -> int:
+    text = str(rsid or "").lower()
+    text = text[2:] if text.startswith("rs") else text
+    return int(text) if text.isdigit() else -1
+
+
+def hgvs_key(gene: Optional[str], hgvs_c: Optional[str]) -> Optional[str]:
+    """
+    Lookup key for gene-qualified coding notation: ("BRCA1", "c.68_69delAG") -> "BRCA1:c.68_69del"
+
+    Deleted and duplicated bases are dropped, as ClinVar names omit them.
+    """
+    if not gene or not hgvs_c:
+        return None
+    cdna = re.sub(r"(del|dup)[ACGT]+$", r"\1", normalize_cdna(hgvs_c))
+    return f"{gene.upper()}:{cdna}"
+
+
+def _hash64(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class _Strings:
+    """Deduplicated string table"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def add(self, value: str) -> int:
+        if value not in self.ids:
+            self.ids[value] = len(self.values)
+            self.values.append(value)
+        return self.ids[value]
+
+
+def _column(header: List[str], name: str) -> Optional[int]:
+    for candidate in COLUMNS[name]:
+        if candidate in header:
+            return header.index(candidate)
+    return None
+
+
+def build_variant_index(dump_path: str, output_path: str, assembly: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compile a ClinVar-style TSV dump into a variant index
+
+    Args:
+        dump_path: Tab-separated dump with a header row
+        output_path: Index file to write (replaced atomically)
+        assembly: Assembly to keep when the dump has an Assembly column
+            (defaults to VARIANT_INDEX_ASSEMBLY)
+
+    Returns:
+        Build summary with counts, size and path
+
+    Raises:
+        ValueError: The dump lacks the position, allele or significance columns
+    """
+    assembly = assembly or VARIANT_INDEX_ASSEMBLY
+    strings = _Strings()
+    annotations: Dict[Tuple[int, ...], int] = {}
+    records = {}
+    # rs number -> first record id and its significance string id, packed in one int
+    rs_records = {}
+    # rs numbers whose alleles differ in significance; the rsID alone cannot tell them apart
+    rs_ambiguous = set()
+    hgvs_records = {}
+    skipped = 0
+
+    with open(dump_path, encoding="utf-8", newline="") as handle:
+        reader = csv.reader(handle, delimiter="\t", quoting=csv.QUOTE_NONE)
+        header = [name.lstrip("#") for name in next(reader)]
+        columns = {name: _column(header, name) for name in COLUMNS}
+        missing = [name for name in ("chrom", "pos", "ref", "alt", "significance") if columns[name] is None]
+        if missing:
+            raise ValueError(f"{dump_path} has no column for: {', '.join(missing)}")
+
+        def field(row: List[str], name: str) -> str:
+            index = columns[name]
+            value = row[index].strip() if index is not None and index < len(row) else ""
+            return "" if value in ("-", "na", "-1") else value
+
+        for row in reader:
+            if columns["assembly"] is not None and field(row, "assembly") not in ("", assembly):
+                continue
+            name = field(row, "name")
+            gene = field(row, "gene").split(";")[0]
+            annotation = tuple(strings.add(value) for value in (
+                gene,
+                field(row, "significance"),
+                field(row, "condition").split("|")[0],
+                field(row, "review_status"),
+                name,
+            ))
+            annotation_id = annotations.setdefault(annotation, len(annotations))
+
+            # Rows without a VCF position can still be found by rsID or HGVS name
+            pos = field(row, "pos")
+            key = _position_key(field(row, "chrom"), int(pos)) if pos.isdigit() else 0
+            if key and not key >> 32:
+                skipped += 1
+                key = 0
+            record = (key, strings.add(field(row, "ref")), strings.add(field(row, "alt")))
+            if not key:
+                # Unplaced rows are never found by position, so they are kept apart
+                record += (len(records),)
+            record_id = records.setdefault(record, (len(records), annotation_id))[0]
+
+            rs_number = _rs_number(field(row, "rsid"))
+            if 0 <= rs_number <= 0xFFFFFFFF:
+                first = rs_records.setdefault(rs_number, record_id << 32 | annotation[1])
+                if first >> 32 != record_id and first & 0xFFFFFFFF != annotation[1]:
+                    rs_ambiguous.add(rs_number)
+            match = _HGVS_NAME.search(name)
+            if match:
+                hgvs_records.setdefault(_hash64(hgvs_key(match.group("gene"), match.group("cdna"))), record_id)
+
+    # Records sorted by position key; record ids are renumbered into that order
+    order = sorted(records.items(), key=lambda item: item[0])
+    renumber = [0] * len(order)
+    for position, (_, (record_id, _)) in enumerate(order):
+        renumber[record_id] = position
+    rs_sorted = sorted((number, packed >> 32) for number, packed in rs_records.items() if number not in rs_ambiguous)
+    hgvs_sorted = sorted(hgvs_records.items())
+    string_values = [value.encode("utf-8") for value in strings.values]
+    string_offsets = [0]
+    for value in string_values:
+        string_offsets.append(string_offsets[-1] + len(value))
+
+    sections = {
+        "keys": array("Q", (record[0] for record, _ in order)).tobytes(),
+        "alleles": array("I", (allele for record, _ in order for allele in record[1:3])).tobytes(),
+        "record_annotations": array("I", (annotation_id for _, (_, annotation_id) in order)).tobytes(),
+        "rs_numbers": array("I", (number for number, _ in rs_sorted)).tobytes(),
+        "rs_records": array("I", (renumber[record_id] for _, record_id in rs_sorted)).tobytes(),
+        "hgvs_hashes": array("Q", (digest for digest, _ in hgvs_sorted)).tobytes(),
+        "hgvs_records": array("I", (renumber[record_id] for _, record_id in hgvs_sorted)).tobytes(),
+        "annotations": array("I", (string_id for annotation in annotations for string_id in annotation)).tobytes(),
+        "string_offsets": array("I", string_offsets).tobytes(),
+        "string_blob": b"".join(string_values),
+    }
+    counts = {
+        "records": len(order),
+        "rsids": len(rs_sorted),
+        "hgvs": len(hgvs_sorted),
+        "annotations": len(annotations),
+        "strings": len(strings.values),
+    }
+
+    # Sections are 8-byte aligned so they can be cast to typed memoryviews in place
+    offsets = {}
+    position = _HEADER.size
+    for name in _SECTIONS:
+        position += -position % 8
+        offsets[name] = position
+        position += len(sections[name])
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(_HEADER.pack(MAGIC, *(counts[name] for name in _COUNTS),
+                                  *(offsets[name] for name in _SECTIONS)))
+        for name in _SECTIONS:
+            handle.write(b"\0" * (offsets[name] - handle.tell()))
+            handle.write(sections[name])
+    os.replace(tmp_path, output_path)
+
+    summary = dict(counts, unplaced=skipped, ambiguous_rsids=len(rs_ambiguous), bytes=position, path=output_path)
+    logger.info(f"Built variant index {output_path}: {len(order)} records, {len(rs_sorted)} rsIDs, {position} bytes")
+    return summary
+
+
+class VariantIndex:
+    """Clinical significance lookups over a memory-mapped variant index"""
+
+    def __init__(self, path: str):
+        """
+        Map a variant index
+
+        Args:
+            path: Index written by build_variant_index()
+
+        Raises:
+            ValueError: The file is not a variant index of this version
+        """
+        if sys.byteorder != "little" or array("I").itemsize != 4 or array("Q").itemsize != 8:
+            raise ValueError("Variant indexes require a little-endian platform with 32/64-bit unsigned ints")
+        self.path = path
+        with open(path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            raise ValueError(f"{path} is not a variant index")
+        header = _HEADER.unpack_from(self._mmap, 0)
+        if header[0] != MAGIC:
+            raise ValueError(f"{path} is not a variant index (bad magic)")
+        counts = dict(zip(_COUNTS, header[1:1 + len(_COUNTS)]))
+        offsets = dict(zip(_SECTIONS, header[1 + len(_COUNTS):]))
+        self.counts = counts
+
+        view = memoryview(self._mmap)
+        layout = {
+            "keys": ("Q", counts["records"]),
+            "alleles": ("I", counts["records"] * 2),
+            "record_annotations": ("I", counts["records"]),
+            "rs_numbers": ("I", counts["rsids"]),
+            "rs_records": ("I", counts["rsids"]),
+            "hgvs_hashes": ("Q", counts["hgvs"]),
+            "hgvs_records": ("I", counts["hgvs"]),
+            "annotations": ("I", counts["annotations"] * len(_ANNOTATION_FIELDS)),
+            "string_offsets": ("I", counts["strings"] + 1),
+        }
+        arrays = {name: view[offsets[name]:offsets[name] + struct.calcsize(code) * length].cast(code)
+                  for name, (code, length) in layout.items()}
+        self._keys = arrays["keys"]
+        self._alleles = arrays["alleles"]
+        self._record_annotations = arrays["record_annotations"]
+        self._rs_numbers = arrays["rs_numbers"]
+        self._rs_records = arrays["rs_records"]
+        self._hgvs_hashes = arrays["hgvs_hashes"]
+        self._hgvs_records = arrays["hgvs_records"]
+        self._annotations = arrays["annotations"]
+        self._string_offsets = arrays["string_offsets"]
+        self._string_blob = offsets["string_blob"]
+        self.size = counts["records"]
+
+    def _string(self, string_id: int) -> str:
+        start = self._string_blob + self._string_offsets[string_id]
+        end = self._string_blob + self._string_offsets[string_id + 1]
+        return self._mmap[start:end].decode("utf-8")
+
+    def _annotation(self, record: int, strings: Optional[Dict[int, str]] = None) -> Dict[str, Any]:
+        base = self._record_annotations[record] * len(_ANNOTATION_FIELDS)
+        values = self._annotations[base:base + len(_ANNOTATION_FIELDS)]
+        if strings is None:
+            return {name: self._string(string_id) or None for name, string_id in zip(_ANNOTATION_FIELDS, values)}
+        annotation = {}
+        for name, string_id in zip(_ANNOTATION_FIELDS, values):
+            value = strings.get(string_id)
+            if value is None:
+                value = strings[string_id] = self._string(string_id)
+            annotation[name] = value or None
+        return annotation
+
+    def _find_position(self, key: int, ref: bytes, alt: bytes, lo: int = 0) -> Tuple[Optional[int], int]:
+        index = bisect.bisect_left(self._keys, key, lo)
+        found = index
+        offsets = self._string_offsets
+        blob = self._string_blob
+        while found < self.size and self._keys[found] == key:
+            ref_id, alt_id = self._alleles[2 * found], self._alleles[2 * found + 1]
+            # Alleles are compared as bytes, without decoding
+            if (self._mmap[blob + offsets[ref_id]:blob + offsets[ref_id + 1]] == ref
+                    and self._mmap[blob + offsets[alt_id]:blob + offsets[alt_id + 1]] == alt):
+                return found, index
+            found += 1
+        return None, index
+
+    def lookup(self, chrom: str, pos: int, ref: str, alt: str) -> Optional[Dict[str, Any]]:
+        """
+        Annotation of a variant by position and alleles
+
+        Args:
+            chrom: Chromosome, with or without the "chr" prefix
+            pos: 1-based VCF position
+            ref: Reference allele
+            alt: Alternate allele
+
+        Returns:
+            Annotation (gene, clinical_significance, condition, review_status, hgvs)
+            or None when the variant is not in the index
+        """
+        if not _chrom_code(chrom):
+            return None
+        record, _ = self._find_position(_position_key(chrom, int(pos)), ref.upper().encode(), alt.upper().encode())
+        return self._annotation(record) if record is not None else None
+
+    def lookup_rsid(self, rsid: str) -> Optional[Dict[str, Any]]:
+        """
+        Annotation of a variant by dbSNP id ("rs113488022"), or None
+
+        An rsID covers every allele at its site, so rsIDs whose alleles differ in
+        significance are not indexed; use lookup for a known alt allele.
+        """
+        number = _rs_number(rsid)
+        index = bisect.bisect_left(self._rs_numbers, number)
+        if number < 0 or index == len(self._rs_numbers) or self._rs_numbers[index] != number:
+            return None
+        return self._annotation(self._rs_records[index])
+
+    def lookup_hgvs(self, gene: str, hgvs_c: str) -> Optional[Dict[str, Any]]:
+        """Annotation of a variant by gene and coding notation ("BRCA1", "c.68_69delAG"), or None"""
+        key = hgvs_key(gene, hgvs_c)
+        if key is None:
+            return None
+        digest = _hash64(key)
+        index = bisect.bisect_left(self._hgvs_hashes, digest)
+        if index == len(self._hgvs_hashes) or self._hgvs_hashes[index] != digest:
+            return None
+        annotation = self._annotation(self._hgvs_records[index])
+        # Guard against hash collisions with the stored name
+        match = _HGVS_NAME.search(annotation.get("hgvs") or "")
+        if not match or hgvs_key(match.group("gene"), match.group("cdna")) != key:
+            return None
+        return annotation
+
+    def lookup_many(self, variants: List[Tuple[str, int, str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Annotations of many variants by position and alleles
+
+        Queries are answered in position order, each binary search starting where the
+        previous one ended, so the batch narrows its own search ranges, and strings
+        shared between annotations are decoded once per batch.
+
+        Args:
+            variants: (chrom, pos, ref, alt) tuples
+
+        Returns:
+            Annotation or None per variant, in input order
+        """
+        keyed = []
+        for position, (chrom, pos, ref, alt) in enumerate(variants):
+            if _chrom_code(chrom):
+                keyed.append((_position_key(chrom, int(pos)), ref.upper().encode(), alt.upper().encode(), position))
+        keyed.sort()
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(variants)
+        # Significances, review statuses and conditions repeat across a batch: decode each once
+        strings: Dict[int, str] = {}
+        lo = 0
+        for key, ref, alt, position in keyed:
+            record, lo = self._find_position(key, ref, alt, lo)
+            if record is not None:
+                results[position] = self._annotation(record, strings)
+        return results
+
+    def info(self) -> Dict[str, Any]:
+        """Get index counts and size"""
+        return dict(self.counts, path=self.path, bytes=len(self._mmap))
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def get_variant_index() -> Optional[VariantIndex]:
+    """Get the index at VARIANT_INDEX_PATH (mapped once per process), or None if it is not built"""
+    global _index, _index_loaded
+    with _index_lock:
+        if not _index_loaded:
+            _index_loaded = True
+            if os.path.exists(VARIANT_INDEX_PATH):
+                try:
+                    _index = VariantIndex(VARIANT_INDEX_PATH)
+                    logger.info(f"Loaded variant index {VARIANT_INDEX_PATH} ({_index.size} records)")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not load variant index {VARIANT_INDEX_PATH}: {str(e)}")
+            else:
+                logger.info(f"No variant index at {VARIANT_INDEX_PATH}; variants are not annotated")
+    return _index
+
+
+def annotate_variants(variants: List[Dict[str, Any]], index: Optional[VariantIndex] = None) -> int:
+    """
+    Attach clinical significance to extracted variants in place
+
+    Variants with a position (from VCF uploads) are looked up in one batch by position
+    and alleles only: another allele at the same site may share their rsID. The others
+    are looked up by gene and coding notation, then by rsID. Found variants get
+    clinical_significance, condition and review_status.
+
+    Args:
+        variants: Variants as in entities["variants"]
+        index: Variant index (defaults to the one at VARIANT_INDEX_PATH)
+
+    Returns:
+        Number of variants annotated (0 when there is no index)
+    """
+    index = index or get_variant_index()
+    if index is None or not variants:
+        return 0
+
+    placed = [variant for variant in variants if variant.get("pos") and variant.get("chrom")]
+    found = dict(zip(map(id, placed), index.lookup_many(
+        [(variant["chrom"], variant["pos"], variant["ref"], variant["alt"]) for variant in placed]
+    )))
+
+    annotated = 0
+    for variant in variants:
+        if id(variant) in found:
+            annotation = found[id(variant)]
+        else:
+            annotation = None
+            if variant.get("hgvs_c"):
+                annotation = index.lookup_hgvs(variant.get("gene"), variant["hgvs_c"])
+            if annotation is None and variant.get("rsid"):
+                annotation = index.lookup_rsid(variant["rsid"])
+        if annotation is None:
+            continue
+        variant["clinical_significance"] = annotation["clinical_significance"]
+        variant["condition"] = annotation["condition"]
+        variant["review_status"] = annotation["review_status"]
+        if not variant.get("gene"):
+            variant["gene"] = annotation["gene"]
+        annotated += 1
+    return annotated
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for building and inspecting variant indexes"""
+    parser = argparse.ArgumentParser(prog="python -m utils.variant_index", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a ClinVar-style TSV dump into an index")
+    build.add_argument("dump")
+    build.add_argument("-o", "--output", default="data/variant_index.bin")
+    build.add_argument("--assembly", default=None, help=f"assembly to keep (default {VARIANT_INDEX_ASSEMBLY})")
+    info = commands.add_parser("info", help="show index counts")
+    info.add_argument("index")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "build":
+        summary = build_variant_index(args.dump, args.output, args.assembly)
+    else:
+        summary = VariantIndex(args.index).info()
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
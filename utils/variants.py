@@ -0,0 +1,218 @@
+"""
+Variant Extraction Module
+
+Extracts structured genomic variants from report text: gene symbol, HGVS coding (c.) and
+protein (p.) notation, dbSNP rsID and zygosity. All notations are found by one compiled
+regular expression in a single left-to-right pass, and the pieces that belong together
+on a line ("Heterozygous BRCA1 c.68_69delAG (p.Glu23fs), rs80357914") are grouped into
+one variant. Notation is normalized (memoized, since panels repeat the same variants).
+"""
+
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Three-letter amino acid codes by one-letter code
+AMINO_ACIDS = {
+    "A": "Ala", "R": "Arg", "N": "Asn", "D": "Asp", "C": "Cys", "Q": "Gln", "E": "Glu",
+    "G": "Gly", "H": "His", "I": "Ile", "L": "Leu", "K": "Lys", "M": "Met", "F": "Phe",
+    "P": "Pro", "S": "Ser", "T": "Thr", "W": "Trp", "Y": "Tyr", "V": "Val", "U": "Sec",
+    "O": "Pyl", "*": "Ter", "X": "Ter",
+}
+
+ZYGOSITY = {
+    "heterozygous": "heterozygous",
+    "het": "heterozygous",
+    "compound heterozygous": "compound heterozygous",
+    "homozygous": "homozygous",
+    "hom": "homozygous",
+    "hemizygous": "hemizygous",
+}
+
+# Upper-case words that are written before notation but are not gene symbols
+_NOT_GENES = {"DNA", "CDNA", "RNA", "HGVS", "VUS", "VAF", "NGS", "PCR", "SNV", "SNP", "CNV", "ID", "NA"}
+
+_AA3 = "|".join(sorted(set(AMINO_ACIDS.values())))
+_AA = rf"(?:{_AA3}|[ACDEFGHIKLMNPQRSTVWYUOX*])"
+_GENE = r"[A-Z][A-Z0-9]{1,9}(?:-[A-Z0-9]{1,4})?"
+_TRANSCRIPT = r"(?:N[MCGRP]|X[MR])_\d+(?:\.\d+)?|ENST\d+(?:\.\d+)?"
+_POSITION = r"[-*]?\d+(?:[+-]\d+)?"
+_CDNA = (
+    rf"c\.\(?{_POSITION}(?:_{_POSITION})?\)?[ \t]?"
+    r"(?:[ACGTacgt]+>[ACGTacgt]+|(?:delins|del|dup|ins|inv)(?:[ACGTacgt]+|\d+)?|=)"
+)
+_PROTEIN = (
+    rf"p\.\(?{_AA}\d+(?:_{_AA}\d+)?"
+    rf"(?:{_AA}?fs(?:Ter|\*|X)?\d*|delins{_AA}+|del|dup|ins{_AA}+|{_AA}|=)\)?"
+)
+# One-letter protein change written without "p.", only recognized right after a gene (BRAF V600E)
+_SHORT_PROTEIN = r"[ACDEFGHIKLMNPQRSTVWY]\d{1,4}[ACDEFGHIKLMNPQRSTVWY*]"
+
+# A gene written before the notation ("BRCA1 c.68_69delAG", "NM_007294.3(BRCA1):c.68_69del")
+_PREFIX = (
+    rf"(?:(?:{_TRANSCRIPT})(?:\((?P<transcript_gene>{_GENE})\))?[ \t]*:[ \t]*"
+    rf"|(?P<gene>{_GENE})(?:[ \t]*:[ \t]*|[ \t]+))?"
+)
+
+_VARIANT_PATTERN = re.compile(
+    r"(?P<line>\n)"
+    rf"|(?<![\w.])(?P<notation>{_PREFIX}(?P<hgvs>{_CDNA}|{_PROTEIN}))(?![\w>])"
+    rf"|(?<![\w.])(?P<short>(?P<short_gene>{_GENE})[ \t]+(?P<short_protein>{_SHORT_PROTEIN}))(?!\w)"
+    r"|(?<!\w)(?P<rsid>[rR][sS]\d+)(?!\w)"
+    r"|(?<!\w)(?P<zygosity>(?i:compound[ \t]+heterozygous|heterozygous|homozygous|hemizygous|het|hom))(?!\w)"
+)
+
+_PROTEIN_TOKEN = re.compile(rf"({_AA3})|(delins|del|dup|ins|fs|ext)|([A-Z*])|(\d+|_|=)")
+
+
+@lru_cache(maxsize=4096)
+def normalize_cdna(notation: str) -> str:
+    """
+    Normalize HGVS coding notation: "c.1799 t>a" -> "c.1799T>A"
+
+    Args:
+        notation: c. notation as written
+
+    Returns:
+        Notation without spaces, with lowercase keywords and uppercase bases
+    """
+    change = re.sub(r"\s+", "", notation)[2:].lower()
+    # The edit keywords (del, dup, ins, inv) contain no base letters
+    return "c." + re.sub(r"[acgt]+", lambda match: match.group(0).upper(), change)
+
+
+@lru_cache(maxsize=4096)
+def normalize_protein(notation: str) -> str:
+    """
+    Normalize HGVS protein notation to three-letter codes: "p.(V600E)" -> "p.Val600Glu"
+
+    Args:
+        notation: p. notation as written, with one- or three-letter amino acids
+
+    Returns:
+        Notation with three-letter amino acids, "Ter" for stop codons and the
+        parentheses of predicted consequences removed
+    """
+    body = re.sub(r"[\s()]", "", notation)[2:]
+    parts = []
+    for three, keyword, one, other in _PROTEIN_TOKEN.findall(body):
+        parts.append(three or keyword or AMINO_ACIDS.get(one, one) or other)
+    return "p." + "".join(parts)
+
+
+def normalize_rsid(rsid: str) -> str:
+    """Normalize a dbSNP identifier to a lowercase "rs" prefix (RS113488022 -> rs113488022)"""
+    return "rs" + rsid[2:]
+
+
+def format_variant(variant: Dict[str, Any]) -> str:
+    """
+    Format a variant for display: "BRCA1 c.68_69delAG (p.Glu23fs) rs80357914, heterozygous"
+
+    Args:
+        variant: Variant as in entities["variants"]
+
+    Returns:
+        One-line description with the parts that are known, and the clinical
+        significance once annotated
+    """
+    parts = [variant.get("gene"), variant.get("hgvs_c")]
+    if variant.get("hgvs_p"):
+        parts.append(f"({variant['hgvs_p']})" if variant.get("hgvs_c") else variant["hgvs_p"])
+    parts.append(variant.get("rsid"))
+    text = " ".join(part for part in parts if part)
+    if variant.get("zygosity"):
+        text = f"{text}, {variant['zygosity']}"
+    if variant.get("clinical_significance"):
+        text = f"{text} - {variant['clinical_significance']}"
+    return text
+
+
+def _short_protein(change: str) -> str:
+    return normalize_protein(f"p.{change}")
+
+
+def extract_variants(text: str) -> List[Dict[str, Any]]:
+    """
+    Extract genomic variants from text
+
+    Pieces on the same line are grouped: a c. or p. notation, rsID or zygosity joins the
+    current variant unless it already has one; a new gene starts a new variant, and a
+    notation without a gene keeps the gene of the previous variant on the line.
+
+    Args:
+        text: Report text
+
+    Returns:
+        List of variants (gene, hgvs_c, hgvs_p, rsid, zygosity, each possibly None,
+        and start/end offsets), in order of appearance
+    """
+    variants = []
+    if not text:
+        return variants
+
+    current: Optional[Dict[str, Any]] = None
+    pending_zygosity = None  # "Heterozygous BRCA1 ..." names the zygosity first
+
+    def start_variant(match, gene):
+        nonlocal current, pending_zygosity
+        current = {
+            "gene": gene,
+            "hgvs_c": None,
+            "hgvs_p": None,
+            "rsid": None,
+            "zygosity": pending_zygosity[0] if pending_zygosity else None,
+            "start": pending_zygosity[1] if pending_zygosity else match.start(),
+            "end": match.end(),
+        }
+        pending_zygosity = None
+        variants.append(current)
+        return current
+
+    for match in _VARIANT_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "line":
+            current = None
+            pending_zygosity = None
+            continue
+
+        if kind in ("notation", "short"):
+            if kind == "notation":
+                gene = match.group("transcript_gene") or match.group("gene")
+                gene = None if gene in _NOT_GENES else gene
+                hgvs = match.group("hgvs")
+                slot = "hgvs_c" if hgvs.startswith("c.") else "hgvs_p"
+                value = normalize_cdna(hgvs) if slot == "hgvs_c" else normalize_protein(hgvs)
+            else:
+                gene = match.group("short_gene")
+                if gene in _NOT_GENES:
+                    continue
+                slot, value = "hgvs_p", _short_protein(match.group("short_protein"))
+
+            if current is None or current[slot] is not None or (gene and current["gene"] not in (None, gene)):
+                start_variant(match, gene or (current["gene"] if current else None))
+            elif gene:
+                current["gene"] = gene
+            current[slot] = value
+            current["end"] = match.end()
+
+        elif kind == "rsid":
+            if current is None or current["rsid"] is not None:
+                start_variant(match, None)
+            current["rsid"] = normalize_rsid(match.group("rsid"))
+            current["end"] = match.end()
+
+        elif kind == "zygosity":
+            zygosity = ZYGOSITY[re.sub(r"\s+", " ", match.group("zygosity")).lower()]
+            if current is not None and current["zygosity"] is None:
+                current["zygosity"] = zygosity
+                current["end"] = match.end()
+            else:
+                pending_zygosity = (zygosity, match.start())
+
+    logger.debug(f"Extracted {len(variants)} variants")
+    return variants
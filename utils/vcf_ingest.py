@@ -0,0 +1,324 @@
+"""
+VCF Ingestion Module
+
+Streams a VCF upload (plain, gzip or BGZF) line by line, keeps the clinically relevant
+records that fall in the configured gene panel and turns them into the same entities
+structure that extract_entities_from_text returns. Panel membership is checked against
+a region index (sorted gene spans per chromosome, searched with bisect), so the cost per
+record is a split of its first two columns and one binary search; memory does not grow
+with the file, since at most VCF_MAX_VARIANTS variants are kept.
+"""
+
+import io
+import os
+import gzip
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple, TextIO
+
+from utils.ner_extraction import empty_entities
+from utils.variants import normalize_cdna, normalize_protein
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+VCF_GENE_PANEL = os.environ.get(
+    "VCF_GENE_PANEL",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "gene_panel.tsv")
+)
+VCF_MIN_QUAL = float(os.environ.get("VCF_MIN_QUAL", "20"))
+VCF_MAX_VARIANTS = int(os.environ.get("VCF_MAX_VARIANTS", "500"))
+
+# Records annotated by SnpEff (ANN) or VEP (CSQ) are kept at these impacts, records with
+# ClinVar significance (CLNSIG) at these significances; unannotated records are kept
+RELEVANT_IMPACTS = {"HIGH", "MODERATE"}
+RELEVANT_SIGNIFICANCE = ("pathogenic", "likely_pathogenic", "drug_response", "risk_factor")
+
+# Field positions in a SnpEff ANN entry (VEP CSQ positions come from the header)
+_ANN_FIELDS = {"Allele": 0, "IMPACT": 2, "SYMBOL": 3, "HGVSc": 9, "HGVSp": 10}
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class GeneRegionIndex:
+    """Gene spans per chromosome, sorted by start for binary search"""
+
+    def __init__(self, regions: Iterable[Tuple[str, str, int, int]]):
+        """
+        Build the index
+
+        Args:
+            regions: (gene, chromosome, start, end) spans, 1-based and inclusive
+        """
+        by_chrom: Dict[str, List[Tuple[int, int, str]]] = {}
+        for gene, chrom, start, end in regions:
+            by_chrom.setdefault(_chrom_key(chrom), []).append((start, end, gene))
+
+        # Per chromosome: starts, ends and genes in start order, and the running maximum
+        # end, which bounds how far back an overlapping span can start
+        self._index = {}
+        self.genes = []
+        for chrom, spans in by_chrom.items():
+            spans.sort()
+            reach = []
+            for _, end, _ in spans:
+                reach.append(max(end, reach[-1]) if reach else end)
+            self._index[chrom] = ([span[0] for span in spans], [span[1] for span in spans],
+                                  [span[2] for span in spans], reach)
+            self.genes.extend(span[2] for span in spans)
+
+    @classmethod
+    def from_file(cls, path: str) -> "GeneRegionIndex":
+        """Load a panel TSV of gene, chromosome, start and end ('#' starts a comment)"""
+        regions = []
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                gene, chrom, start, end = line.split("\t")[:4]
+                regions.append((gene.strip(), chrom.strip(), int(start), int(end)))
+        return cls(regions)
+
+    def genes_at(self, chrom: str, pos: int) -> List[str]:
+        """
+        Genes whose span contains a position
+
+        Args:
+            chrom: Chromosome, with or without the "chr" prefix
+            pos: 1-based position
+
+        Returns:
+            Gene symbols (empty outside the panel)
+        """
+        entry = self._index.get(_chrom_key(chrom))
+        if entry is None:
+            return []
+        starts, ends, genes, reach = entry
+        index = bisect.bisect_right(starts, pos) - 1
+        found = []
+        while index >= 0 and reach[index] >= pos:
+            if ends[index] >= pos:
+                found.append(genes[index])
+            index -= 1
+        return found
+
+
+def _chrom_key(chrom: str) -> str:
+    return chrom[3:] if chrom[:3].lower() == "chr" else chrom
+
+
+_panel = None
+_panel_lock = threading.Lock()
+
+
+def get_gene_panel() -> GeneRegionIndex:
+    """Get the region index for VCF_GENE_PANEL (loaded once per process)"""
+    global _panel
+    with _panel_lock:
+        if _panel is None:
+            _panel = GeneRegionIndex.from_file(VCF_GENE_PANEL)
+            logger.info(f"Loaded gene panel {VCF_GENE_PANEL} ({len(_panel.genes)} genes)")
+    return _panel
+
+
+def open_vcf(source: Any) -> TextIO:
+    """
+    Open a VCF for line-by-line reading
+
+    Args:
+        source: Path or binary file object; gzip and BGZF input (.vcf.gz) is
+            detected from its magic bytes and decompressed as a stream
+
+    Returns:
+        Text stream over the VCF lines
+    """
+    stream = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    if stream.seekable():
+        position = stream.tell()
+        compressed = stream.read(2) == _GZIP_MAGIC
+        stream.seek(position)
+    else:
+        stream = stream if hasattr(stream, "peek") else io.BufferedReader(stream)
+        compressed = stream.peek(2)[:2] == _GZIP_MAGIC
+    if compressed:
+        # BGZF is a series of gzip members, which GzipFile reads as one stream
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+
+
+def _hgvs(value: str) -> Optional[str]:
+    # VEP prefixes the transcript ("ENST00000357654.9:c.68_69del") and escapes "="
+    value = value.rsplit(":", 1)[-1].replace("%3D", "=")
+    if value.startswith("c."):
+        return normalize_cdna(value)
+    if value.startswith("p."):
+        return normalize_protein(value)
+    return None
+
+
+def _annotations(info: Dict[str, str], csq_fields: Dict[str, int]) -> List[Dict[str, str]]:
+    if "ANN" in info:
+        entries, fields = info["ANN"], _ANN_FIELDS
+    elif "CSQ" in info and csq_fields:
+        entries, fields = info["CSQ"], csq_fields
+    else:
+        return []
+    annotations = []
+    for entry in entries.split(","):
+        values = entry.split("|")
+        annotations.append({name: values[index] if index < len(values) else ""
+                            for name, index in fields.items()})
+    return annotations
+
+
+def _zygosity(alleles: List[str], allele: str) -> Optional[str]:
+    called = [value for value in alleles if value != "."]
+    if allele not in called:
+        return None
+    if len(called) == 1:
+        return "hemizygous"
+    return "homozygous" if all(value == allele for value in called) else "heterozygous"
+
+
+def iter_vcf_variants(lines: Iterable[str], panel: Optional[GeneRegionIndex] = None,
+                      stats: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the clinically relevant panel variants of a VCF
+
+    A record is kept if it lies in a panel gene, passed its filters (FILTER PASS or "."),
+    has QUAL of at least VCF_MIN_QUAL (when given), carries the alternate allele in the
+    first sample (when there are samples), and, when annotated, has a HIGH or MODERATE
+    impact (ANN/CSQ) or a pathogenic, drug response or risk factor significance (CLNSIG).
+
+    Args:
+        lines: VCF lines, header included
+        panel: Region index (defaults to the configured gene panel)
+        stats: Optional dict updated with records, in_panel, kept and malformed counts
+            (records that are cut short or have a non-numeric POS or QUAL are skipped;
+            blank lines are ignored)
+
+    Yields:
+        Variants with gene, hgvs_c, hgvs_p, rsid, zygosity, chrom, pos, ref and alt
+    """
+    panel = panel or get_gene_panel()
+    stats = stats if stats is not None else {}
+    stats.update(records=0, in_panel=0, kept=0, malformed=0)
+    csq_fields: Dict[str, int] = {}
+
+    for line in lines:
+        if line.startswith("#"):
+            if line.startswith("##INFO=<ID=CSQ") and "Format: " in line:
+                names = line.split("Format: ", 1)[1].split('"', 1)[0].strip().split("|")
+                csq_fields = {name: names.index(name) for name in ("Allele", "IMPACT", "SYMBOL", "HGVSc", "HGVSp")
+                              if name in names}
+            continue
+        if not line.strip():
+            continue
+        stats["records"] += 1
+
+        # Most records fall outside the panel: look at the position before splitting the rest
+        parts = line.split("\t", 2)
+        if len(parts) < 3 or not parts[1].isdigit():
+            stats["malformed"] += 1
+            continue
+        chrom, pos, rest = parts
+        genes = panel.genes_at(chrom, int(pos))
+        if not genes:
+            continue
+        stats["in_panel"] += 1
+
+        fields = rest.rstrip("\r\n").split("\t")
+        if len(fields) < 6:
+            stats["malformed"] += 1
+            continue
+        record_id, ref, alts, qual, filters, info_field = fields[:6]
+        try:
+            quality = None if qual == "." else float(qual)
+        except ValueError:
+            stats["malformed"] += 1
+            continue
+        if filters not in ("PASS", "."):
+            continue
+        if quality is not None and quality < VCF_MIN_QUAL:
+            continue
+
+        alleles = None
+        if len(fields) > 7:
+            keys = fields[6].split(":")
+            values = fields[7].split(":")
+            if "GT" in keys and keys.index("GT") < len(values):
+                alleles = values[keys.index("GT")].replace("|", "/").split("/")
+
+        info = dict(item.split("=", 1) if "=" in item else (item, "") for item in info_field.split(";"))
+        annotations = _annotations(info, csq_fields)
+        significance = info.get("CLNSIG", "").lower()
+
+        for number, alt in enumerate(alts.split(","), start=1):
+            zygosity = _zygosity(alleles, str(number)) if alleles else None
+            if alleles and zygosity is None:
+                continue
+            matching = [annotation for annotation in annotations if annotation.get("Allele") in (alt, "", None)]
+            if significance:
+                if not any(term in significance for term in RELEVANT_SIGNIFICANCE):
+                    continue
+            elif annotations and not any(annotation.get("IMPACT") in RELEVANT_IMPACTS for annotation in matching):
+                continue
+
+            # Prefer the annotation of a panel gene with the most severe impact
+            matching.sort(key=lambda annotation: (annotation.get("SYMBOL") not in genes,
+                                                  annotation.get("IMPACT") != "HIGH"))
+            annotation = matching[0] if matching else {}
+            stats["kept"] += 1
+            yield {
+                "gene": annotation.get("SYMBOL") or genes[0],
+                "hgvs_c": _hgvs(annotation.get("HGVSc", "")),
+                "hgvs_p": _hgvs(annotation.get("HGVSp", "")),
+                "rsid": next((value for value in record_id.split(";") if value.startswith("rs")), None),
+                "zygosity": zygosity,
+                "chrom": chrom,
+                "pos": int(pos),
+                "ref": ref,
+                "alt": alt,
+            }
+
+
+def extract_entities_from_vcf(source: Any, panel: Optional[GeneRegionIndex] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Extract entities from a VCF upload
+
+    Args:
+        source: Path or binary file object (plain, gzip or BGZF)
+        panel: Region index (defaults to the configured gene panel)
+
+    Returns:
+        tuple: (entities, stats) where entities has the structure returned by
+        extract_entities_from_text, with the panel genes hit and their variants, and
+        stats has record counts, elapsed seconds and records per second
+    """
+    entities = empty_entities()
+    stats: Dict[str, Any] = {}
+    started = time.perf_counter()
+    lines = open_vcf(source)
+    try:
+        for variant in iter_vcf_variants(lines, panel, stats):
+            if variant["gene"] not in entities["genes"]:
+                entities["genes"].append(variant["gene"])
+            if len(entities["variants"]) < VCF_MAX_VARIANTS:
+                entities["variants"].append(variant)
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            lines.close()
+        else:
+            # Leave the caller's stream open
+            lines.detach()
+
+    elapsed = time.perf_counter() - started
+    stats["variants"] = len(entities["variants"])
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["records_per_s"] = round(stats["records"] / elapsed) if elapsed else 0
+    logger.info(f"Ingested VCF: {stats['records']} records, {stats['in_panel']} in panel, "
+                f"{stats['kept']} kept, {stats['malformed']} malformed in {elapsed:.2f}s "
+                f"({stats['records_per_s']} records/s)")
+    return entities, stats